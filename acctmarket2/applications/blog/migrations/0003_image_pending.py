@@ -0,0 +1,28 @@
+# Generated by Django 4.2.13 on 2026-10-17 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("blog", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="banner",
+            name="image_pending",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="blogcategory",
+            name="image_pending",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="post",
+            name="image_pending",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+    ]
@@ -8,6 +8,11 @@ from acctmarket2.applications.blog.forms import (Banner, BannerForm,
                                                  BlogCategory,
                                                  BlogCategoryForm, Post,
                                                  PostForm)
+from acctmarket2.applications.ecommerce.models import Category, Product
+from acctmarket2.applications.ecommerce.storefront import (
+    BLOG_SECTIONS, CATALOG_NAMESPACE, StorefrontSectionsMixin)
+from acctmarket2.utils.conditional import ConditionalGetMixin, latest_update
+from acctmarket2.utils.page_cache import AnonymousPageCacheMixin
 from acctmarket2.utils.views import ContentManagerRequiredMixin
 
 # Create your views here.
@@ -104,22 +109,45 @@ class BlogDeleteView(ContentManagerRequiredMixin, SlugMixin, DeleteView):
     success_url = reverse_lazy("blog:blog_list")
 
 
-class BlogViews(ListView):
+class BlogViews(AnonymousPageCacheMixin, StorefrontSectionsMixin, ListView):
     model = Post
     template_name = "pages/blog/blog_views.html"
     context_object_name = "blog_posts"
     paginate_by = 5
+    storefront_sections = BLOG_SECTIONS
+    # Blog writes bump the catalog too, as the storefront shows posts
+    page_cache_namespaces = (CATALOG_NAMESPACE,)
 
     def get_queryset(self):
         return Post.objects.all().order_by("-created_at")
 
 
-class BlogDetailView(DetailView):
+class BlogDetailView(
+    ConditionalGetMixin,
+    AnonymousPageCacheMixin,
+    StorefrontSectionsMixin,
+    DetailView,
+):
     model = Post
     template_name = "pages/blog/blog_details.html"
     context_object_name = "blog_post"
     slug_field = "slug"
     slug_url_kwarg = "slug"
+    storefront_sections = BLOG_SECTIONS
+    page_cache_namespaces = (CATALOG_NAMESPACE,)
+    conditional_namespaces = (CATALOG_NAMESPACE,)
+
+    def get_last_modified(self):
+        # The sidebar shows the blog categories and the newest products
+        slug = self.kwargs[self.slug_url_kwarg]
+        return latest_update(
+            CATALOG_NAMESPACE,
+            f"post:{slug}",
+            Post.objects.filter(slug=slug),
+            BlogCategory.objects.all(),
+            Category.objects.all(),
+            Product.objects.all(),
+        )
 
 
 # =======================================  End if blog section
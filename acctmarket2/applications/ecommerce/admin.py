@@ -1,11 +1,16 @@
 from django.contrib import admin
+from django.utils.html import format_html
 
 from acctmarket2.applications.ecommerce.models import (Address, CartOrder,
                                                        CartOrderItems,
                                                        Category, Payment,
-                                                       Product, ProductImages,
+                                                       PaymentEvent, Product,
+                                                       ProductImages,
                                                        ProductKey,
+                                                       ProductRating,
+                                                       ProductRecommendations,
                                                        ProductReview, WishList)
+from acctmarket2.utils.images import image_url
 
 
 class ProductImagesAdmin(admin.TabularInline):
@@ -54,7 +59,8 @@ class CategoryAdmin(admin.ModelAdmin):
         description="Image Preview",
     )
     def display_image(self, obj):
-        return obj.image.url if obj.image else ""
+        url = image_url(obj.image, "thumb")
+        return format_html('<img src="{}" width="40" />', url) if url else ""
 
 
 @admin.register(CartOrder)
@@ -70,6 +76,21 @@ class ProductReviewAdmin(admin.ModelAdmin):
     list_display = ["user", "product", "rating"]
 
 
+@admin.register(ProductRating)
+class ProductRatingAdmin(admin.ModelAdmin):
+    list_display = ["product", "count", "average"]
+    readonly_fields = [
+        "product", "count", "total",
+        "rating_1", "rating_2", "rating_3", "rating_4", "rating_5",
+    ]
+
+
+@admin.register(ProductRecommendations)
+class ProductRecommendationsAdmin(admin.ModelAdmin):
+    list_display = ["product", "computed_at"]
+    readonly_fields = ["product", "product_ids", "computed_at"]
+
+
 @admin.register(WishList)
 class WishListAdmin(admin.ModelAdmin):
     list_display = ["user", "product"]
@@ -88,3 +109,12 @@ class CartOrderItemsAdmin(admin.ModelAdmin):
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ["user", "order", "amount", "reference", "status"]
+
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = [
+        "provider", "payment_id", "status", "created_at", "processed_at"
+    ]
+    list_filter = ["provider", "status"]
+    search_fields = ["payment_id"]
@@ -6,4 +6,4 @@ class EcommerceConfig(AppConfig):
     name = "acctmarket2.applications.ecommerce"
 
     def ready(self):
-        pass
+        import acctmarket2.applications.ecommerce.signals  # noqa: F401
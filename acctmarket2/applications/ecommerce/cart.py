@@ -0,0 +1,325 @@
+import json
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from acctmarket2.applications.ecommerce.models import Cart as CartModel
+from acctmarket2.applications.ecommerce.models import CartItem
+from acctmarket2.utils.page_cache import hole
+
+CART_SESSION_KEY = "cart_token"
+# Carts used to live whole in the session under this key
+LEGACY_SESSION_KEY = "cart_data_obj"
+
+
+def to_cents(price, quantity=1):
+    return int(
+        (Decimal(str(price)) * int(quantity) * 100).to_integral_value()
+    )
+
+
+def make_line(product_id, title, quantity, price, image):
+    """
+    Build a cart line in the shape the cart templates expect.
+    """
+    return {
+        "title": title or "",
+        "quantity": int(quantity),
+        "price": str(Decimal(str(price)).quantize(Decimal("0.01"))),
+        "image": image or "",
+        "pid": str(product_id),
+    }
+
+
+class DatabaseCartStore:
+    """
+    Cart storage on the ``Cart``/``CartItem`` tables.
+
+    Every operation touches a single line row, and the running total on
+    ``Cart`` is adjusted with ``F()`` instead of being recomputed.
+    """
+
+    def items(self, owner):
+        lines = CartItem.objects.filter(cart__owner=owner).order_by("id")
+        return {
+            line.product_ref: make_line(
+                line.product_ref,
+                line.title,
+                line.quantity,
+                line.price,
+                line.image,
+            )
+            for line in lines
+        }
+
+    def count(self, owner):
+        return CartItem.objects.filter(cart__owner=owner).count()
+
+    def total(self, owner):
+        total = (
+            CartModel.objects.filter(owner=owner)
+            .values_list("total", flat=True)
+            .first()
+        )
+        return total or Decimal("0.00")
+
+    @transaction.atomic
+    def set(self, owner, product_id, line):
+        cart, _ = CartModel.objects.get_or_create(owner=owner)
+        old = (
+            CartItem.objects.select_for_update()
+            .filter(cart=cart, product_ref=product_id)
+            .first()
+        )
+        old_total = old.price * old.quantity if old else Decimal("0.00")
+        price = Decimal(line["price"])
+        CartItem.objects.update_or_create(
+            cart=cart,
+            product_ref=product_id,
+            defaults={
+                "title": line["title"],
+                "image": line["image"],
+                "quantity": line["quantity"],
+                "price": price,
+            },
+        )
+        CartModel.objects.filter(pk=cart.pk).update(
+            total=F("total") + price * line["quantity"] - old_total
+        )
+        return self.count(owner)
+
+    def get(self, owner, product_id):
+        line = CartItem.objects.filter(
+            cart__owner=owner, product_ref=product_id
+        ).first()
+        if line is None:
+            return None
+        return make_line(
+            line.product_ref,
+            line.title,
+            line.quantity,
+            line.price,
+            line.image,
+        )
+
+    @transaction.atomic
+    def remove(self, owner, product_id):
+        line = (
+            CartItem.objects.select_for_update()
+            .filter(cart__owner=owner, product_ref=product_id)
+            .first()
+        )
+        if line is not None:
+            CartModel.objects.filter(pk=line.cart_id).update(
+                total=F("total") - line.price * line.quantity
+            )
+            line.delete()
+        return self.count(owner)
+
+    def clear(self, owner):
+        CartModel.objects.filter(owner=owner).delete()
+
+
+class RedisCartStore:
+    """
+    Cart storage on Redis: one hash of JSON lines per cart, a parallel hash
+    of line subtotals in cents and a counter holding the cart total.
+
+    The Lua scripts keep the three keys in step in a single round-trip.
+    """
+
+    SET_LINE = """
+    local old = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '0')
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+    redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+    redis.call('INCRBY', KEYS[3], tonumber(ARGV[3]) - old)
+    for i = 1, 3 do
+        redis.call('EXPIRE', KEYS[i], ARGV[4])
+    end
+    return redis.call('HLEN', KEYS[1])
+    """
+
+    REMOVE_LINE = """
+    local old = tonumber(redis.call('HGET', KEYS[2], ARGV[1]) or '0')
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('HDEL', KEYS[2], ARGV[1])
+    redis.call('DECRBY', KEYS[3], old)
+    return redis.call('HLEN', KEYS[1])
+    """
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+
+        self.redis = get_redis_connection("default")
+        self.set_line = self.redis.register_script(self.SET_LINE)
+        self.remove_line = self.redis.register_script(self.REMOVE_LINE)
+
+    def keys(self, owner):
+        base = f"acctmarket2:cart:{owner}"
+        return [base, f"{base}:cents", f"{base}:total"]
+
+    def items(self, owner):
+        raw = self.redis.hgetall(self.keys(owner)[0])
+        return {
+            key.decode(): json.loads(value) for key, value in raw.items()
+        }
+
+    def count(self, owner):
+        return self.redis.hlen(self.keys(owner)[0])
+
+    def total(self, owner):
+        cents = self.redis.get(self.keys(owner)[2])
+        return Decimal(int(cents or 0)) / 100
+
+    def get(self, owner, product_id):
+        raw = self.redis.hget(self.keys(owner)[0], product_id)
+        return json.loads(raw) if raw else None
+
+    def set(self, owner, product_id, line):
+        return self.set_line(
+            keys=self.keys(owner),
+            args=[
+                product_id,
+                json.dumps(line),
+                to_cents(line["price"], line["quantity"]),
+                settings.CART_TTL,
+            ],
+        )
+
+    def remove(self, owner, product_id):
+        return self.remove_line(keys=self.keys(owner), args=[product_id])
+
+    def clear(self, owner):
+        self.redis.delete(*self.keys(owner))
+
+
+def get_cart_store():
+    """
+    Use Redis when the default cache is django-redis, otherwise fall back
+    to the database tables.
+    """
+    if "django_redis" in settings.CACHES["default"]["BACKEND"]:
+        return RedisCartStore()
+    return DatabaseCartStore()
+
+
+class Cart:
+    """
+    Server-side cart for the current request.
+
+    Authenticated users own ``user:<id>``; anonymous visitors get a random
+    token in their session the first time they add something, which is the
+    only session write the cart ever makes.
+    """
+
+    def __init__(self, request, store=None):
+        self.request = request
+        self.store = store or get_cart_store()
+        self._import_session_cart()
+
+    def owner(self, create=False):
+        user = getattr(self.request, "user", None)
+        if user is not None and user.is_authenticated:
+            return f"user:{user.pk}"
+        token = self.request.session.get(CART_SESSION_KEY)
+        if token is None and create:
+            token = uuid.uuid4().hex
+            self.request.session[CART_SESSION_KEY] = token
+        return f"anon:{token}" if token else None
+
+    def add(self, product_id, title, quantity, price, image):
+        """
+        Put a product in the cart, replacing the quantity of an existing
+        line. Returns the line and the number of lines in the cart.
+        """
+        line = make_line(product_id, title, quantity, price, image)
+        count = self.store.set(self.owner(create=True), str(product_id), line)
+        return line, count
+
+    def update(self, product_id, quantity):
+        owner = self.owner()
+        if owner is None:
+            return 0
+        line = self.store.get(owner, str(product_id))
+        if line is None:
+            return self.store.count(owner)
+        line["quantity"] = int(quantity)
+        return self.store.set(owner, str(product_id), line)
+
+    def remove(self, product_id):
+        owner = self.owner()
+        if owner is None:
+            return 0
+        return self.store.remove(owner, str(product_id))
+
+    def items(self):
+        owner = self.owner()
+        return self.store.items(owner) if owner else {}
+
+    def total(self):
+        owner = self.owner()
+        return self.store.total(owner) if owner else Decimal("0.00")
+
+    def clear(self):
+        owner = self.owner()
+        if owner:
+            self.store.clear(owner)
+
+    def __len__(self):
+        owner = self.owner()
+        return self.store.count(owner) if owner else 0
+
+    def _import_session_cart(self):
+        """
+        Move a cart still stored whole in the session into the store.
+        """
+        session = getattr(self.request, "session", None)
+        if session is None or LEGACY_SESSION_KEY not in session:
+            return
+        for product_id, item in session.pop(LEGACY_SESSION_KEY).items():
+            try:
+                self.add(
+                    product_id,
+                    item.get("title"),
+                    item.get("quantity") or 1,
+                    item.get("price") or 0,
+                    item.get("image"),
+                )
+            except (TypeError, ValueError, ArithmeticError):
+                continue
+
+
+def merge_carts(request, user):
+    """
+    Fold the anonymous cart of this session into ``user``'s cart.
+
+    Lines already in the user's cart keep the larger quantity.
+    """
+    if request is None or not hasattr(request, "session"):
+        return
+    token = request.session.pop(CART_SESSION_KEY, None)
+    if token is None:
+        return
+    store = get_cart_store()
+    anon_owner = f"anon:{token}"
+    user_owner = f"user:{user.pk}"
+    user_items = store.items(user_owner)
+    for product_id, line in store.items(anon_owner).items():
+        existing = user_items.get(product_id)
+        if existing is not None:
+            line["quantity"] = max(
+                int(line["quantity"]), int(existing["quantity"])
+            )
+        store.set(user_owner, product_id, line)
+    store.clear(anon_owner)
+
+
+@hole("cart_count")
+def cart_count(request):
+    """
+    The header's cart counter, filled into pages served from the page cache.
+    """
+    return len(Cart(request))
@@ -1,73 +1,52 @@
-from django.db.models import Max, Min
-from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 
-from acctmarket2.applications.blog.models import Banner, BlogCategory, Post
-from acctmarket2.applications.ecommerce.models import (Category, Product,
-                                                       WishList)
+from acctmarket2.applications.ecommerce.cart import Cart
+from acctmarket2.applications.ecommerce.models import Product, WishList
+from acctmarket2.applications.ecommerce.storefront import LazyStorefront
 
 
 def product_list(request):
     """
     Context processor to provide a list of products to templates.
 
+    Every collection is a lazy proxy over the cached storefront snapshot,
+    so a render that never touches them costs nothing. Views using
+    ``StorefrontSectionsMixin`` only get the sections they declared.
+
     :param request: HTTP request object
     :return: Dictionary containing the product list
     """
-    products = Product.objects.all().order_by(
-        "-created_at", "-updated_at", "-id"
+    storefront = LazyStorefront()
+    context = storefront.sections(
+        getattr(request, "storefront_sections", None)
     )
-    blog_categories = BlogCategory.objects.all().order_by("-created_at")
-    blog_posts = Post.objects.all().order_by("-created_at")
-    in_stock = products.filter(in_stock=True, visible=True)
-    all_products = products.filter(visible=True)
-
-    best_seller = products.filter(best_seller=True, visible=True)
-    special_offer = products.filter(special_offer=True, visible=True)
-    featured = products.filter(featured=True, visible=True)
-    just_arrived = products.filter(just_arrived=True, visible=True)
-    just_arrived2 = products.filter(
-        just_arrived=True, visible=True
-    ).order_by("-id")
-    categories = Category.objects.all().order_by("-id")
-    deal_product = products.filter(
-        deal_of_the_week=True,
-        deal_start_date__lte=timezone.now(),
-        deal_end_date__gte=timezone.now(),
-    ).first()
-
-    min_max_price = Product.objects.aggregate(Min("price"), Max("price"))
 
-    banners = Banner.objects.all().order_by("-created_at")
+    def wishlist():
+        try:                 # noqa
+            return WishList.objects.filter(user=request.user)
+        except:             # noqa
+            # messages.warning(request, "Please Login to access wishlist.")
+            return 0
 
-    try:                 # noqa
-        wishlist = WishList.objects.filter(user=request.user)
-    except:             # noqa
-        # messages.warning(request, "Please Login to access wishlist.")
-        wishlist = 0
-
-    return {
-        "in_stock": in_stock,
-        "best_seller": best_seller,
-        "special_offer": special_offer,
-        "featured": featured,
-        "top_categories": categories,
-        "just_arrived": just_arrived,
-        "just_arrived2": just_arrived2,
-        "all_products": all_products,
-        "min_max_price": min_max_price,
-        "blog_categories": blog_categories,
-        "blog_posts": blog_posts,
-        "banners": banners,
-        "wishlist": wishlist,
-        "deal_product": deal_product,
-    }
+    context["wishlist"] = SimpleLazyObject(wishlist)
+    return context
 
 
 def products_by_category(request):
     category_id = request.GET.get(
         "category_id",
     )  # Assuming the category_id is passed in the query parameters
-    products = []
-    if category_id:
-        products = Product.objects.filter(category__id=category_id)
-    return {"filtered_products": products}
+
+    def filtered_products():
+        if category_id:
+            return Product.objects.filter(category__id=category_id)
+        return []
+
+    return {"filtered_products": SimpleLazyObject(filtered_products)}
+
+
+def cart_summary(request):
+    """
+    Expose the number of lines in the server-side cart as ``cart_count``.
+    """
+    return {"cart_count": SimpleLazyObject(lambda: len(Cart(request)))}
@@ -0,0 +1,114 @@
+"""
+Assembly of the product page.
+
+Everything anonymous visitors see is built once per catalog version and
+cached; only the visitor's own state is queried per request. Query budget
+of a product page, enforced by the ecommerce tests:
+
+* building the cached part costs ``DETAIL_BUILD_QUERIES`` queries however
+  many images, related products and reviews the product has;
+* a cached page costs nothing more for anonymous visitors and
+  ``VIEWER_QUERIES`` for logged-in ones.
+"""
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+
+from acctmarket2.applications.ecommerce.models import (Product, ProductImages,
+                                                       ProductReview, WishList)
+from acctmarket2.applications.ecommerce.recommendations import related_products
+from acctmarket2.applications.ecommerce.storefront import CATALOG_NAMESPACE
+from acctmarket2.utils.cache import versioned_key
+
+# Product with category, ratings and recommendations, images, tags, related
+# products, reviews
+DETAIL_BUILD_QUERIES = 5
+# Has the visitor reviewed the product, is it in their wishlist
+VIEWER_QUERIES = 2
+
+DETAIL_IMAGES_LIMIT = 12
+RELATED_PRODUCTS_LIMIT = 8
+DETAIL_REVIEWS_LIMIT = 20
+
+
+@dataclass
+class ProductDetail:
+    product: Product
+    images: list = field(default_factory=list)
+    tags: list = field(default_factory=list)
+    related: list = field(default_factory=list)
+    reviews: list = field(default_factory=list)
+
+    def context(self):
+        return {
+            "product_images": self.images,
+            "tags": self.tags,
+            "related_product": self.related,
+            "reviews": self.reviews,
+        }
+
+
+def build_product_detail(pk):
+    """
+    Fetch everything the product page shows in a fixed number of queries,
+    or return ``None`` when there is no such product.
+    """
+    product = (
+        Product.objects.select_related(
+            "category", "rating_summary", "recommendations"
+        )
+        .filter(pk=pk)
+        .first()
+    )
+    if product is None:
+        return None
+
+    reviews = (
+        ProductReview.objects.filter(product=product)
+        .select_related("user")
+        .order_by("-created_at", "-id")[:DETAIL_REVIEWS_LIMIT]
+    )
+    return ProductDetail(
+        product=product,
+        images=list(
+            ProductImages.objects.filter(product=product).order_by("id")[
+                :DETAIL_IMAGES_LIMIT
+            ]
+        ),
+        tags=list(product.tags.all()),
+        related=related_products(product, RELATED_PRODUCTS_LIMIT),
+        reviews=list(reviews),
+    )
+
+
+def get_product_detail(pk):
+    """
+    Return the cached ``ProductDetail`` of product ``pk`` for the current
+    catalog version, building and storing it on a miss. Reviews, images and
+    product writes all bump the catalog, so a stale page is never served.
+    """
+    key = versioned_key(CATALOG_NAMESPACE, "product", pk)
+    detail = cache.get(key)
+    if detail is None:
+        detail = build_product_detail(pk)
+        if detail is not None:
+            cache.set(key, detail, settings.PRODUCT_DETAIL_CACHE_TIMEOUT)
+    return detail
+
+
+def viewer_state(detail, user):
+    """
+    The per-visitor part of the page, layered over the cached detail.
+    """
+    if not user.is_authenticated:
+        return {"make_review": True, "in_wishlist": False}
+    product = detail.product
+    return {
+        "make_review": not ProductReview.objects.filter(
+            user=user, product=product
+        ).exists(),
+        "in_wishlist": WishList.objects.filter(
+            user=user, product=product
+        ).exists(),
+    }
@@ -0,0 +1,216 @@
+import hashlib
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Count, Q
+from taggit.models import TaggedItem
+
+from acctmarket2.applications.ecommerce.models import Product
+from acctmarket2.applications.ecommerce.storefront import CATALOG_NAMESPACE
+from acctmarket2.utils.cache import versioned_key
+
+# Upper bounds of the price buckets; the last bucket is open ended
+PRICE_BUCKETS = tuple(Decimal(bound) for bound in (5, 10, 25, 50, 100))
+TAG_FACET_LIMIT = 20
+
+
+def _decimal(value):
+    try:
+        return Decimal(value) if value not in (None, "") else None
+    except InvalidOperation:
+        return None
+
+
+def _ints(values):
+    return sorted({int(value) for value in values if str(value).isdigit()})
+
+
+@dataclass(frozen=True)
+class FacetFilters:
+    categories: tuple = ()
+    tags: tuple = ()
+    min_price: Decimal | None = None
+    max_price: Decimal | None = None
+    page: int = 1
+
+    @classmethod
+    def from_querydict(cls, data):
+        """
+        Parse the sidebar's query string, dropping values that don't parse
+        instead of failing the whole request.
+        """
+        page = data.get("page", "1")
+        return cls(
+            categories=tuple(_ints(data.getlist("category[]"))),
+            tags=tuple(sorted(set(data.getlist("tag[]")))),
+            min_price=_decimal(data.get("min_price")),
+            max_price=_decimal(data.get("max_price")),
+            page=int(page) if page.isdigit() else 1,
+        )
+
+    def cache_key(self):
+        digest = hashlib.sha1(repr(self).encode()).hexdigest()
+        return versioned_key(CATALOG_NAMESPACE, "facets", digest)
+
+
+@dataclass
+class FacetResult:
+    product_ids: list
+    count: int
+    page: int
+    num_pages: int
+    categories: dict = field(default_factory=dict)
+    tags: list = field(default_factory=list)
+    prices: list = field(default_factory=list)
+
+    def as_json(self):
+        return {
+            "count": self.count,
+            "page": self.page,
+            "num_pages": self.num_pages,
+            "categories": self.categories,
+            "tags": [
+                {"slug": slug, "name": name, "count": count}
+                for slug, name, count in self.tags
+            ],
+            "prices": [
+                {"min": low, "max": high, "count": count}
+                for low, high, count in self.prices
+            ],
+        }
+
+
+def catalog():
+    return Product.objects.filter(visible=True, in_stock=True, digital=True)
+
+
+def apply_filters(queryset, filters, skip=None):
+    """
+    Narrow ``queryset`` by ``filters``. The facet named by ``skip`` is left
+    out so its own counts show what choosing another value would give.
+    """
+    if filters.categories and skip != "category":
+        queryset = queryset.filter(category_id__in=filters.categories)
+    if filters.tags and skip != "tag":
+        queryset = queryset.filter(
+            pk__in=Product.objects.filter(
+                tags__slug__in=filters.tags
+            ).values("pk")
+        )
+    if skip != "price":
+        if filters.min_price is not None:
+            queryset = queryset.filter(price__gte=filters.min_price)
+        if filters.max_price is not None:
+            queryset = queryset.filter(price__lte=filters.max_price)
+    return queryset
+
+
+def category_counts(queryset):
+    return dict(
+        queryset.order_by()
+        .values("category_id")
+        .annotate(count=Count("pk"))
+        .values_list("category_id", "count")
+    )
+
+
+def tag_counts(queryset):
+    rows = (
+        TaggedItem.objects.filter(
+            content_type=ContentType.objects.get_for_model(Product),
+            object_id__in=queryset.values("pk"),
+        )
+        .values("tag__slug", "tag__name")
+        .annotate(count=Count("id"))
+        .order_by("-count", "tag__name")[:TAG_FACET_LIMIT]
+    )
+    return [(row["tag__slug"], row["tag__name"], row["count"]) for row in rows]
+
+
+def price_counts(queryset):
+    """
+    Count every price bucket with one aggregate query.
+    """
+    bounds = [None, *PRICE_BUCKETS, None]
+    buckets = list(zip(bounds, bounds[1:]))
+    aggregates = {}
+    for index, (low, high) in enumerate(buckets):
+        condition = Q()
+        if low is not None:
+            condition &= Q(price__gte=low)
+        if high is not None:
+            condition &= Q(price__lt=high)
+        aggregates[f"bucket_{index}"] = Count("pk", filter=condition)
+    counts = queryset.aggregate(**aggregates)
+    return [
+        (
+            str(low) if low is not None else None,
+            str(high) if high is not None else None,
+            counts[f"bucket_{index}"],
+        )
+        for index, (low, high) in enumerate(buckets)
+    ]
+
+
+def build_facets(filters):
+    base = catalog()
+    matches = apply_filters(base, filters).order_by("-created_at", "-id")
+    page = Paginator(
+        matches.values_list("pk", flat=True), settings.FACET_PAGE_SIZE
+    ).get_page(filters.page)
+    return FacetResult(
+        product_ids=list(page.object_list),
+        count=page.paginator.count,
+        page=page.number,
+        num_pages=page.paginator.num_pages,
+        categories=category_counts(apply_filters(base, filters, "category")),
+        tags=tag_counts(apply_filters(base, filters, "tag")),
+        prices=price_counts(apply_filters(base, filters, "price")),
+    )
+
+
+def get_facets(filters=None):
+    """
+    Return the page of product ids and the facet counts for ``filters``.
+
+    Results are cached per filter combination under the catalog version,
+    so any catalog write invalidates them and a repeated sidebar request
+    costs a cache read regardless of catalog size.
+    """
+    filters = filters or FacetFilters()
+    key = filters.cache_key()
+    result = cache.get(key)
+    if result is None:
+        result = build_facets(filters)
+        cache.set(key, result, settings.FACET_CACHE_TIMEOUT)
+    return result
+
+
+def facet_products(result):
+    """
+    Load the products of a result page in one query, in page order.
+    """
+    products = Product.objects.select_related(
+        "category", "rating_summary"
+    ).in_bulk(result.product_ids)
+    return [products[pk] for pk in result.product_ids if pk in products]
+
+
+def sidebar_facets(top_categories):
+    """
+    Counts for the unfiltered catalog, shaped for the shop sidebar.
+    """
+    result = get_facets()
+    return {
+        "count": result.count,
+        "categories": [
+            (category, result.categories.get(category.id, 0))
+            for category in top_categories
+        ],
+        "tags": result.tags,
+        "prices": result.prices,
+    }
@@ -0,0 +1,36 @@
+from django.db import transaction
+
+from acctmarket2.applications.ecommerce.models import ProductImages
+from acctmarket2.applications.ecommerce.storefront import bump_catalog_version
+from acctmarket2.utils.media import MediaHelper
+from acctmarket2.utils.uploads import upload_many
+
+
+def ingest_product_images(product, files, max_workers=None, on_progress=None):
+    """
+    Upload gallery images for ``product`` in parallel and insert the rows
+    of the ones that made it with a single ``bulk_create``.
+
+    Returns the per-file ``UploadResult`` list so callers can report
+    partial failures.
+    """
+    results = upload_many(
+        files,
+        lambda file: MediaHelper.get_image_upload_path(
+            ProductImages, file.name
+        ),
+        max_workers=max_workers,
+        on_progress=on_progress,
+    )
+    ProductImages.objects.bulk_create(
+        [
+            ProductImages(
+                product=product, image=result.resource.get_prep_value()
+            )
+            for result in results
+            if result.ok
+        ]
+    )
+    # bulk_create sends no post_save, so refresh the cached product page
+    transaction.on_commit(bump_catalog_version)
+    return results
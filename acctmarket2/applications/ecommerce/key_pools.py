@@ -0,0 +1,127 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from acctmarket2.applications.ecommerce.models import ProductKey
+from acctmarket2.applications.jobs.queue import job
+
+logger = logging.getLogger(__name__)
+
+POOLED_PRODUCTS_KEY = "acctmarket2:keypool:products"
+
+
+def pools_enabled():
+    return (
+        settings.KEY_POOL_ENABLED
+        and "django_redis" in settings.CACHES["default"]["BACKEND"]
+    )
+
+
+def reservation_cutoff():
+    """
+    Reservations made before this moment are considered lost, e.g. because
+    the pool was flushed or a worker died between pop and claim.
+    """
+    return timezone.now() - timedelta(
+        seconds=settings.KEY_POOL_RESERVATION_TTL
+    )
+
+
+def claimable_keys(product_id):
+    """
+    Unused keys of a product that are not sitting in a live pool.
+    """
+    return ProductKey.objects.filter(
+        product_id=product_id, is_used=False
+    ).filter(
+        Q(reserved_at__isnull=True) | Q(reserved_at__lt=reservation_cutoff())
+    )
+
+
+class KeyPool:
+    """
+    Redis lists of pre-reserved ``ProductKey`` ids, one list per product.
+
+    A refill moves a batch of unused keys into the list and stamps them with
+    ``reserved_at`` so the database claim path leaves them alone. Allocation
+    pops ids and then flips ``is_used`` only where it is still false, so an
+    id that shows up twice can never be handed out twice.
+    """
+
+    def __init__(self, redis=None):
+        if redis is None:
+            from django_redis import get_redis_connection
+
+            redis = get_redis_connection("default")
+        self.redis = redis
+
+    def key(self, product_id):
+        return f"acctmarket2:keypool:{product_id}"
+
+    def register(self, product_id):
+        self.redis.sadd(POOLED_PRODUCTS_KEY, product_id)
+
+    def pooled_products(self):
+        return [int(pid) for pid in self.redis.smembers(POOLED_PRODUCTS_KEY)]
+
+    def is_pooled(self, product_id):
+        return bool(self.redis.sismember(POOLED_PRODUCTS_KEY, product_id))
+
+    def size(self, product_id):
+        return self.redis.llen(self.key(product_id))
+
+    def pop(self, product_id, count):
+        ids = self.redis.lpop(self.key(product_id), count) or []
+        return [int(key_id) for key_id in ids]
+
+    def needs_refill(self, product_id):
+        return self.size(product_id) < settings.KEY_POOL_LOW_WATER
+
+    def refill(self, product_id):
+        """
+        Top the pool up to ``KEY_POOL_BATCH`` ids once it has dropped
+        below ``KEY_POOL_LOW_WATER``. Returns the number of keys added.
+        """
+        size = self.size(product_id)
+        if size >= settings.KEY_POOL_LOW_WATER:
+            return 0
+
+        with transaction.atomic():
+            ids = list(
+                claimable_keys(product_id)
+                .select_for_update(skip_locked=True)
+                .order_by("id")
+                .values_list("id", flat=True)[
+                    : settings.KEY_POOL_BATCH - size
+                ]
+            )
+            ProductKey.objects.filter(id__in=ids).update(
+                reserved_at=timezone.now()
+            )
+            if ids:
+                transaction.on_commit(
+                    lambda: self.redis.rpush(self.key(product_id), *ids)
+                )
+
+        if size + len(ids) == 0:
+            logger.warning(f"Key pool for product {product_id} is exhausted")
+        return len(ids)
+
+    def release(self, product_id):
+        """
+        Empty the pool and hand its unused keys back to the database path.
+        """
+        self.redis.delete(self.key(product_id))
+        self.redis.srem(POOLED_PRODUCTS_KEY, product_id)
+        return ProductKey.objects.filter(
+            product_id=product_id, is_used=False, reserved_at__isnull=False
+        ).update(reserved_at=None)
+
+
+@job()
+def refill_key_pool(product_id):
+    KeyPool().refill(product_id)
@@ -0,0 +1,169 @@
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Case, F, Value, When
+
+from acctmarket2.applications.ecommerce.key_pools import (KeyPool,
+                                                          claimable_keys,
+                                                          pools_enabled,
+                                                          refill_key_pool,
+                                                          reservation_cutoff)
+from acctmarket2.applications.ecommerce.models import (CartOrderItems, Product,
+                                                       ProductKey)
+from acctmarket2.applications.ecommerce.pricing import invalidate_prices
+from acctmarket2.applications.ecommerce.storefront import bump_catalog_version
+
+CLAIM_KEYS_SQL = """
+    UPDATE {table}
+    SET is_used = TRUE, updated_at = NOW()
+    WHERE id IN (
+        SELECT id FROM {table}
+        WHERE product_id = %s AND is_used = FALSE
+        AND (reserved_at IS NULL OR reserved_at < %s)
+        ORDER BY id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING key, password
+"""
+
+CLAIM_POOLED_KEYS_SQL = """
+    UPDATE {table}
+    SET is_used = TRUE, updated_at = NOW()
+    WHERE id = ANY(%s) AND is_used = FALSE
+    RETURNING key, password
+"""
+
+
+def _fetch_claimed(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(table=ProductKey._meta.db_table), params)
+        return [
+            {"key": key, "password": password}
+            for key, password in cursor.fetchall()
+        ]
+
+
+@transaction.atomic
+def _claim_rows(queryset, limit=None):
+    locked = queryset.select_for_update(skip_locked=True).order_by("id")
+    rows = list(locked.values_list("id", "key", "password")[:limit])
+    ProductKey.objects.filter(id__in=[row[0] for row in rows]).update(
+        is_used=True
+    )
+    return [{"key": key, "password": password} for _, key, password in rows]
+
+
+def claim_pooled_keys(key_ids):
+    """
+    Mark the popped pool ids as used, skipping any already handed out.
+    """
+    if not key_ids:
+        return []
+    if connection.vendor == "postgresql":
+        return _fetch_claimed(CLAIM_POOLED_KEYS_SQL, [key_ids])
+    return _claim_rows(
+        ProductKey.objects.filter(id__in=key_ids, is_used=False)
+    )
+
+
+def claim_table_keys(product_id, quantity):
+    """
+    Mark up to ``quantity`` unused, unreserved keys of a product as used.
+
+    On PostgreSQL this is one ``UPDATE ... RETURNING`` statement whose inner
+    select skips rows other buyers hold locks on, so concurrent buyers of
+    the same product take different keys instead of queueing. Other
+    databases use a locked select followed by an update.
+    """
+    if connection.vendor == "postgresql":
+        return _fetch_claimed(
+            CLAIM_KEYS_SQL, [product_id, reservation_cutoff(), quantity]
+        )
+    return _claim_rows(claimable_keys(product_id), quantity)
+
+
+def claim_keys(product_id, quantity):
+    """
+    Mark up to ``quantity`` keys of a product as used and return them as
+    ``{"key", "password"}`` dicts.
+
+    Pooled products are served from their Redis pool first; anything the
+    pool cannot cover is claimed from the table.
+    """
+    if quantity < 1:
+        return []
+
+    keys = []
+    if pools_enabled():
+        pool = KeyPool()
+        if pool.is_pooled(product_id):
+            keys = claim_pooled_keys(pool.pop(product_id, quantity))
+            if pool.needs_refill(product_id):
+                refill_key_pool.delay(product_id)
+
+    if len(keys) < quantity:
+        keys += claim_table_keys(product_id, quantity - len(keys))
+    return keys
+
+
+def release_stock(product_id, claimed):
+    """
+    Take ``claimed`` units off a product's stock in one statement and hide
+    it once nothing is left.
+    """
+    Product.objects.filter(pk=product_id).update(
+        quantity_in_stock=F("quantity_in_stock") - claimed,
+        visible=Case(
+            When(quantity_in_stock__lte=claimed, then=Value(False)),
+            default=F("visible"),
+        ),
+    )
+
+
+def missing_keys(item):
+    return max(item.quantity - len(item.keys_and_passwords), 0)
+
+
+@transaction.atomic
+def allocate_order_keys(order):
+    """
+    Hand out product keys for every item of ``order`` that still lacks
+    some, so running it again for the same order never issues extra keys.
+
+    Keys are claimed once per product for all of the order's items of that
+    product, stock is updated with ``F()`` expressions and the items are
+    saved with one ``bulk_update``. Returns the items that could not be
+    given all the keys they need.
+    """
+    items = [
+        item for item in order.order_items.all() if missing_keys(item)
+    ]
+    by_product = defaultdict(list)
+    for item in items:
+        if item.product_id is not None:
+            by_product[item.product_id].append(item)
+
+    short = []
+    for product_id, product_items in by_product.items():
+        needed = sum(missing_keys(item) for item in product_items)
+        keys = claim_keys(product_id, needed)
+        if keys:
+            release_stock(product_id, len(keys))
+
+        for item in product_items:
+            wanted = missing_keys(item)
+            item.keys_and_passwords = (
+                item.keys_and_passwords + keys[:wanted]
+            )
+            keys = keys[wanted:]
+            if missing_keys(item):
+                short.append(item)
+
+    CartOrderItems.objects.bulk_update(items, ["keys_and_passwords"])
+
+    if by_product:
+        # update() skips post_save, so invalidate the cached catalog here
+        transaction.on_commit(bump_catalog_version)
+        transaction.on_commit(invalidate_prices)
+    return short
@@ -0,0 +1,96 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from acctmarket2.applications.ecommerce.keys import allocate_order_keys
+from acctmarket2.applications.ecommerce.models import (CartOrder,
+                                                       CartOrderItems, Product,
+                                                       ProductKey)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run N parallel buyers against one product and report key "
+        "allocation latency and duplicates. Creates and removes its own "
+        "throwaway data; point it at a staging database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--buyers", type=int, default=100)
+        parser.add_argument("--quantity", type=int, default=1)
+
+    def handle(self, *args, **options):
+        buyers = options["buyers"]
+        quantity = options["quantity"]
+        tag = uuid.uuid4().hex[:8]
+
+        user = get_user_model().objects.create(
+            email=f"key-benchmark-{tag}@example.invalid"
+        )
+        product = Product.objects.create(
+            title=f"Key benchmark {tag}",
+            price=Decimal("1.00"),
+            oldprice=Decimal("1.00"),
+            quantity_in_stock=buyers * quantity,
+        )
+        ProductKey.objects.bulk_create(
+            ProductKey(product=product, key=f"{tag}-{i}", password="x")
+            for i in range(buyers * quantity)
+        )
+        orders = []
+        for _ in range(buyers):
+            order = CartOrder.objects.create(user=user, price=Decimal("1.00"))
+            CartOrderItems.objects.create(
+                order=order,
+                product=product,
+                quantity=quantity,
+                price=Decimal("1.00"),
+                total=Decimal("1.00") * quantity,
+            )
+            orders.append(order)
+
+        barrier = threading.Barrier(buyers)
+
+        def buy(order):
+            try:
+                barrier.wait()
+                start = time.perf_counter()
+                allocate_order_keys(order)
+                return time.perf_counter() - start
+            finally:
+                connection.close()
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=buyers) as pool:
+                latencies = sorted(pool.map(buy, orders))
+            wall = time.perf_counter() - started
+
+            handed_out = [
+                entry["key"]
+                for item in CartOrderItems.objects.filter(order__user=user)
+                for entry in item.keys_and_passwords
+            ]
+            product.refresh_from_db()
+
+            self.stdout.write(f"buyers:          {buyers}")
+            self.stdout.write(f"wall time:       {wall * 1000:.1f} ms")
+            self.stdout.write(
+                f"p50 / p99:       {latencies[len(latencies) // 2] * 1000:.1f}"
+                f" / {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f} ms"
+            )
+            self.stdout.write(f"keys handed out: {len(handed_out)}")
+            self.stdout.write(
+                f"duplicates:      {len(handed_out) - len(set(handed_out))}"
+            )
+            self.stdout.write(f"stock left:      {product.quantity_in_stock}")
+        finally:
+            ProductKey.objects.filter(product=product).delete()
+            product.delete()
+            user.delete()
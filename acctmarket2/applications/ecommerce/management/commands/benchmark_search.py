@@ -0,0 +1,100 @@
+import random
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from acctmarket2.applications.ecommerce.models import Product
+from acctmarket2.applications.ecommerce.search import (FTS_TABLE,
+                                                       search_products)
+
+WORDS = (
+    "netflix spotify steam xbox playstation windows office vpn antivirus "
+    "premium account license key gift card subscription annual monthly "
+    "family ultimate pro starter global region digital instant bundle"
+).split()
+QUERIES = ["netflix premium", "steam gift card", "windows pro key", "vpn"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the old title__icontains scan with the search index on a "
+        "synthetic catalog. Everything is created in a transaction that is "
+        "rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.populate(options["products"])
+            self.stdout.write(
+                f"{'query':<18} {'method':<10} {'hits':>7} {'avg ms':>9}"
+            )
+            for query in QUERIES:
+                for method, run in (
+                    ("icontains", self.scan),
+                    ("index", self.search),
+                ):
+                    hits, elapsed = self.measure(
+                        run, query, options["repeat"]
+                    )
+                    self.stdout.write(
+                        f"{query:<18} {method:<10} {hits:>7} {elapsed:>9.1f}"
+                    )
+            transaction.set_rollback(True)
+
+    def populate(self, count):
+        rng = random.Random(0)
+        Product.objects.bulk_create(
+            (
+                Product(
+                    title=" ".join(rng.sample(WORDS, 3)),
+                    description=" ".join(rng.choices(WORDS, k=40)),
+                    price=Decimal("10.00"),
+                    oldprice=Decimal("12.00"),
+                )
+                for _ in range(count)
+            ),
+            batch_size=5000,
+        )
+        # bulk_create skips the signals, so index the columns in one go
+        if connection.vendor == "postgresql":
+            config = settings.SEARCH_CONFIG
+            Product.objects.update(
+                search_vector=SearchVector(
+                    "title", config=config, weight="A"
+                )
+                + SearchVector("description", config=config, weight="C")
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(f"ANALYZE {Product._meta.db_table}")
+        elif connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE} (rowid, title, keywords, body) "
+                    f"SELECT id, title, '', description "
+                    f"FROM {Product._meta.db_table}"
+                )
+
+    def scan(self, query):
+        return list(
+            Product.objects.filter(title__icontains=query).values_list(
+                "pk", flat=True
+            )[:8]
+        ), Product.objects.filter(title__icontains=query).count()
+
+    def search(self, query):
+        results = search_products(query)
+        return list(results.values_list("pk", flat=True)[:8]), results.count()
+
+    def measure(self, run, query, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            _, hits = run(query)
+        return hits, (time.perf_counter() - start) * 1000 / repeat
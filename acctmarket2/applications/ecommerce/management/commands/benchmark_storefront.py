@@ -0,0 +1,68 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from acctmarket2.applications.ecommerce.storefront import bump_catalog_version
+
+TARGETS = [
+    ("HomeView", lambda: reverse("homeapp:home")),
+    ("ProductShopListView", lambda: reverse("homeapp:shop_list")),
+    ("DeleteFromCartView", lambda: "/ecommerce/delete-from-cart?id=0"),
+    ("UpdateCartView", lambda: "/ecommerce/update-to-cart?id=0&quantity=1"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure query count and render time of the storefront pages and "
+        "async cart partials with a cold and a warm storefront cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of requests per target and mode.",
+        )
+
+    def handle(self, *args, **options):
+        host = (settings.ALLOWED_HOSTS or ["testserver"])[0]
+        if host.startswith(".") or host == "*":
+            host = "testserver"
+        client = Client(HTTP_HOST=host)
+
+        self.stdout.write(
+            f"{'view':<22} {'mode':<6} {'queries':>8} {'avg ms':>9}"
+        )
+        for name, url in TARGETS:
+            for mode in ("cold", "warm"):
+                queries, elapsed = self.measure(
+                    client, url(), cold=mode == "cold",
+                    repeat=options["repeat"],
+                )
+                self.stdout.write(
+                    f"{name:<22} {mode:<6} {queries:>8} {elapsed:>9.1f}"
+                )
+
+    def measure(self, client, url, cold, repeat):
+        total_queries = 0
+        total_time = 0.0
+        for _ in range(repeat):
+            if cold:
+                # A cold snapshot costs what every render used to cost
+                # before it existed: every storefront section is queried.
+                bump_catalog_version()
+            else:
+                client.get(url, secure=True)
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                client.get(url, secure=True)
+                total_time += time.perf_counter() - start
+            total_queries += len(ctx.captured_queries)
+        return total_queries // repeat, total_time * 1000 / repeat
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from acctmarket2.applications.ecommerce.orders import expire_draft_orders
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete unpaid orders that were abandoned at checkout. "
+        "Run it periodically, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=48,
+            help="Only expire drafts untouched for this many hours.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = expire_draft_orders(timedelta(hours=options["hours"]))
+        self.stdout.write(
+            self.style.SUCCESS(f"Expired {deleted} abandoned draft orders.")
+        )
@@ -0,0 +1,63 @@
+import os
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from acctmarket2.applications.ecommerce.images import ingest_product_images
+from acctmarket2.applications.ecommerce.models import Product
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".avif"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Upload image files, or every image in a directory, to a product's "
+        "gallery in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+")
+        parser.add_argument("--product", type=int, required=True)
+        parser.add_argument("--workers", type=int, default=None)
+
+    def collect(self, paths):
+        found = []
+        for path in paths:
+            if os.path.isdir(path):
+                found += sorted(
+                    os.path.join(path, name)
+                    for name in os.listdir(path)
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+                )
+            elif os.path.isfile(path):
+                found.append(path)
+            else:
+                raise CommandError(f"{path} does not exist.")
+        return found
+
+    def report(self, result, done, total):
+        status = result.public_id if result.ok else f"failed: {result.error}"
+        self.stdout.write(f"[{done}/{total}] {result.name} {status}")
+
+    def handle(self, *args, **options):
+        try:
+            product = Product.objects.get(pk=options["product"])
+        except Product.DoesNotExist:
+            raise CommandError(f"Product {options['product']} does not exist.")
+
+        paths = self.collect(options["paths"])
+        handles = [open(path, "rb") for path in paths]
+        try:
+            results = ingest_product_images(
+                product,
+                [File(handle, name=os.path.basename(handle.name)) for handle in handles],  # noqa
+                max_workers=options["workers"],
+                on_progress=self.report,
+            )
+        finally:
+            for handle in handles:
+                handle.close()
+
+        uploaded = sum(result.ok for result in results)
+        style = self.style.SUCCESS if uploaded == len(results) else self.style.WARNING  # noqa
+        self.stdout.write(style(f"Uploaded {uploaded} of {len(results)} images."))  # noqa
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from acctmarket2.applications.ecommerce.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every product's rating summary from its reviews, e.g. "
+        "after reviews were changed with bulk updates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--product",
+            type=int,
+            action="append",
+            help="Only rebuild this product; may be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_ratings(options["product"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} summaries."))
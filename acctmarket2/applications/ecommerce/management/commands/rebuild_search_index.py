@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from acctmarket2.applications.ecommerce.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Reindex every product for search, e.g. after a bulk import that "
+        "bypassed the save signals."
+    )
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} products."))
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from acctmarket2.applications.ecommerce.key_pools import KeyPool, pools_enabled
+
+
+class Command(BaseCommand):
+    help = (
+        "Top up the Redis key pools of hot products. Pass --product to add "
+        "products to the pooled set and --loop to keep refilling in the "
+        "background."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--product",
+            type=int,
+            action="append",
+            default=[],
+            help="Product id to pool; may be given several times.",
+        )
+        parser.add_argument(
+            "--release",
+            action="store_true",
+            help="Empty the pools of the given products instead.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep refilling until interrupted.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds between refill passes with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        if not pools_enabled():
+            raise CommandError(
+                "Key pools need KEY_POOL_ENABLED and a django-redis cache."
+            )
+        pool = KeyPool()
+
+        if options["release"]:
+            for product_id in options["product"]:
+                released = pool.release(product_id)
+                self.stdout.write(
+                    f"Released {released} keys of product {product_id}."
+                )
+            return
+
+        for product_id in options["product"]:
+            pool.register(product_id)
+
+        while True:
+            for product_id in pool.pooled_products():
+                added = pool.refill(product_id)
+                if added:
+                    self.stdout.write(
+                        f"Product {product_id}: +{added} keys, "
+                        f"{pool.size(product_id)} pooled."
+                    )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS("Key pools refilled."))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from acctmarket2.applications.ecommerce.recommendations import (
+    rebuild_recommendations, refresh_recommendations)
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the related products shown on product pages. By default "
+        "only products that changed or were bought since the last run are "
+        "refreshed; run it periodically, e.g. from cron, with a nightly "
+        "--full."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Recompute every product.",
+        )
+        parser.add_argument(
+            "--product",
+            type=int,
+            action="append",
+            help="Only recompute this product; may be repeated.",
+        )
+
+    def handle(self, *args, **options):
+        if options["product"]:
+            count = rebuild_recommendations(options["product"])
+        elif options["full"]:
+            count = rebuild_recommendations()
+        else:
+            count = refresh_recommendations()
+        self.stdout.write(
+            self.style.SUCCESS(f"Refreshed {count} recommendation lists.")
+        )
@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+import requests
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from acctmarket2.applications.ecommerce.models import Payment, PaymentEvent
+from acctmarket2.applications.ecommerce.tasks import process_payment_event
+from acctmarket2.applications.ecommerce.webhooks import (NOWPAYMENTS,
+                                                         record_event)
+from acctmarket2.utils.payments import NowPayment
+
+
+class Command(BaseCommand):
+    help = (
+        "Requeue payment events that were never processed. With --event, "
+        "reprocess specific events; with --backfill-days, ask NOWPayments "
+        "for the state of recent unverified payments whose IPN never came."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--minutes",
+            type=int,
+            default=10,
+            help="Only requeue unprocessed events older than this.",
+        )
+        parser.add_argument(
+            "--event",
+            type=int,
+            action="append",
+            default=[],
+            help="Event id to process again; may be given several times.",
+        )
+        parser.add_argument(
+            "--backfill-days",
+            type=int,
+            default=0,
+            help="Poll NOWPayments for pending payments of the last N days.",
+        )
+
+    def handle(self, *args, **options):
+        if options["event"]:
+            PaymentEvent.objects.filter(id__in=options["event"]).update(
+                processed_at=None
+            )
+            for event_id in options["event"]:
+                process_payment_event.delay(event_id)
+            self.stdout.write(f"Requeued {len(options['event'])} events.")
+            return
+
+        cutoff = timezone.now() - timedelta(minutes=options["minutes"])
+        pending = PaymentEvent.objects.filter(
+            processed_at__isnull=True, created_at__lt=cutoff
+        ).values_list("id", flat=True)
+        for event_id in pending:
+            process_payment_event.delay(event_id)
+        self.stdout.write(f"Requeued {len(pending)} unprocessed events.")
+
+        if options["backfill_days"]:
+            recorded = self.backfill(options["backfill_days"])
+            self.stdout.write(f"Recorded {recorded} missed events.")
+
+        self.stdout.write(self.style.SUCCESS("Replay done."))
+
+    def backfill(self, days):
+        since = timezone.now() - timedelta(days=days)
+        payments = Payment.objects.filter(
+            order__payment_method="nowpayments",
+            verified=False,
+            status="pending",
+            created_at__gte=since,
+            payment_id__isnull=False,
+        )
+        nowpayment = NowPayment()
+        recorded = 0
+        for payment in payments:
+            try:
+                success, result = nowpayment.verify_payment(payment.payment_id)
+            except requests.RequestException as e:
+                self.stderr.write(f"{payment.reference}: {e}")
+                continue
+            if not success or not result.get("payment_status"):
+                continue
+            payload = {**result, "order_id": str(payment.order_id)}
+            event = record_event(
+                NOWPAYMENTS,
+                str(result.get("payment_id") or payment.payment_id),
+                result["payment_status"],
+                payload,
+            )
+            recorded += event is not None
+        return recorded
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from acctmarket2.utils.rates import SOURCES, refresh_rates
+
+
+class Command(BaseCommand):
+    help = (
+        "Fetch the NOWPayments currency list and the exchange rates into the "
+        "cache, e.g. on deploy before traffic reaches checkout."
+    )
+
+    def handle(self, *args, **options):
+        failed = False
+        for name in SOURCES:
+            try:
+                value = refresh_rates(name)
+            except Exception as e:
+                failed = True
+                self.stderr.write(f"{name}: {e}")
+                continue
+            self.stdout.write(f"{name}: cached {len(value)} entries.")
+
+        if not failed:
+            self.stdout.write(self.style.SUCCESS("Rates warmed."))
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.13 on 2026-10-17 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecommerce", "0013_cart_cartitem"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="cartorder",
+            name="draft_key",
+            field=models.CharField(
+                blank=True, db_index=True, default="", max_length=64
+            ),
+        ),
+    ]
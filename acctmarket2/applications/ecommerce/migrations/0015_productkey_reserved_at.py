@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-17 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecommerce", "0014_cartorder_draft_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productkey",
+            name="reserved_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
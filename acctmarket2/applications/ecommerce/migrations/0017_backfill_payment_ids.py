@@ -0,0 +1,91 @@
+# Generated by Django 4.2.13 on 2026-10-17 14:20
+
+import os
+
+from django.db import migrations
+
+# A frozen copy of the id layout in acctmarket2.utils.ids, so later changes
+# there can't change what this migration writes.
+EPOCH_MS = 1704067200000
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+# Rows older than the epoch are stamped a second after it, which still puts
+# their ids far above any sequential payment_id
+EARLIEST_MS = EPOCH_MS + 1000
+
+
+def created_ms(payment):
+    return int(payment.created_at.timestamp() * 1000)
+
+
+def backfill_snowflakes(payments):
+    """
+    Give ``payments``, oldest first, Snowflake ids stamped with their own
+    creation time on node 0. Running processes only mint ids stamped with
+    the current time, so these can't collide with theirs whatever node
+    they hold.
+    """
+    last_ms, sequence = -1, 0
+    for payment in payments:
+        timestamp = max(created_ms(payment), EARLIEST_MS, last_ms)
+        if timestamp == last_ms:
+            sequence = (sequence + 1) & SEQUENCE_MASK
+            if sequence == 0:
+                timestamp += 1
+        else:
+            sequence = 0
+        last_ms = timestamp
+        yield payment, (
+            (timestamp - EPOCH_MS) << (NODE_BITS + SEQUENCE_BITS) | sequence
+        )
+
+
+def backfill_ulid(payment):
+    value = created_ms(payment) << 80 | int.from_bytes(os.urandom(10), "big")
+    return "".join(
+        CROCKFORD[(value >> shift) & 31] for shift in range(125, -1, -5)
+    )
+
+
+def backfill_payment_ids(apps, schema_editor):
+    """
+    Give rows created before the id service a payment_id and reference.
+
+    Existing sequential payment_ids and uuid references stay untouched:
+    Snowflake ids start far above any sequential value and ULIDs cannot
+    collide with uuids, so old and new rows live side by side.
+    """
+    Payment = apps.get_model("ecommerce", "Payment")
+    missing = Payment.objects.filter(payment_id__isnull=True) | (
+        Payment.objects.filter(reference="")
+    )
+    payments = list(
+        missing.only("id", "payment_id", "reference", "created_at").order_by(
+            "created_at", "id"
+        )
+    )
+    for payment, snowflake in backfill_snowflakes(
+        [payment for payment in payments if payment.payment_id is None]
+    ):
+        payment.payment_id = snowflake
+    for payment in payments:
+        if not payment.reference:
+            payment.reference = backfill_ulid(payment)
+    Payment.objects.bulk_update(
+        payments, ["payment_id", "reference"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecommerce", "0016_paymentevent"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_payment_ids, migrations.RunPython.noop
+        ),
+    ]
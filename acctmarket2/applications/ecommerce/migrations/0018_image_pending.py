@@ -0,0 +1,28 @@
+# Generated by Django 4.2.13 on 2026-10-17 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecommerce", "0017_backfill_payment_ids"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="category",
+            name="image_pending",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="image_pending",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+        migrations.AddField(
+            model_name="productimages",
+            name="image_pending",
+            field=models.CharField(blank=True, default="", max_length=255),
+        ),
+    ]
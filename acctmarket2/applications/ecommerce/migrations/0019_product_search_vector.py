@@ -0,0 +1,126 @@
+# Generated by Django 4.2.13 on 2026-10-17 16:10
+
+from collections import defaultdict
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import TextField, Value
+from django.utils.html import strip_tags
+
+# A frozen copy of the index layout in the ecommerce search module, so
+# later changes there can't change what this migration writes.
+GIN_INDEX = "ecommerce_product_search_gin"
+FTS_TABLE = "ecommerce_product_fts"
+
+
+def document_vector(title, keywords, body):
+    def weighted(text, weight):
+        return SearchVector(
+            Value(text, output_field=TextField()),
+            config=settings.SEARCH_CONFIG,
+            weight=weight,
+        )
+
+    return (
+        weighted(title, "A") + weighted(keywords, "B") + weighted(body, "C")
+    )
+
+
+def write_documents(connection, Product, documents):
+    """
+    Store ``(pk, title, keywords, body)`` rows in the search index of
+    ``connection``: the ``search_vector`` column on PostgreSQL, the FTS5
+    table on SQLite.
+    """
+    if connection.vendor == "postgresql":
+        for pk, title, keywords, body in documents:
+            Product.objects.filter(pk=pk).update(
+                search_vector=document_vector(title, keywords, body)
+            )
+    elif connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            for document in documents:
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE} "
+                    "(rowid, title, keywords, body) VALUES (%s, %s, %s, %s)",
+                    list(document),
+                )
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {GIN_INDEX} "
+            "ON ecommerce_product USING GIN (search_vector)"
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING "
+            "fts5(title, keywords, body, tokenize='porter unicode61')"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX IF EXISTS {GIN_INDEX}")
+    elif vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def index_existing_products(apps, schema_editor):
+    Product = apps.get_model("ecommerce", "Product")
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    TaggedItem = apps.get_model("taggit", "TaggedItem")
+
+    keywords = defaultdict(list)
+    content_type = ContentType.objects.filter(
+        app_label="ecommerce", model="product"
+    ).first()
+    if content_type is not None:
+        for object_id, name in TaggedItem.objects.filter(
+            content_type=content_type
+        ).values_list("object_id", "tag__name"):
+            keywords[object_id].append(name)
+
+    documents = []
+    for pk, title, category, description in Product.objects.values_list(
+        "pk", "title", "category__title", "description"
+    ):
+        if category:
+            keywords[pk].append(category)
+        documents.append(
+            (
+                pk,
+                title or "",
+                " ".join(keywords[pk]),
+                strip_tags(description or ""),
+            )
+        )
+    write_documents(schema_editor.connection, Product, documents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("taggit", "0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx"),  # noqa
+        ("ecommerce", "0018_image_pending"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(
+            index_existing_products, migrations.RunPython.noop
+        ),
+    ]
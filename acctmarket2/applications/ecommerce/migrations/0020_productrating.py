@@ -0,0 +1,72 @@
+# Generated by Django 4.2.13 on 2026-10-17 17:05
+
+import auto_prefetch
+import django.db.models.deletion
+import django.db.models.manager
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+RATINGS = (1, 2, 3, 4, 5)
+
+
+def summarize_existing_reviews(apps, schema_editor):
+    ProductRating = apps.get_model("ecommerce", "ProductRating")
+    ProductReview = apps.get_model("ecommerce", "ProductReview")
+    rows = (
+        ProductReview.objects.filter(product__isnull=False)
+        .order_by()
+        .values("product_id")
+        .annotate(
+            count=Count("id"),
+            total=Sum("rating"),
+            **{
+                f"rating_{rating}": Count("id", filter=Q(rating=rating))
+                for rating in RATINGS
+            },
+        )
+    )
+    ProductRating.objects.bulk_create(
+        [ProductRating(**row) for row in rows], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecommerce", "0019_product_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductRating",
+            fields=[
+                (
+                    "product",
+                    auto_prefetch.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rating_summary",
+                        serialize=False,
+                        to="ecommerce.product",
+                    ),
+                ),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("rating_1", models.PositiveIntegerField(default=0)),
+                ("rating_2", models.PositiveIntegerField(default=0)),
+                ("rating_3", models.PositiveIntegerField(default=0)),
+                ("rating_4", models.PositiveIntegerField(default=0)),
+                ("rating_5", models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "Product Ratings",
+            },
+            managers=[
+                ("objects", django.db.models.manager.Manager()),
+                ("prefetch_manager", django.db.models.manager.Manager()),
+            ],
+        ),
+        migrations.RunPython(
+            summarize_existing_reviews, migrations.RunPython.noop
+        ),
+    ]
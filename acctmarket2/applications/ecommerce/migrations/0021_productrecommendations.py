@@ -0,0 +1,46 @@
+# Generated by Django 4.2.13 on 2026-10-17 18:10
+
+import auto_prefetch
+import django.db.models.deletion
+import django.db.models.manager
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ecommerce", "0020_productrating"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductRecommendations",
+            fields=[
+                (
+                    "product",
+                    auto_prefetch.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="recommendations",
+                        serialize=False,
+                        to="ecommerce.product",
+                    ),
+                ),
+                ("product_ids", models.JSONField(default=list)),
+                (
+                    "computed_at",
+                    models.DateTimeField(
+                        db_index=True, default=django.utils.timezone.now
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "Product Recommendations",
+            },
+            managers=[
+                ("objects", django.db.models.manager.Manager()),
+                ("prefetch_manager", django.db.models.manager.Manager()),
+            ],
+        ),
+    ]
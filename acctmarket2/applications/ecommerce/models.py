@@ -5,22 +5,25 @@ from decimal import Decimal
 import auto_prefetch
 from ckeditor_uploader.fields import RichTextUploadingField
 from django.conf import settings
-from django.contrib.auth.models import Permission
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db.models import (CASCADE, SET_NULL, BigIntegerField, BooleanField,
                               CharField, DateTimeField, DecimalField,
-                              FileField, IntegerField, JSONField, SlugField,
-                              TextField)
+                              FileField, IntegerField, JSONField,
+                              PositiveIntegerField, SlugField, TextField,
+                              UniqueConstraint)
 from django.utils import timezone
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 from taggit.managers import TaggableManager
 
 from acctmarket2.utils.choices import ProductStatus, Rating, Status
+from acctmarket2.utils.ids import new_ulid, next_snowflake
 from acctmarket2.utils.media import MediaHelper
 from acctmarket2.utils.models import (ImageTitleTimeBaseModels, TimeBasedModel,
                                       TitleandUIDTimeBasedModel)
 from acctmarket2.utils.payments import NowPayment, PayStack
+from acctmarket2.utils.permissions import PermissionRegistry
 
 # Create your models here.
 
@@ -28,13 +31,19 @@ from acctmarket2.utils.payments import NowPayment, PayStack
 logger = logging.getLogger(__name__)
 
 
-class Permissions:
-    CAN_CRUD_PRODUCT = Permission.objects.filter(
-        codename__in=["add_product", "change_product", "delete_product"],
-    )
-    CAN_CRUD_CATEGORY = Permission.objects.filter(
-        codename__in=["add_category", "change_category", "delete_category"],
-    )
+# Resolved on first use, so importing this module never queries
+Permissions = PermissionRegistry(
+    CAN_CRUD_PRODUCT=[
+        "ecommerce.add_product",
+        "ecommerce.change_product",
+        "ecommerce.delete_product",
+    ],
+    CAN_CRUD_CATEGORY=[
+        "ecommerce.add_category",
+        "ecommerce.change_category",
+        "ecommerce.delete_category",
+    ],
+)
 
 
 class Category(ImageTitleTimeBaseModels):
@@ -120,6 +129,9 @@ class Product(TitleandUIDTimeBasedModel, ImageTitleTimeBaseModels):
         blank=True,
         null=True,
     )
+    # Maintained by ecommerce.search; its GIN index is created by migration
+    # 0019 on PostgreSQL only, so it is not declared in Meta.indexes
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         verbose_name_plural = "Products"
@@ -135,6 +147,16 @@ class Product(TitleandUIDTimeBasedModel, ImageTitleTimeBaseModels):
 
         return 0
 
+    @property
+    def ratings(self):
+        """
+        The review summary, or an empty one for a product never reviewed.
+        """
+        try:
+            return self.rating_summary
+        except ProductRating.DoesNotExist:
+            return ProductRating(product=self)
+
     def get_discount_price(self):
         if self.oldprice > 0:
             return self.oldprice - self.price
@@ -164,6 +186,8 @@ class ProductKey(TimeBasedModel):
     key = CharField(max_length=255)
     password = CharField(max_length=255)
     is_used = BooleanField(default=False)
+    # Set while the key sits in a Redis key pool waiting to be handed out
+    reserved_at = DateTimeField(null=True, blank=True)
 
     def __str__(self) -> str:
         return (
@@ -183,6 +207,55 @@ class ProductImages(ImageTitleTimeBaseModels):
         verbose_name_plural = "Product images"
 
 
+class Cart(TimeBasedModel):
+    """
+    Database copy of a shopping cart, used when no Redis cache is
+    configured. ``owner`` is ``user:<id>`` or ``anon:<token>``.
+    """
+
+    owner = CharField(max_length=64, unique=True)
+    total = DecimalField(
+        max_digits=100,
+        decimal_places=2,
+        default=Decimal("0.00"),
+    )
+
+    class Meta:
+        verbose_name_plural = "Carts"
+
+    def __str__(self):
+        return f"cart {self.owner}"
+
+
+class CartItem(TimeBasedModel):
+    cart = auto_prefetch.ForeignKey(
+        Cart,
+        verbose_name=_("Cart"),
+        on_delete=CASCADE,
+        related_name="lines",
+    )
+    product_ref = CharField(max_length=64)
+    title = CharField(max_length=255, default="", blank=True)
+    image = CharField(max_length=500, default="", blank=True)
+    quantity = IntegerField(default=1, validators=[MinValueValidator(1)])
+    price = DecimalField(
+        max_digits=100,
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal("0.00"))],
+    )
+
+    class Meta:
+        verbose_name_plural = "Cart Items"
+        constraints = [
+            UniqueConstraint(
+                fields=["cart", "product_ref"], name="unique_cart_product"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_ref} - {self.quantity} item(s)"
+
+
 class CartOrder(TimeBasedModel):
     user = auto_prefetch.ForeignKey(
         "users.User",
@@ -203,6 +276,8 @@ class CartOrder(TimeBasedModel):
         max_length=30,
     )
     payment_method = CharField(max_length=20, blank=True)
+    # Idempotency key of the checkout that created this unpaid order
+    draft_key = CharField(max_length=64, blank=True, default="", db_index=True)
 
     class Meta:
         verbose_name_plural = "Cart Orders"
@@ -309,15 +384,12 @@ class Payment(TimeBasedModel):
 
     @staticmethod
     def generate_payment_id():
-        latest_id = Payment.objects.latest("id").id if Payment.objects.exists() else 0  # noqa
-        return latest_id + 1
+        # Snowflake id: time-ordered and unique without asking the database
+        return next_snowflake()
 
     @staticmethod
     def generate_unique_reference():
-        while True:
-            reference = str(uuid.uuid4())
-            if not Payment.objects.filter(reference=reference).exists():
-                return reference
+        return new_ulid()
 
     def amount_value(self) -> int:
         return int(self.amount * 100)
@@ -351,15 +423,13 @@ class Payment(TimeBasedModel):
         success, result = nowpayment.verify_payment(int(self.payment_id))  # Ensure it's int     # noqa
         logging.info(f"NowPayments verification result: {result}")
 
-        if not success or not result.get("status"):
-            logging.error(
-                "No response from NowPayments API or status is false"
-            )
+        if not success:
+            logging.error(f"NowPayments verification failed: {result}")
             self.status = "failed"
             self.save()
             return False
 
-        if result.get("payment_status") == "confirmed":
+        if result.get("payment_status") in ("confirmed", "finished"):
             nowpayments_amount = Decimal(result.get("pay_amount", 0))
             if nowpayments_amount == self.amount:
                 self.status = "verified"
@@ -375,6 +445,32 @@ class Payment(TimeBasedModel):
         return False
 
 
+class PaymentEvent(TimeBasedModel):
+    """
+    Inbox of payment notifications as the provider sent them. A provider
+    repeating the same status for the same payment hits the unique
+    constraint, so every distinct event is stored and processed once.
+    """
+
+    provider = CharField(max_length=20)
+    payment_id = CharField(max_length=64)
+    status = CharField(max_length=30)
+    payload = JSONField(default=dict, blank=True)
+    processed_at = DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Payment Events"
+        constraints = [
+            UniqueConstraint(
+                fields=["provider", "payment_id", "status"],
+                name="unique_payment_event",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.provider} {self.payment_id} {self.status}"
+
+
 class ProductReview(TimeBasedModel):
     user = auto_prefetch.ForeignKey(
         "users.User",
@@ -398,6 +494,68 @@ class ProductReview(TimeBasedModel):
         return self.rating
 
 
+class ProductRating(auto_prefetch.Model):
+    """
+    Review summary of a product, kept current by ``ecommerce.ratings`` with
+    ``F()`` updates so showing stars never aggregates ``ProductReview``.
+    """
+
+    product = auto_prefetch.OneToOneField(
+        Product,
+        on_delete=CASCADE,
+        primary_key=True,
+        related_name="rating_summary",
+    )
+    count = PositiveIntegerField(default=0)
+    total = PositiveIntegerField(default=0)
+    rating_1 = PositiveIntegerField(default=0)
+    rating_2 = PositiveIntegerField(default=0)
+    rating_3 = PositiveIntegerField(default=0)
+    rating_4 = PositiveIntegerField(default=0)
+    rating_5 = PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "Product Ratings"
+
+    def __str__(self):
+        return f"{self.product_id}: {self.average} ({self.count})"
+
+    @property
+    def average(self):
+        if not self.count:
+            return 0
+        return round(self.total / self.count, 1)
+
+    @property
+    def histogram(self):
+        return {
+            rating: getattr(self, f"rating_{rating}")
+            for rating in Rating.values
+        }
+
+
+class ProductRecommendations(auto_prefetch.Model):
+    """
+    Best neighbours of a product, best first, precomputed offline by
+    ``ecommerce.recommendations`` so the product page reads a single row.
+    """
+
+    product = auto_prefetch.OneToOneField(
+        Product,
+        on_delete=CASCADE,
+        primary_key=True,
+        related_name="recommendations",
+    )
+    product_ids = JSONField(default=list)
+    computed_at = DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name_plural = "Product Recommendations"
+
+    def __str__(self):
+        return f"{self.product_id}: {len(self.product_ids)} neighbours"
+
+
 class WishList(TimeBasedModel):
     user = auto_prefetch.ForeignKey(
         "users.User",
@@ -0,0 +1,108 @@
+import hashlib
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from acctmarket2.applications.ecommerce.models import CartOrder, CartOrderItems
+
+
+def draft_key(user, cart_data):
+    """
+    Idempotency key of a checkout: the same user with the same priced cart
+    always maps to the same key.
+    """
+    lines = sorted(
+        (str(product_id), int(item["quantity"]), str(item["price"]))
+        for product_id, item in cart_data.items()
+    )
+    payload = f"{user.pk}:{json.dumps(lines)}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@transaction.atomic
+def get_or_create_draft_order(user, cart_data, total):
+    """
+    Return the open draft order for this cart, writing it at most once.
+
+    Reloading checkout with an unchanged cart returns the same order. If the
+    cart changed, the user's open draft is rewritten in place as long as no
+    payment was started for it; otherwise a new draft is created. Items are
+    written with a single ``bulk_create``, one row per cart line.
+    """
+    if not cart_data:
+        return None
+
+    key = draft_key(user, cart_data)
+
+    # Lock the user row so concurrent reloads queue up behind one writer
+    # instead of each creating their own draft.
+    list(
+        get_user_model().objects.select_for_update()
+        .filter(pk=user.pk)
+        .values_list("pk", flat=True)
+    )
+
+    order = CartOrder.objects.filter(
+        user=user, paid_status=False, draft_key=key
+    ).first()
+    if order is not None:
+        return order
+
+    order = (
+        CartOrder.objects.filter(
+            user=user, paid_status=False, payment__isnull=True
+        )
+        .exclude(draft_key="")
+        .order_by("-id")
+        .first()
+    )
+    if order is not None:
+        order.order_items.all().delete()
+        order.price = total
+        order.draft_key = key
+        order.save(update_fields=["price", "draft_key", "updated_at"])
+    else:
+        order = CartOrder.objects.create(
+            user=user,
+            price=total,
+            paid_status=False,
+            draft_key=key,
+        )
+
+    CartOrderItems.objects.bulk_create(
+        [
+            CartOrderItems(
+                order=order,
+                product_id=int(product_id),
+                invoice_no=f"INVOICE_NO_{order.id}",
+                quantity=int(item["quantity"]),
+                price=Decimal(item["price"]),
+                total=Decimal(item["price"]) * int(item["quantity"]),
+            )
+            for product_id, item in cart_data.items()
+        ]
+    )
+    return order
+
+
+def expire_draft_orders(older_than=timedelta(hours=48)):
+    """
+    Delete unpaid draft orders that were abandoned before a payment went
+    through. Orders with a pending or verified payment are kept.
+
+    Returns the number of orders deleted.
+    """
+    cutoff = timezone.now() - older_than
+    abandoned = CartOrder.objects.filter(
+        paid_status=False,
+        updated_at__lt=cutoff,
+    ).filter(
+        Q(payment__isnull=True) | Q(payment__status="failed")
+    )
+    deleted, per_model = abandoned.delete()
+    return per_model.get(CartOrder._meta.label, 0)
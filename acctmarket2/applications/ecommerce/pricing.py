@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from acctmarket2.applications.ecommerce.models import Product
+from acctmarket2.utils.cache import bump_version, get_version
+from acctmarket2.utils.images import image_url
+
+PRICES_NAMESPACE = "prices"
+PRICE_CACHE_TIMEOUT = 60 * 60
+LOCAL_TABLE_SIZE = 5000
+
+
+@dataclass(frozen=True)
+class ProductPrice:
+    """
+    The fields of a product that a cart or an order is allowed to trust.
+    """
+
+    id: int
+    title: str
+    price: Decimal
+    image: str
+    visible: bool
+    in_stock: bool
+    quantity_in_stock: int | None
+
+    @property
+    def purchasable(self):
+        return self.visible and self.in_stock
+
+    @classmethod
+    def from_product(cls, product):
+        return cls(
+            id=product.id,
+            title=product.title,
+            price=product.price,
+            image=image_url(product.image, "thumb"),
+            visible=product.visible,
+            in_stock=product.in_stock,
+            quantity_in_stock=product.quantity_in_stock,
+        )
+
+
+# Per-process copy of the table, dropped whenever the version moves
+_local_table = {"version": None, "rows": {}}
+
+
+def invalidate_prices():
+    return bump_version(PRICES_NAMESPACE)
+
+
+def _price_key(version, product_id):
+    return f"{PRICES_NAMESPACE}:{version}:{product_id}"
+
+
+def lookup_prices(product_ids):
+    """
+    Resolve many products to ``ProductPrice`` rows in one go.
+
+    Rows are served from the in-process table, then from the shared cache,
+    and whatever is still missing is loaded with a single query. Unknown
+    ids are left out of the result.
+    """
+    ids = set()
+    for product_id in product_ids:
+        try:
+            ids.add(int(product_id))
+        except (TypeError, ValueError):
+            continue
+
+    version = get_version(PRICES_NAMESPACE)
+    if _local_table["version"] != version:
+        _local_table["version"] = version
+        _local_table["rows"] = {}
+    local = _local_table["rows"]
+
+    found = {pid: local[pid] for pid in ids if pid in local}
+    missing = ids - found.keys()
+
+    if missing:
+        cached = cache.get_many(
+            [_price_key(version, pid) for pid in missing]
+        )
+        for row in cached.values():
+            found[row.id] = row
+        missing -= found.keys()
+
+    if missing:
+        loaded = {
+            product.id: ProductPrice.from_product(product)
+            for product in Product.objects.filter(id__in=missing).only(
+                "id",
+                "title",
+                "price",
+                "image",
+                "visible",
+                "in_stock",
+                "quantity_in_stock",
+            )
+        }
+        cache.set_many(
+            {_price_key(version, pid): row for pid, row in loaded.items()},
+            PRICE_CACHE_TIMEOUT,
+        )
+        found.update(loaded)
+
+    if len(local) + len(found) > LOCAL_TABLE_SIZE:
+        local.clear()
+    local.update(found)
+    return found
+
+
+def lookup_price(product_id):
+    try:
+        return lookup_prices([product_id]).get(int(product_id))
+    except (TypeError, ValueError):
+        return None
+
+
+def price_cart(cart_data):
+    """
+    Re-price cart lines against the price table with one batched lookup.
+
+    Returns the lines that can still be bought, with the trusted title,
+    price and image, and their total. Products that disappeared, were
+    hidden or went out of stock are dropped.
+    """
+    prices = lookup_prices(cart_data.keys())
+    lines = {}
+    total = Decimal("0.00")
+    for product_id, item in cart_data.items():
+        row = prices.get(int(product_id)) if product_id.isdigit() else None
+        if row is None or not row.purchasable:
+            continue
+        quantity = int(item["quantity"])
+        lines[product_id] = {
+            "title": row.title,
+            "quantity": quantity,
+            "price": str(row.price),
+            "image": row.image,
+            "pid": product_id,
+        }
+        total += row.price * quantity
+    return lines, total
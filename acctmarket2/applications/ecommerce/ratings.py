@@ -0,0 +1,74 @@
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from acctmarket2.applications.ecommerce.models import (Product, ProductRating,
+                                                       ProductReview)
+from acctmarket2.applications.ecommerce.storefront import bump_catalog_version
+from acctmarket2.utils.choices import Rating
+
+
+def apply_rating(product_id, rating, delta):
+    """
+    Add (``delta=1``) or remove (``delta=-1``) one review of ``rating`` from
+    a product's summary in a single ``UPDATE``, so concurrent reviews never
+    overwrite each other's counts.
+    """
+    if product_id is None or rating not in Rating.values:
+        return
+    if delta > 0:
+        ProductRating.objects.get_or_create(product_id=product_id)
+    ProductRating.objects.filter(product_id=product_id).update(
+        count=F("count") + delta,
+        total=F("total") + delta * rating,
+        **{f"rating_{rating}": F(f"rating_{rating}") + delta},
+    )
+    # Cards in the cached storefront show the stars too
+    transaction.on_commit(bump_catalog_version)
+
+
+def summarize(reviews):
+    """
+    Aggregate ``reviews`` into summary field values, per product id.
+    """
+    histogram = {
+        f"rating_{rating}": Count("id", filter=Q(rating=rating))
+        for rating in Rating.values
+    }
+    rows = (
+        reviews.filter(product__isnull=False)
+        .order_by()
+        .values("product_id")
+        .annotate(count=Count("id"), total=Sum("rating"), **histogram)
+    )
+    return {row.pop("product_id"): row for row in rows}
+
+
+@transaction.atomic
+def rebuild_ratings(product_ids=None):
+    """
+    Recompute the summaries of every product, or of ``product_ids``, from
+    their reviews. Returns the number of summaries written.
+    """
+    products = Product.objects.all()
+    reviews = ProductReview.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+        reviews = reviews.filter(product_id__in=product_ids)
+
+    values = summarize(reviews)
+    empty = {"count": 0, "total": 0} | {
+        f"rating_{rating}": 0 for rating in Rating.values
+    }
+    summaries = [
+        ProductRating(product_id=pk, **values.get(pk, empty))
+        for pk in products.values_list("pk", flat=True)
+    ]
+    ProductRating.objects.bulk_create(
+        summaries,
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=list(empty),
+        batch_size=500,
+    )
+    transaction.on_commit(bump_catalog_version)
+    return len(summaries)
@@ -0,0 +1,222 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from taggit.models import TaggedItem
+
+from acctmarket2.applications.ecommerce.models import (CartOrderItems, Product,
+                                                       ProductRecommendations)
+from acctmarket2.applications.ecommerce.storefront import bump_catalog_version
+
+# One order containing both products outweighs three shared tags, and a
+# shared tag outweighs merely sitting in the same category.
+CO_PURCHASE_WEIGHT = 3.0
+TAG_WEIGHT = 1.0
+CATEGORY_WEIGHT = 0.5
+
+
+def candidates():
+    """
+    Products that may be recommended: the ones a visitor can buy.
+    """
+    return Product.objects.filter(visible=True, in_stock=True)
+
+
+def paid_items():
+    return CartOrderItems.objects.filter(
+        order__paid_status=True, product__isnull=False
+    )
+
+
+def co_purchases(product_ids):
+    """
+    For each of ``product_ids``, count the paid orders it shares with every
+    other product.
+    """
+    orders = paid_items().filter(product_id__in=product_ids).values("order_id")
+    baskets = defaultdict(set)
+    for order_id, product_id in (
+        paid_items().filter(order_id__in=orders)
+        .values_list("order_id", "product_id")
+        .distinct()
+    ):
+        baskets[order_id].add(product_id)
+
+    sources = set(product_ids)
+    counts = defaultdict(Counter)
+    for basket in baskets.values():
+        for product_id in basket & sources:
+            counts[product_id].update(basket - {product_id})
+    return counts
+
+
+def shared_tags(product_ids):
+    """
+    For each of ``product_ids``, count the tags it shares with every other
+    product.
+    """
+    items = TaggedItem.objects.filter(
+        content_type=ContentType.objects.get_for_model(Product)
+    )
+    tags = defaultdict(set)
+    for object_id, tag_id in items.filter(
+        object_id__in=product_ids
+    ).values_list("object_id", "tag_id"):
+        tags[object_id].add(tag_id)
+
+    members = defaultdict(set)
+    for tag_id, object_id in items.filter(
+        tag_id__in={tag for ids in tags.values() for tag in ids}
+    ).values_list("tag_id", "object_id"):
+        members[tag_id].add(object_id)
+
+    counts = defaultdict(Counter)
+    for product_id, tag_ids in tags.items():
+        for tag_id in tag_ids:
+            counts[product_id].update(members[tag_id] - {product_id})
+    return counts
+
+
+def neighbours(product_id, category_id, purchases, tags, catalog, by_category,
+               limit):
+    """
+    Rank the candidates for one product, best first.
+    """
+    scores = Counter()
+    for other, count in purchases.items():
+        scores[other] += CO_PURCHASE_WEIGHT * count
+    for other, count in tags.items():
+        scores[other] += TAG_WEIGHT * count
+    # Only the newest few of a category are considered on category alone,
+    # so a large category doesn't make this quadratic
+    siblings = by_category.get(category_id, [])[: limit + 1]
+    for other in set(scores) | set(siblings):
+        if category_id is not None and catalog.get(other) == category_id:
+            scores[other] += CATEGORY_WEIGHT
+
+    ranked = sorted(
+        (
+            (score, other)
+            for other, score in scores.items()
+            if other != product_id and other in catalog
+        ),
+        reverse=True,
+    )
+    return [other for _, other in ranked[:limit]]
+
+
+@transaction.atomic
+def rebuild_recommendations(product_ids=None, batch_size=500):
+    """
+    Recompute the neighbours of every product, or of ``product_ids``, from
+    co-purchases, shared tags and categories. Returns the number of rows
+    written.
+    """
+    limit = settings.RECOMMENDATIONS_PER_PRODUCT
+    catalog = dict(
+        candidates().order_by("-created_at", "-id")
+        .values_list("id", "category_id")
+    )
+    by_category = defaultdict(list)
+    for other, category_id in catalog.items():
+        by_category[category_id].append(other)
+
+    sources = Product.objects.order_by("pk")
+    if product_ids is not None:
+        sources = sources.filter(pk__in=product_ids)
+    sources = list(sources.values_list("id", "category_id"))
+
+    now = timezone.now()
+    for start in range(0, len(sources), batch_size):
+        batch = sources[start:start + batch_size]
+        ids = [product_id for product_id, _ in batch]
+        purchases = co_purchases(ids)
+        tags = shared_tags(ids)
+        ProductRecommendations.objects.bulk_create(
+            [
+                ProductRecommendations(
+                    product_id=product_id,
+                    product_ids=neighbours(
+                        product_id,
+                        category_id,
+                        purchases[product_id],
+                        tags[product_id],
+                        catalog,
+                        by_category,
+                        limit,
+                    ),
+                    computed_at=now,
+                )
+                for product_id, category_id in batch
+            ],
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=["product_ids", "computed_at"],
+        )
+    transaction.on_commit(bump_catalog_version)
+    return len(sources)
+
+
+def stale_products(since):
+    """
+    Products whose neighbours may have moved since ``since``: the ones that
+    changed, and every product of an order paid since then.
+    """
+    changed = set(
+        Product.objects.filter(updated_at__gt=since).values_list(
+            "pk", flat=True
+        )
+    )
+    bought = set(
+        paid_items()
+        .filter(order__updated_at__gt=since)
+        .values_list("product_id", flat=True)
+    )
+    return changed | bought
+
+
+def refresh_recommendations():
+    """
+    Recompute the products that went stale since the last run, or every
+    product when the index is empty. Returns the number of rows written.
+
+    Products that only gained a neighbour through somebody else's change
+    catch up on the next full rebuild.
+    """
+    since = ProductRecommendations.objects.aggregate(
+        Max("computed_at")
+    )["computed_at__max"]
+    if since is None:
+        return rebuild_recommendations()
+    stale = stale_products(since)
+    if not stale:
+        return 0
+    return rebuild_recommendations(stale)
+
+
+def related_products(product, limit):
+    """
+    The products to show next to ``product``, in one query: its indexed
+    neighbours when it has been indexed, else the newest of its category.
+    The product should come with ``recommendations`` selected.
+    """
+    try:
+        ids = product.recommendations.product_ids
+    except ProductRecommendations.DoesNotExist:
+        ids = None
+
+    products = candidates().select_related("category", "rating_summary")
+    if ids is None:
+        return list(
+            products.filter(category_id=product.category_id)
+            .exclude(pk=product.pk)
+            .order_by("-created_at", "-id")[:limit]
+        )
+    if not ids:
+        return []
+    # The index is refreshed offline, so skip what went hidden since
+    found = products.in_bulk(ids)
+    return [found[pk] for pk in ids if pk in found][:limit]
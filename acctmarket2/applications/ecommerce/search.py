@@ -0,0 +1,202 @@
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import (Case, F, FloatField, IntegerField, Q, TextField,
+                              Value, When)
+from django.utils.html import strip_tags
+
+from acctmarket2.applications.ecommerce.models import Product
+from acctmarket2.applications.jobs.queue import job
+
+FTS_TABLE = f"{Product._meta.db_table}_fts"
+
+# Best match first; the id keeps the order total for keyset pagination
+SEARCH_ORDERING = ("-rank", "-id")
+
+# Weights follow PostgreSQL's A-D labels: a title hit beats a tag or
+# category hit, which beats a hit somewhere in the description.
+FTS_WEIGHTS = (10.0, 4.0, 1.0)
+
+
+@dataclass(frozen=True)
+class SearchDocument:
+    pk: int
+    title: str
+    keywords: str
+    body: str
+
+
+def product_document(product):
+    """
+    The searchable text of a product: its title, its tags and category
+    title as keywords, and its description without markup.
+    """
+    keywords = list(product.tags.names())
+    if product.category_id is not None:
+        keywords.append(product.category.title)
+    return SearchDocument(
+        pk=product.pk,
+        title=product.title or "",
+        keywords=" ".join(keywords),
+        body=strip_tags(product.description or ""),
+    )
+
+
+def document_vector(document):
+    config = settings.SEARCH_CONFIG
+
+    def weighted(text, weight):
+        return SearchVector(
+            Value(text, output_field=TextField()),
+            config=config,
+            weight=weight,
+        )
+
+    return (
+        weighted(document.title, "A")
+        + weighted(document.keywords, "B")
+        + weighted(document.body, "C")
+    )
+
+
+def write_documents(documents, model=Product):
+    """
+    Store ``documents`` in the search index of the current database:
+    the ``search_vector`` column on PostgreSQL, an FTS5 table on SQLite.
+    Other databases have no index and are searched with ``icontains``.
+    """
+    if connection.vendor == "postgresql":
+        for document in documents:
+            model._base_manager.filter(pk=document.pk).update(
+                search_vector=document_vector(document)
+            )
+    elif connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            for document in documents:
+                cursor.execute(
+                    f"DELETE FROM {FTS_TABLE} WHERE rowid = %s",
+                    [document.pk],
+                )
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE} "
+                    "(rowid, title, keywords, body) VALUES (%s, %s, %s, %s)",
+                    [
+                        document.pk,
+                        document.title,
+                        document.keywords,
+                        document.body,
+                    ],
+                )
+
+
+def index_product(product):
+    write_documents([product_document(product)])
+
+
+def remove_product(pk):
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+
+
+def rebuild_index(queryset=None, batch_size=500):
+    """
+    Reindex every product, or the ones in ``queryset``. Returns the count.
+    """
+    if queryset is None:
+        queryset = Product.objects.all()
+    queryset = queryset.select_related("category").prefetch_related("tags")
+    count = 0
+    for start in range(0, queryset.count(), batch_size):
+        products = queryset.order_by("pk")[start:start + batch_size]
+        write_documents([product_document(p) for p in products])
+        count += len(products)
+    return count
+
+
+@job()
+def reindex_category(category_id):
+    rebuild_index(Product.objects.filter(category_id=category_id))
+
+
+def fts_match(query):
+    # Quote every term so user input cannot inject FTS5 syntax, and let
+    # the last one match as a prefix while the visitor is still typing.
+    terms = ['"{}"'.format(term.replace('"', '""')) for term in query.split()]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _search_sqlite(queryset, query):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, %s, %s, %s) LIMIT %s",
+            [fts_match(query), *FTS_WEIGHTS, settings.SEARCH_MAX_RESULTS],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    # bm25 scores are not exposed per row, so rank by reversed position
+    position = Case(
+        *[
+            When(pk=pk, then=Value(len(ids) - index))
+            for index, pk in enumerate(ids)
+        ],
+        output_field=IntegerField(),
+    )
+    return (
+        queryset.filter(pk__in=ids)
+        .annotate(rank=position)
+        .order_by(*SEARCH_ORDERING)
+    )
+
+
+def _search_postgresql(queryset, query):
+    search_query = SearchQuery(
+        query, search_type="websearch", config=settings.SEARCH_CONFIG
+    )
+    return (
+        queryset.filter(search_vector=search_query)
+        .annotate(rank=SearchRank(F("search_vector"), search_query))
+        .order_by(*SEARCH_ORDERING)
+    )
+
+
+def _search_scan(queryset, query):
+    matches = Q()
+    for term in query.split():
+        matches &= (
+            Q(title__icontains=term)
+            | Q(description__icontains=term)
+            | Q(tags__name__icontains=term)
+            | Q(category__title__icontains=term)
+        )
+    return (
+        queryset.filter(matches)
+        .distinct()
+        .annotate(rank=Value(0, output_field=IntegerField()))
+        .order_by(*SEARCH_ORDERING)
+    )
+
+
+def search_products(query, queryset=None):
+    """
+    Products matching ``query``, best matches first. A blank query matches
+    nothing, but is still annotated and ordered so it can be paginated.
+    """
+    if queryset is None:
+        queryset = Product.objects.all()
+    query = (query or "").strip()
+    if not query:
+        return (
+            queryset.none()
+            .annotate(rank=Value(0.0, output_field=FloatField()))
+            .order_by(*SEARCH_ORDERING)
+        )
+    if connection.vendor == "postgresql":
+        return _search_postgresql(queryset, query)
+    if connection.vendor == "sqlite":
+        return _search_sqlite(queryset, query)
+    return _search_scan(queryset, query)
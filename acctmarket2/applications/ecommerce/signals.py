@@ -1,7 +1,23 @@
-from django.db.models.signals import post_save
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
 from django.dispatch import receiver
 
-from acctmarket2.applications.ecommerce.models import CartOrderItems
+from acctmarket2.applications.blog.models import (Announcement, Banner,
+                                                  BlogCategory, Post)
+from acctmarket2.applications.ecommerce.cart import merge_carts
+from acctmarket2.applications.ecommerce.models import (CartOrderItems,
+                                                       Category, Product,
+                                                       ProductImages,
+                                                       ProductReview)
+from acctmarket2.applications.ecommerce.pricing import invalidate_prices
+from acctmarket2.applications.ecommerce.ratings import apply_rating
+from acctmarket2.applications.ecommerce.search import (index_product,
+                                                       reindex_category,
+                                                       remove_product)
+from acctmarket2.applications.ecommerce.storefront import bump_catalog_version
+from acctmarket2.utils.uploads import image_uploaded
 
 
 @receiver(post_save, sender=CartOrderItems)
@@ -20,3 +36,117 @@ def assign_unique_key(sender, instance, created, **kwargs):
         # This method is already handled in the service layer.
         # Just demonstrating how you could use signals for side effects.
         pass
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ProductImages)
+@receiver(post_delete, sender=ProductImages)
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=BlogCategory)
+@receiver(post_delete, sender=BlogCategory)
+@receiver(post_save, sender=Announcement)
+@receiver(post_delete, sender=Announcement)
+def invalidate_storefront(sender, instance, **kwargs):
+    """
+    Bump the catalog version whenever something shown on the storefront
+    changes, so the next render rebuilds the snapshot.
+
+    The bump waits for the write to commit; bumping earlier would let a
+    concurrent request cache the old rows under the new version.
+    """
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_price_table(sender, instance, **kwargs):
+    """
+    Drop cached prices and stock levels once a product change commits.
+    """
+    transaction.on_commit(invalidate_prices)
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, **kwargs):
+    index_product(instance)
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def update_product_tags(sender, instance, action, **kwargs):
+    # Tags are saved after the product itself, e.g. by form.save_m2m(), so
+    # the search index and the cached facet counts are refreshed here
+    if isinstance(instance, Product) and action.startswith("post_"):
+        index_product(instance)
+        transaction.on_commit(bump_catalog_version)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, **kwargs):
+    remove_product(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    if not created:
+        reindex_category.delay(instance.pk)
+
+
+@receiver(pre_save, sender=ProductReview)
+def remember_review_rating(sender, instance, **kwargs):
+    """
+    Keep what an edited review counted as, so its old rating can be taken
+    out of the summary once the new one is saved.
+    """
+    instance._counted_as = None
+    if instance.pk is not None:
+        instance._counted_as = (
+            ProductReview.objects.filter(pk=instance.pk)
+            .values_list("product_id", "rating")
+            .first()
+        )
+
+
+@receiver(post_save, sender=ProductReview)
+def count_review(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    counted_as = getattr(instance, "_counted_as", None)
+    current = (instance.product_id, instance.rating)
+    if counted_as == current:
+        # Only the text changed; product pages still show it
+        transaction.on_commit(bump_catalog_version)
+        return
+    if counted_as is not None:
+        apply_rating(*counted_as, delta=-1)
+    apply_rating(*current, delta=1)
+
+
+@receiver(post_delete, sender=ProductReview)
+def uncount_review(sender, instance, **kwargs):
+    apply_rating(instance.product_id, instance.rating, delta=-1)
+
+
+@receiver(image_uploaded)
+def refresh_uploaded_image(sender, pk, **kwargs):
+    """
+    A background upload swaps the image in with update(), so invalidate
+    what post_save would have.
+    """
+    transaction.on_commit(bump_catalog_version)
+    if sender is Product:
+        transaction.on_commit(invalidate_prices)
+
+
+@receiver(user_logged_in)
+def merge_anonymous_cart(sender, request, user, **kwargs):
+    """
+    Carry what a visitor put in their cart before logging in over to the
+    cart they own as a user.
+    """
+    merge_carts(request, user)
@@ -0,0 +1,202 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from acctmarket2.applications.blog.models import Banner, BlogCategory, Post
+from acctmarket2.applications.ecommerce.models import Category, Product
+from acctmarket2.utils.cache import bump_version, versioned_key
+
+CATALOG_NAMESPACE = "catalog"
+
+STOREFRONT_SECTIONS = (
+    "in_stock",
+    "best_seller",
+    "special_offer",
+    "featured",
+    "top_categories",
+    "just_arrived",
+    "just_arrived2",
+    "all_products",
+    "min_max_price",
+    "blog_categories",
+    "blog_posts",
+    "banners",
+    "deal_product",
+    "catalog_facets",
+)
+# Sections used by the header and mobile header included from base.html
+HEADER_SECTIONS = ("top_categories",)
+# Sections used by partials/_shop_sidebar.html
+SHOP_SECTIONS = HEADER_SECTIONS + (
+    "catalog_facets",
+    "min_max_price",
+    "just_arrived",
+    "just_arrived2",
+)
+# Sections used by partials/_blog_sidebar.html
+BLOG_SECTIONS = HEADER_SECTIONS + ("blog_categories", "just_arrived")
+
+
+def bump_catalog_version():
+    """
+    Invalidate the storefront snapshot and every other catalog-keyed entry.
+    """
+    return bump_version(CATALOG_NAMESPACE)
+
+
+def menu_categories():
+    """
+    Categories for the category menus, with the parent and subcategories
+    the menus check for each of them already loaded.
+    """
+    return list(
+        Category.objects.select_related("sub_category")
+        .prefetch_related("subcategories")
+        .order_by("-id")
+    )
+
+
+def build_storefront_snapshot():
+    """
+    Evaluate every storefront collection once and return plain lists.
+
+    Products are fetched with their category and rating summary joined in
+    so templates that print ``product.category.title`` or the stars don't
+    go back to the database.
+    """
+    products = Product.objects.select_related(
+        "category", "rating_summary"
+    ).order_by("-created_at", "-updated_at", "-id")
+    visible = products.filter(visible=True)
+
+    return {
+        "in_stock": list(visible.filter(in_stock=True)),
+        "best_seller": list(visible.filter(best_seller=True)),
+        "special_offer": list(visible.filter(special_offer=True)),
+        "featured": list(visible.filter(featured=True)),
+        "top_categories": menu_categories(),
+        "just_arrived": list(visible.filter(just_arrived=True)),
+        "just_arrived2": list(
+            visible.filter(just_arrived=True).order_by("-id")
+        ),
+        "all_products": list(visible),
+        "min_max_price": Product.objects.aggregate(Min("price"), Max("price")),
+        "blog_categories": list(
+            BlogCategory.objects.all().order_by("-created_at")
+        ),
+        "blog_posts": list(Post.objects.all().order_by("-created_at")),
+        "banners": list(Banner.objects.all().order_by("-created_at")),
+        # The deal window is checked on read, so the snapshot keeps every
+        # candidate instead of the one that happened to be live at build time
+        "deal_candidates": list(products.filter(deal_of_the_week=True)),
+    }
+
+
+def build_header_snapshot():
+    """
+    The sections every page's header renders, on their own so pages that
+    need nothing else don't build the whole snapshot.
+    """
+    return {"top_categories": menu_categories()}
+
+
+def get_header_snapshot():
+    key = versioned_key(CATALOG_NAMESPACE, "storefront", "header")
+    header = cache.get(key)
+    if header is None:
+        header = build_header_snapshot()
+        cache.set(key, header, settings.STOREFRONT_CACHE_TIMEOUT)
+    return header
+
+
+def get_storefront_snapshot():
+    """
+    Return the cached storefront snapshot for the current catalog version,
+    building and storing it on a miss.
+    """
+    key = versioned_key(CATALOG_NAMESPACE, "storefront")
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_storefront_snapshot()
+        cache.set(key, snapshot, settings.STOREFRONT_CACHE_TIMEOUT)
+    return snapshot
+
+
+def current_deal(snapshot):
+    """
+    Pick the first deal candidate whose window contains the current time.
+    """
+    now = timezone.now()
+    for product in snapshot["deal_candidates"]:
+        if (
+            product.deal_start_date
+            and product.deal_end_date
+            and product.deal_start_date <= now <= product.deal_end_date
+        ):
+            return product
+    return None
+
+
+class LazyStorefront:
+    """
+    Per-request handle on the storefront snapshot.
+
+    Sections are handed to templates as lazy objects; the snapshot is only
+    fetched from the cache (or built) the first time a template actually
+    touches one of them, and at most once per request. Header sections
+    come from the smaller header snapshot unless the full one is loaded.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._header = None
+
+    def snapshot(self):
+        if self._snapshot is None:
+            self._snapshot = get_storefront_snapshot()
+        return self._snapshot
+
+    def header(self):
+        if self._snapshot is not None:
+            return self._snapshot
+        if self._header is None:
+            self._header = get_header_snapshot()
+        return self._header
+
+    def section(self, name):
+        if name in HEADER_SECTIONS:
+            return SimpleLazyObject(lambda: self.header()[name])
+        if name == "deal_product":
+            return SimpleLazyObject(lambda: current_deal(self.snapshot()))
+        if name == "catalog_facets":
+            # facets imports this module for the catalog namespace
+            from acctmarket2.applications.ecommerce.facets import \
+                sidebar_facets
+
+            return SimpleLazyObject(
+                lambda: sidebar_facets(self.snapshot()["top_categories"])
+            )
+        return SimpleLazyObject(lambda: self.snapshot()[name])
+
+    def sections(self, names=None):
+        return {
+            name: self.section(name)
+            for name in (names or STOREFRONT_SECTIONS)
+        }
+
+
+class StorefrontSectionsMixin:
+    """
+    Lets a view declare which storefront sections its template renders.
+
+    Sections left out are not put in the template context at all. Leaving
+    ``storefront_sections`` as ``None`` keeps every section available.
+    """
+
+    storefront_sections = None
+
+    def dispatch(self, request, *args, **kwargs):
+        request.storefront_sections = self.storefront_sections
+        return super().dispatch(request, *args, **kwargs)
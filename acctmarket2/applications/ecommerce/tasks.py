@@ -0,0 +1,163 @@
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sites.models import Site
+from django.core.mail import send_mail
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from acctmarket2.applications.ecommerce.keys import (allocate_order_keys,
+                                                     missing_keys)
+from acctmarket2.applications.ecommerce.models import (CartOrder, Payment,
+                                                       PaymentEvent, Product)
+from acctmarket2.applications.jobs.queue import job
+from acctmarket2.applications.jobs.tasks import send_email
+
+logger = logging.getLogger(__name__)
+
+# NOWPayments statuses worth asking the API about; the others are progress
+# reports that are only recorded.
+VERIFY_STATUSES = {"confirmed", "finished", "failed", "expired", "refunded"}
+
+
+def order_delivered(order):
+    """
+    Whether every item of ``order`` already holds all its keys.
+    """
+    return not any(missing_keys(item) for item in order.order_items.all())
+
+
+def purchased_products_url():
+    domain = Site.objects.get_current().domain
+    return f"https://{domain}{reverse('ecommerce:purchased_products')}"
+
+
+@job()
+def verify_payment(payment_id, purchased_url):
+    """
+    Ask the gateway whether a payment went through and, if it did, queue
+    the delivery of the order. Gateway errors propagate so the job is
+    retried.
+    """
+    payment = Payment.objects.select_related("order").get(pk=payment_id)
+    if payment.status == "verified":
+        # Verified earlier, but the delivery may have run out of retries
+        if not order_delivered(payment.order):
+            deliver_order.delay(payment.order_id, purchased_url)
+        return
+
+    method = payment.order.payment_method
+    if method == "paystack":
+        verified = payment.verify_paystack_payment()
+    elif method == "nowpayments":
+        verified = payment.verify_payment_nowpayments()
+    else:
+        logger.error(f"Unknown payment method {method!r} for {payment}")
+        return
+
+    if verified:
+        deliver_order.delay(payment.order_id, purchased_url)
+
+
+@job()
+def deliver_order(order_id, purchased_url):
+    """
+    Assign keys to a paid order and email the buyer. Orders whose items
+    already hold all their keys are left alone, so duplicate deliveries
+    are harmless.
+    """
+    with transaction.atomic():
+        # Only the order row is locked; the user is an outer join
+        order = (
+            CartOrder.objects.select_for_update(of=("self",))
+            .select_related("user")
+            .get(pk=order_id)
+        )
+        if order_delivered(order):
+            return
+        short = allocate_order_keys(order)
+
+        for item in short:
+            notify_insufficient_keys.delay(order.user_id, item.product_id)
+        send_email.delay(
+            "Your Purchase is Complete",
+            f"Thank you for your purchase.\nYou can access your purchased products here: {purchased_url}",  # noqa
+            [order.user.email],
+        )
+
+
+@job()
+def notify_insufficient_keys(user_id, product_id):
+    # Send notification to user about the insufficient keys for the product
+    user = get_user_model().objects.get(pk=user_id)
+    product = Product.objects.get(pk=product_id)
+    send_mail(
+        "Insufficient Product Keys",
+        f"Dear {user.name or user.email},\n\nWe regret to inform you that there are insufficient keys available for the product '{product.title}'. Our team is working on resolving this issue.\n\nThank you for your understanding.",  # noqa
+        settings.DEFAULT_FROM_EMAIL,
+        [user.email],
+        fail_silently=False,
+    )
+
+
+def event_payment(event):
+    """
+    The payment an inbox event is about, found by order id or by the
+    gateway's payment id; ``None`` when neither matches.
+    """
+    order_id = str(event.payload.get("order_id", ""))
+    payment = None
+    if order_id.isdigit():
+        payment = (
+            Payment.objects.select_related("order")
+            .filter(order_id=order_id)
+            .first()
+        )
+    if payment is None and event.payment_id.isdigit():
+        payment = (
+            Payment.objects.select_related("order")
+            .filter(payment_id=event.payment_id)
+            .first()
+        )
+    return payment
+
+
+def awaiting_delivery(event):
+    """
+    Whether ``event`` is about a verified payment whose order still has
+    items without keys. Such an event isn't done even once processed.
+    """
+    if event.status not in VERIFY_STATUSES:
+        return False
+    payment = event_payment(event)
+    return (
+        payment is not None
+        and payment.status == "verified"
+        and not order_delivered(payment.order)
+    )
+
+
+@job()
+def process_payment_event(event_id):
+    """
+    Act on one inbox event. Verification and delivery are idempotent, so
+    an event processed twice after a crash does no harm. A processed event
+    is only skipped once its order has been delivered.
+    """
+    event = PaymentEvent.objects.get(pk=event_id)
+    if event.processed_at is not None and not awaiting_delivery(event):
+        return
+
+    if event.status in VERIFY_STATUSES:
+        payment = event_payment(event)
+        if payment is None:
+            logger.warning(f"No payment matches event {event}")
+        else:
+            # Already on a worker, so verify inline
+            verify_payment(payment.id, purchased_products_url())
+
+    PaymentEvent.objects.filter(pk=event.pk, processed_at__isnull=True).update(
+        processed_at=timezone.now()
+    )
@@ -0,0 +1,18 @@
+from django import template
+
+from acctmarket2.utils.images import image_url as build_image_url
+from acctmarket2.utils.images import responsive_image_context
+
+register = template.Library()
+
+
+@register.filter
+def image_url(image, size="card"):
+    return build_image_url(image, size)
+
+
+@register.inclusion_tag("partials/_responsive_image.html")
+def responsive_image(image, size="card", alt="", css_class="", lazy=True):
+    context = responsive_image_context(image, size)
+    context.update({"alt": alt, "css_class": css_class, "lazy": lazy})
+    return context
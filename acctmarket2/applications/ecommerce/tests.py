@@ -1 +1,830 @@
-# Create your tests here.
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.signals import user_logged_in
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+
+from acctmarket2.applications.ecommerce.cart import Cart
+from acctmarket2.applications.ecommerce.detail import (DETAIL_BUILD_QUERIES,
+                                                       DETAIL_REVIEWS_LIMIT,
+                                                       RELATED_PRODUCTS_LIMIT,
+                                                       VIEWER_QUERIES,
+                                                       build_product_detail,
+                                                       get_product_detail,
+                                                       viewer_state)
+from acctmarket2.applications.ecommerce.facets import FacetFilters, get_facets
+from acctmarket2.applications.ecommerce.images import ingest_product_images
+from acctmarket2.applications.ecommerce.keys import (allocate_order_keys,
+                                                     claim_pooled_keys,
+                                                     claim_table_keys)
+from acctmarket2.applications.ecommerce.models import (CartOrder,
+                                                       CartOrderItems,
+                                                       Category, Payment,
+                                                       PaymentEvent, Product,
+                                                       ProductImages,
+                                                       ProductKey,
+                                                       ProductRating,
+                                                       ProductRecommendations,
+                                                       ProductReview)
+from acctmarket2.applications.ecommerce.orders import expire_draft_orders
+from acctmarket2.applications.ecommerce.pricing import lookup_prices
+from acctmarket2.applications.ecommerce.ratings import rebuild_ratings
+from acctmarket2.applications.ecommerce.recommendations import (
+    rebuild_recommendations, refresh_recommendations)
+from acctmarket2.applications.ecommerce.search import search_products
+from acctmarket2.applications.ecommerce.storefront import (
+    bump_catalog_version, get_storefront_snapshot)
+from acctmarket2.applications.ecommerce.tasks import verify_payment
+from acctmarket2.applications.ecommerce.webhooks import nowpayments_signature
+from acctmarket2.applications.jobs.queue import get_backend, run_pending
+from acctmarket2.utils.uploads import LocalUploadBackend
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture()
+def drain_jobs(django_capture_on_commit_callbacks):
+    """
+    Run queued jobs, including the ones they queue in turn.
+    """
+    get_backend().clear()
+
+    def drain():
+        ran = True
+        while ran:
+            with django_capture_on_commit_callbacks(execute=True):
+                ran = run_pending()
+
+    yield drain
+    get_backend().clear()
+
+
+def make_product(**kwargs):
+    defaults = {
+        "title": "Product",
+        "price": Decimal("10.00"),
+        "oldprice": Decimal("12.00"),
+        "quantity_in_stock": 10,
+    }
+    defaults.update(kwargs)
+    return Product.objects.create(**defaults)
+
+
+class TestStorefrontSnapshot:
+    def test_snapshot_is_served_from_cache(self, django_assert_num_queries):
+        make_product(title="Cached")
+        get_storefront_snapshot()
+
+        with django_assert_num_queries(0):
+            snapshot = get_storefront_snapshot()
+
+        assert [p.title for p in snapshot["all_products"]] == ["Cached"]
+
+    def test_catalog_write_invalidates_snapshot(
+        self, django_capture_on_commit_callbacks
+    ):
+        get_storefront_snapshot()
+        with django_capture_on_commit_callbacks(execute=True):
+            Category.objects.create(title="Games")
+            make_product(title="New", best_seller=True)
+
+        snapshot = get_storefront_snapshot()
+
+        assert [c.title for c in snapshot["top_categories"]] == ["Games"]
+        assert [p.title for p in snapshot["best_seller"]] == ["New"]
+
+    def test_catalog_version_is_bumped_on_commit(
+        self, django_capture_on_commit_callbacks
+    ):
+        get_storefront_snapshot()
+        with django_capture_on_commit_callbacks() as callbacks:
+            make_product(title="Uncommitted", best_seller=True)
+            snapshot = get_storefront_snapshot()
+
+        assert snapshot["best_seller"] == []
+        assert bump_catalog_version in callbacks
+
+
+class TestLazyStorefrontContext:
+    def test_async_cart_partial_does_not_touch_storefront(
+        self, client, assert_view_queries
+    ):
+        make_product()
+        with assert_view_queries(0):
+            client.get("/ecommerce/update-to-cart?id=0&quantity=1")
+
+    def test_declared_sections_limit_context(self, client):
+        response = client.get("/shop")
+
+        assert "top_categories" in response.context
+        assert "banners" not in response.context
+
+
+class TestCart:
+    def test_totals_follow_line_changes(self, rf):
+        request = rf.get("/")
+        request.session = {}
+        request.user = AnonymousUser()
+        cart = Cart(request)
+
+        cart.add(1, "One", 2, "10.00", "")
+        cart.add(2, "Two", 1, "5.50", "")
+        cart.update(1, 3)
+        cart.remove(2)
+
+        assert len(cart) == 1
+        assert cart.total() == Decimal("30.00")
+        assert cart.items()["1"]["quantity"] == 3
+
+    def test_anonymous_cart_is_merged_on_login(self, rf, user):
+        request = rf.get("/")
+        request.session = {}
+        request.user = AnonymousUser()
+        Cart(request).add(7, "Seven", 2, "4.00", "")
+        Cart(request).add(8, "Eight", 1, "1.00", "")
+
+        request.user = user
+        Cart(request).add(7, "Seven", 1, "4.00", "")
+        user_logged_in.send(sender=user.__class__, request=request, user=user)
+
+        cart = Cart(request)
+        assert cart.items()["7"]["quantity"] == 2
+        assert cart.total() == Decimal("9.00")
+        assert "cart_token" not in request.session
+
+
+class TestCartPricing:
+    def test_add_to_cart_ignores_client_price(self, client):
+        product = make_product(title="Real", price=Decimal("9.99"))
+
+        response = client.get(
+            "/ecommerce/add-to-cart/",
+            {"id": product.id, "qty": 1, "price": "0.01", "title": "Fake"},
+        )
+
+        assert response.json()["data"]["price"] == "9.99"
+        assert response.json()["data"]["title"] == "Real"
+
+    def test_large_cart_checkout_uses_batched_lookups(
+        self, client, user, assert_max_view_queries
+    ):
+        client.force_login(user)
+        products = [make_product(title=f"P{i}") for i in range(100)]
+        for product in products:
+            client.get("/ecommerce/add-to-cart/", {"id": product.id, "qty": 2})
+
+        with assert_max_view_queries(15):
+            response = client.get("/ecommerce/checkout")
+
+        assert response.context["totalcartitems"] == 100
+        assert response.context["cart_total_amount"] == Decimal("2000.00")
+
+    def test_price_changes_reach_the_table_on_commit(
+        self, django_capture_on_commit_callbacks
+    ):
+        product = make_product(price=Decimal("9.99"))
+        lookup_prices([product.id])
+
+        product.price = Decimal("4.99")
+        with django_capture_on_commit_callbacks(execute=True):
+            product.save()
+            assert lookup_prices([product.id])[product.id].price == (
+                Decimal("9.99")
+            )
+
+        assert lookup_prices([product.id])[product.id].price == (
+            Decimal("4.99")
+        )
+
+
+class TestDraftOrders:
+    def test_checkout_reloads_reuse_one_draft(self, client, user):
+        client.force_login(user)
+        product = make_product()
+        client.get("/ecommerce/add-to-cart/", {"id": product.id, "qty": 3})
+
+        first = client.get("/ecommerce/checkout").context["order_id"]
+        second = client.get("/ecommerce/checkout").context["order_id"]
+
+        order = CartOrder.objects.get(id=first)
+        assert first == second
+        assert CartOrder.objects.count() == 1
+        assert order.order_items.get().quantity == 3
+
+    def test_changed_cart_rewrites_open_draft(self, client, user):
+        client.force_login(user)
+        product = make_product()
+        client.get("/ecommerce/add-to-cart/", {"id": product.id, "qty": 1})
+        first = client.get("/ecommerce/checkout").context["order_id"]
+
+        client.get("/ecommerce/add-to-cart/", {"id": product.id, "qty": 2})
+        second = client.get("/ecommerce/checkout").context["order_id"]
+
+        assert first == second
+        assert CartOrder.objects.get(id=first).price == Decimal("20.00")
+
+    def test_abandoned_drafts_expire(self, user):
+        CartOrder.objects.create(user=user, price=Decimal("1.00"))
+        CartOrder.objects.filter(user=user).update(
+            updated_at=timezone.now() - timedelta(days=3)
+        )
+
+        assert expire_draft_orders() == 1
+        assert not CartOrder.objects.exists()
+
+
+class TestKeyAllocation:
+    def test_order_keys_are_claimed_in_bulk(
+        self, user, django_assert_max_num_queries
+    ):
+        product = make_product(quantity_in_stock=3)
+        ProductKey.objects.bulk_create(
+            ProductKey(product=product, key=f"k{i}", password="p")
+            for i in range(3)
+        )
+        order = CartOrder.objects.create(user=user, price=Decimal("30.00"))
+        for quantity in (1, 2):
+            CartOrderItems.objects.create(
+                order=order,
+                product=product,
+                quantity=quantity,
+                price=product.price,
+                total=product.price * quantity,
+            )
+
+        with django_assert_max_num_queries(8):
+            short = allocate_order_keys(order)
+
+        product.refresh_from_db()
+        keys = [
+            entry["key"]
+            for item in order.order_items.all()
+            for entry in item.keys_and_passwords
+        ]
+        assert short == []
+        assert sorted(keys) == ["k0", "k1", "k2"]
+        assert product.quantity_in_stock == 0
+        assert not product.visible
+
+    def test_shortage_is_reported(self, user):
+        product = make_product(quantity_in_stock=1)
+        ProductKey.objects.create(product=product, key="only", password="p")
+        order = CartOrder.objects.create(user=user, price=Decimal("20.00"))
+        item = CartOrderItems.objects.create(
+            order=order,
+            product=product,
+            quantity=2,
+            price=product.price,
+            total=product.price * 2,
+        )
+
+        assert allocate_order_keys(order) == [item]
+
+    def test_pooled_keys_are_left_to_the_pool(self):
+        product = make_product(quantity_in_stock=3)
+        pooled = ProductKey.objects.create(
+            product=product, key="pooled", password="p",
+            reserved_at=timezone.now(),
+        )
+        ProductKey.objects.create(
+            product=product, key="stale", password="p",
+            reserved_at=timezone.now() - timedelta(days=1),
+        )
+
+        keys = claim_table_keys(product.id, 3)
+        assert [entry["key"] for entry in keys] == ["stale"]
+
+        assert claim_pooled_keys([pooled.id]) == [
+            {"key": "pooled", "password": "p"}
+        ]
+        # The same id popped twice is never issued twice
+        assert claim_pooled_keys([pooled.id]) == []
+
+
+class TestPaymentJobs:
+    @pytest.fixture()
+    def item(self, user):
+        product = make_product(quantity_in_stock=2)
+        ProductKey.objects.create(product=product, key="k", password="p")
+        order = CartOrder.objects.create(
+            user=user, price=product.price, payment_method="nowpayments"
+        )
+        return CartOrderItems.objects.create(
+            order=order,
+            product=product,
+            quantity=1,
+            price=product.price,
+            total=product.price,
+        )
+
+    def post_ipn(self, client, order, payment_status, capture):
+        with capture(execute=True):
+            response = client.post(
+                "/ecommerce/ipn/",
+                {
+                    "order_id": str(order.id),
+                    "payment_id": 5077,
+                    "payment_status": payment_status,
+                },
+                content_type="application/json",
+            )
+        return response.json()["status"]
+
+    def test_ipn_is_recorded_once_and_delivered_once(
+        self, client, user, item, monkeypatch, mailoutbox, drain_jobs,
+        django_capture_on_commit_callbacks,
+    ):
+        payment = Payment.objects.create(
+            user=user, order=item.order, amount=item.price
+        )
+
+        def confirm(self):
+            self.status = "verified"
+            self.save()
+            return True
+
+        monkeypatch.setattr(Payment, "verify_payment_nowpayments", confirm)
+
+        statuses = [
+            self.post_ipn(
+                client,
+                item.order,
+                payment_status,
+                django_capture_on_commit_callbacks,
+            )
+            for payment_status in ("waiting", "finished", "finished")
+        ]
+        assert statuses == ["queued", "queued", "duplicate"]
+        assert mailoutbox == []
+
+        drain_jobs()
+
+        item.refresh_from_db()
+        payment.refresh_from_db()
+        assert payment.status == "verified"
+        assert item.unique_keys_list() == ["k"]
+        assert len(mailoutbox) == 1
+        assert mailoutbox[0].to == [user.email]
+        assert not PaymentEvent.objects.filter(processed_at__isnull=True)
+
+    def test_cart_is_kept_until_verification_settles(
+        self, client, user, item, django_capture_on_commit_callbacks
+    ):
+        client.force_login(user)
+        client.get("/ecommerce/add-to-cart/", {"id": item.product_id})
+        payment = Payment.objects.create(
+            user=user, order=item.order, amount=item.price
+        )
+        pending = f"/ecommerce/payment-pending/?payment_reference={payment.reference}"  # noqa
+
+        with django_capture_on_commit_callbacks():
+            response = client.get(
+                f"/ecommerce/verify/nowpayment/{payment.reference}/"
+            )
+        assert response.url == pending
+        assert client.get(pending).status_code == 200
+        assert client.get("/ecommerce/checkout").context["totalcartitems"]
+
+        Payment.objects.filter(pk=payment.pk).update(status="failed")
+        assert client.get(pending).url == "/ecommerce/payment-failed"
+
+        Payment.objects.filter(pk=payment.pk).update(status="verified")
+        assert client.get(pending).url.startswith(
+            "/ecommerce/payment-complete/"
+        )
+
+    def test_verified_payment_redelivers_an_undelivered_order(
+        self, user, item, mailoutbox, drain_jobs,
+        django_capture_on_commit_callbacks,
+    ):
+        payment = Payment.objects.create(
+            user=user, order=item.order, amount=item.price, status="verified"
+        )
+
+        # The first delivery never ran; each replay checks the keys
+        for _ in range(2):
+            with django_capture_on_commit_callbacks(execute=True):
+                verify_payment(payment.id, "https://example.com/purchased")
+            drain_jobs()
+
+        item.refresh_from_db()
+        assert item.unique_keys_list() == ["k"]
+        assert len(mailoutbox) == 1
+
+    def test_replayed_ipn_repairs_an_undelivered_order(
+        self, client, user, item, mailoutbox, drain_jobs,
+        django_capture_on_commit_callbacks,
+    ):
+        Payment.objects.create(
+            user=user, order=item.order, amount=item.price, status="verified"
+        )
+        # Processed while delivery was failing, so no keys went out
+        PaymentEvent.objects.create(
+            provider="nowpayments",
+            payment_id="5077",
+            status="finished",
+            payload={"order_id": str(item.order_id)},
+            processed_at=timezone.now(),
+        )
+
+        status = self.post_ipn(
+            client, item.order, "finished", django_capture_on_commit_callbacks
+        )
+        drain_jobs()
+        replayed = self.post_ipn(
+            client, item.order, "finished", django_capture_on_commit_callbacks
+        )
+        drain_jobs()
+
+        item.refresh_from_db()
+        assert (status, replayed) == ("duplicate", "duplicate")
+        assert item.unique_keys_list() == ["k"]
+        assert len(mailoutbox) == 1
+
+    def test_ipn_signature_is_checked(self, client, settings):
+        settings.NOWPAYMENTS_IPN_SECRET = "secret"
+        data = {"payment_id": 1, "payment_status": "finished"}
+
+        response = client.post(
+            "/ecommerce/ipn/",
+            data,
+            content_type="application/json",
+            HTTP_X_NOWPAYMENTS_SIG="forged",
+        )
+        assert response.status_code == 401
+
+        response = client.post(
+            "/ecommerce/ipn/",
+            data,
+            content_type="application/json",
+            HTTP_X_NOWPAYMENTS_SIG=nowpayments_signature(data, "secret"),
+        )
+        assert response.status_code == 200
+        assert PaymentEvent.objects.count() == 1
+
+
+class TestPaymentIds:
+    def test_new_payment_needs_no_lookups(
+        self, user, django_assert_num_queries
+    ):
+        order = CartOrder.objects.create(user=user, price=Decimal("5.00"))
+        Payment.generate_payment_id()
+
+        with django_assert_num_queries(1):
+            payment = Payment.objects.create(
+                user=user, order=order, amount=order.price
+            )
+
+        assert payment.payment_id > 0
+        assert len(payment.reference) == 26
+
+
+class TestImageIngestion:
+    def test_failed_upload_does_not_block_the_rest(
+        self, monkeypatch, django_assert_num_queries
+    ):
+        product = make_product()
+        upload = LocalUploadBackend.upload
+
+        def flaky(self, file, folder, public_id):
+            if file.name == "broken.jpg":
+                raise OSError("upload rejected")
+            return upload(self, file, folder, public_id)
+
+        monkeypatch.setattr(LocalUploadBackend, "upload", flaky)
+        files = [
+            SimpleUploadedFile(name, b"jpeg-bytes")
+            for name in ("one.jpg", "broken.jpg", "two.jpg")
+        ]
+
+        with django_assert_num_queries(1):
+            results = ingest_product_images(product, files, max_workers=3)
+
+        assert [result.name for result in results] == [
+            "one.jpg", "broken.jpg", "two.jpg"
+        ]
+        assert [result.ok for result in results] == [True, False, True]
+        assert results[1].error == "upload rejected"
+        assert results[0].public_id.endswith("-one")
+        stored = ProductImages.objects.filter(product=product).order_by("id")
+        assert [
+            (image.image.public_id, image.image.format) for image in stored
+        ] == [(results[0].public_id, "jpg"), (results[2].public_id, "jpg")]
+
+
+class TestProductSearch:
+    def test_title_hits_rank_above_description_hits(self):
+        make_product(
+            title="Office bundle", description="<p>Netflix inside</p>"
+        )
+        make_product(title="Netflix premium")
+
+        titles = [p.title for p in search_products("netflix")]
+
+        assert titles == ["Netflix premium", "Office bundle"]
+
+    def test_tags_and_category_are_searchable(
+        self, drain_jobs, django_capture_on_commit_callbacks
+    ):
+        category = Category.objects.create(title="Streaming")
+        product = make_product(title="Premium account", category=category)
+        product.tags.add("music")
+
+        assert list(search_products("music")) == [product]
+        assert list(search_products("streaming")) == [product]
+
+        category.title = "Gaming"
+        with django_capture_on_commit_callbacks(execute=True):
+            category.save()
+        drain_jobs()
+        assert list(search_products("gaming")) == [product]
+
+    def test_missing_query_returns_no_results(self, client):
+        make_product(title="Anything")
+
+        response = client.get("/search")
+
+        assert response.status_code == 200
+        assert list(response.context["all_products"]) == []
+
+
+class TestFacets:
+    @pytest.fixture()
+    def catalog(self, settings):
+        settings.FACET_PAGE_SIZE = 4
+        games = Category.objects.create(title="Games")
+        music = Category.objects.create(title="Music")
+        for i in range(5):
+            make_product(title=f"Game {i}", category=games, price=Decimal(i))
+        for i in range(3):
+            make_product(title=f"Song {i}", category=music, price=Decimal(30))
+        return games, music
+
+    def test_counts_ignore_their_own_facet(self, catalog):
+        games, music = catalog
+
+        result = get_facets(FacetFilters(categories=(games.id,), page=2))
+
+        assert result.count == 5
+        assert result.num_pages == 2
+        assert len(result.product_ids) == 1
+        assert result.categories == {games.id: 5, music.id: 3}
+        assert [count for *_, count in result.prices] == [5, 0, 0, 0, 0, 0]
+
+    def test_results_are_cached_until_the_catalog_changes(
+        self,
+        catalog,
+        django_assert_num_queries,
+        django_capture_on_commit_callbacks,
+    ):
+        games, _ = catalog
+        get_facets()
+
+        with django_assert_num_queries(0):
+            assert get_facets().count == 8
+
+        with django_capture_on_commit_callbacks(execute=True):
+            make_product(title="Game 5", category=games)
+        assert get_facets().count == 9
+
+    def test_filter_view_returns_a_page_and_counts(self, client, catalog):
+        games, _ = catalog
+
+        response = client.get(
+            "/filter-product/", {"category[]": [games.id], "max_price": "2"}
+        )
+
+        facets = response.json()["facets"]
+        assert facets["count"] == 3
+        assert facets["num_pages"] == 1
+        assert response.json()["data"].count("product-single") == 3
+
+
+class TestCursorPagination:
+    def test_pages_cover_the_listing_once(
+        self, client, django_assert_max_num_queries
+    ):
+        created = [make_product(title=f"P{i}").id for i in range(20)]
+        client.get("/shop")
+
+        seen = []
+        url = "/shop"
+        while url:
+            with django_assert_max_num_queries(3):
+                response = client.get(url)
+            seen += [p.id for p in response.context["all_products"]]
+            url = response.context["next_page_url"]
+
+        assert seen == created[::-1]
+        assert response.context["page_obj"].count == 20
+
+        previous = client.get(response.context["previous_page_url"])
+        assert [p.id for p in previous.context["all_products"]] == (
+            created[::-1][8:16]
+        )
+
+    def test_json_feed_and_bad_cursor(self, client):
+        for i in range(10):
+            make_product(title=f"P{i}")
+
+        first = client.get("/shop", {"format": "json"}).json()
+        second = client.get(first["next"] + "&format=json").json()
+        tampered = client.get("/shop", {"cursor": "forged"})
+
+        assert first["data"].count("product-single") == 8
+        assert second["data"].count("product-single") == 2
+        assert second["next"] is None
+        assert len(tampered.context["all_products"]) == 8
+
+
+class TestRatingSummary:
+    def test_summary_follows_review_writes(self, user):
+        product = make_product()
+        first = ProductReview.objects.create(
+            user=user, product=product, review="Good", rating=4
+        )
+        ProductReview.objects.create(
+            user=user, product=product, review="Great", rating=5
+        )
+
+        first.rating = 2
+        first.save()
+        ProductReview.objects.filter(rating=5).get().delete()
+
+        ratings = ProductRating.objects.get(product=product)
+        assert (ratings.count, ratings.total, ratings.average) == (1, 2, 2)
+        assert ratings.histogram == {1: 0, 2: 1, 3: 0, 4: 0, 5: 0}
+
+    def test_rebuild_recomputes_from_reviews(self, user):
+        product = make_product()
+        ProductReview.objects.create(
+            user=user, product=product, review="Fine", rating=3
+        )
+        # update() bypasses the signals
+        ProductReview.objects.update(rating=5)
+
+        assert rebuild_ratings() == 1
+        assert product.ratings.histogram[5] == 1
+        assert make_product().ratings.count == 0
+
+    def test_cards_render_stars_without_reviews_queries(
+        self, client, user, django_assert_max_num_queries
+    ):
+        product = make_product()
+        ProductReview.objects.create(
+            user=user, product=product, review="Great", rating=5
+        )
+        client.get("/shop")
+
+        with django_assert_max_num_queries(3) as captured:
+            response = client.get("/shop")
+
+        assert not any(
+            ProductReview._meta.db_table in query["sql"]
+            for query in captured.captured_queries
+        )
+        assert '<span class="rating-quantity">(1)</span>' in (
+            response.content.decode()
+        )
+
+
+class TestProductDetail:
+    @pytest.fixture()
+    def product(self, user):
+        category = Category.objects.create(title="Games")
+        Category.objects.create(title="Steam", sub_category=category)
+        product = make_product(category=category)
+        product.tags.add("steam", "gift")
+        for index in range(15):
+            make_product(title=f"Related {index}", category=category)
+        ProductImages.objects.bulk_create(
+            [ProductImages(product=product, image="img.png") for _ in range(3)]
+        )
+        ProductReview.objects.bulk_create(
+            [
+                ProductReview(user=user, product=product, review="Ok")
+                for _ in range(30)
+            ]
+        )
+        return product
+
+    def test_build_stays_within_budget(
+        self, product, django_assert_num_queries
+    ):
+        with django_assert_num_queries(DETAIL_BUILD_QUERIES):
+            detail = build_product_detail(product.pk)
+            # Everything the template reads is already loaded
+            [review.user.name for review in detail.reviews]
+            [p.category.title for p in detail.related]
+            detail.product.ratings.count
+
+        assert len(detail.related) == RELATED_PRODUCTS_LIMIT
+        assert len(detail.reviews) == DETAIL_REVIEWS_LIMIT
+        assert {tag.name for tag in detail.tags} == {"steam", "gift"}
+
+    def test_cached_page_only_queries_the_viewer(
+        self, product, user, client, assert_max_view_queries,
+        django_assert_num_queries,
+    ):
+        url = f"/product/{product.pk}/"
+        client.get(url)
+
+        with assert_max_view_queries(3) as captured:
+            response = client.get(url)
+        assert response.status_code == 200
+        assert not any(
+            table in query["sql"]
+            for query in captured.captured_queries
+            for table in (
+                Product._meta.db_table,
+                ProductReview._meta.db_table,
+                ProductImages._meta.db_table,
+            )
+        )
+
+        detail = get_product_detail(product.pk)
+        with django_assert_num_queries(VIEWER_QUERIES):
+            state = viewer_state(detail, user)
+        assert state == {"make_review": False, "in_wishlist": False}
+
+    def test_deleted_reviews_leave_the_page(
+        self, product, django_capture_on_commit_callbacks
+    ):
+        before = len(get_product_detail(product.pk).reviews)
+        with django_capture_on_commit_callbacks(execute=True):
+            ProductReview.objects.filter(product=product).delete()
+
+        assert before == DETAIL_REVIEWS_LIMIT
+        assert get_product_detail(product.pk).reviews == []
+        assert get_product_detail(0) is None
+
+
+class TestRecommendations:
+    def paid_order(self, user, *products):
+        order = CartOrder.objects.create(
+            user=user, price=Decimal("20.00"), paid_status=True
+        )
+        for product in products:
+            CartOrderItems.objects.create(
+                order=order,
+                product=product,
+                price=product.price,
+                total=product.price,
+            )
+        return order
+
+    def test_purchases_outrank_tags_and_category(self, user):
+        category = Category.objects.create(title="Games")
+        product = make_product(category=category)
+        bought = make_product(title="Bought")
+        tagged = make_product(title="Tagged")
+        sibling = make_product(title="Sibling", category=category)
+        hidden = make_product(title="Hidden", visible=False)
+        product.tags.add("steam")
+        tagged.tags.add("steam")
+        self.paid_order(user, product, bought, hidden)
+
+        rebuild_recommendations()
+
+        assert ProductRecommendations.objects.get(
+            product=product
+        ).product_ids == [bought.pk, tagged.pk, sibling.pk]
+
+    def test_refresh_only_recomputes_stale_products(self, user):
+        first, second, _ = (make_product(title=f"P{i}") for i in range(3))
+
+        assert refresh_recommendations() == 3
+        assert refresh_recommendations() == 0
+
+        self.paid_order(user, first, second)
+
+        assert refresh_recommendations() == 2
+        assert ProductRecommendations.objects.get(
+            product=first
+        ).product_ids == [second.pk]
+
+    def test_product_page_reads_the_index(
+        self, user, django_assert_num_queries
+    ):
+        product = make_product()
+        bought = make_product(title="Bought")
+        self.paid_order(user, product, bought)
+        rebuild_recommendations()
+
+        with django_assert_num_queries(DETAIL_BUILD_QUERIES):
+            detail = build_product_detail(product.pk)
+        assert detail.related == [bought]
+
+        Product.objects.filter(pk=bought.pk).update(in_stock=False)
+        assert build_product_detail(product.pk).related == []
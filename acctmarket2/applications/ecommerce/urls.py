@@ -98,6 +98,11 @@ urlpatterns = [
         views.PaymentCompleteView.as_view(),
         name="payment_complete",
     ),
+    path(
+        "payment-pending/",
+        views.PaymentPendingView.as_view(),
+        name="payment_pending",
+    ),
     path(
         "payment-failed",
         views.PaymentFailedView.as_view(),
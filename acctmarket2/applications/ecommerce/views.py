@@ -3,13 +3,10 @@ import logging
 from decimal import Decimal
 
 import requests
-from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 # from django.core.exceptions import ValidationError
-from django.core.mail import send_mail
-from django.db import transaction
-from django.db.models import Avg, Count
+from django.db.models import Count
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
@@ -19,19 +16,29 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import (CreateView, DeleteView, FormView, ListView,
                                   TemplateView, UpdateView, View)
 
+from acctmarket2.applications.ecommerce.cart import Cart
 from acctmarket2.applications.ecommerce.forms import (CategoryForm,
                                                       ProductForm,
                                                       ProductImagesForm,
                                                       ProductKeyFormSet,
                                                       ProductReviewForm)
+from acctmarket2.applications.ecommerce.images import ingest_product_images
 from acctmarket2.applications.ecommerce.models import (CartOrder,
                                                        CartOrderItems,
                                                        Category, Payment,
                                                        Product, ProductImages,
-                                                       ProductKey,
+                                                       ProductRating,
                                                        ProductReview, WishList)
-from acctmarket2.utils.payments import (NowPayment, convert_to_naira,
+from acctmarket2.applications.ecommerce.orders import get_or_create_draft_order
+from acctmarket2.applications.ecommerce.pricing import lookup_price, price_cart
+from acctmarket2.applications.ecommerce.storefront import (
+    HEADER_SECTIONS, StorefrontSectionsMixin)
+from acctmarket2.applications.ecommerce.tasks import verify_payment
+from acctmarket2.applications.ecommerce.webhooks import (
+    NOWPAYMENTS, record_event, verify_nowpayments_signature)
+from acctmarket2.utils.payments import (NowPayment, PayStack, convert_to_naira,
                                         get_exchange_rate)
+from acctmarket2.utils.rates import RatesUnavailable
 from acctmarket2.utils.views import ContentManagerRequiredMixin
 
 logger = logging.getLogger(__name__)
@@ -80,6 +87,15 @@ class DeleteCategoryView(ContentManagerRequiredMixin, DeleteView):
 # ---------------------- Category views ends here ----------------
 
 
+def report_ingestion(request, results):
+    uploaded = sum(result.ok for result in results)
+    if uploaded:
+        messages.success(request, f"Uploaded {uploaded} of {len(results)} images.")  # noqa
+    for result in results:
+        if not result.ok:
+            messages.error(request, f"{result.name}: {result.error}")
+
+
 class ProductImagesCreateView(ContentManagerRequiredMixin, FormView):
     template_name = "pages/ecommerce/create_product_image.html"
     form_class = ProductImagesForm
@@ -87,8 +103,12 @@ class ProductImagesCreateView(ContentManagerRequiredMixin, FormView):
 
     def form_valid(self, form):
         product = form.cleaned_data["product"]
-        for each in self.request.FILES.getlist("image"):
-            ProductImages.objects.create(image=each, product=product)
+        report_ingestion(
+            self.request,
+            ingest_product_images(
+                product, self.request.FILES.getlist("image")
+            ),
+        )
         return super().form_valid(form)
 
 
@@ -107,8 +127,9 @@ class UpdateProductImages(ContentManagerRequiredMixin, UpdateView):
     def form_valid(self, form):
         product = form.cleaned_data["product"]
         images = self.request.FILES.getlist("image")
-        for image in images:
-            ProductImages.objects.create(product=product, image=image)
+        report_ingestion(
+            self.request, ingest_product_images(product, images)
+        )
         return super().form_valid(form)
 
 
@@ -234,17 +255,15 @@ class AddReviewsView(LoginRequiredMixin, CreateView):
             given primary key does not exist.
         """
 
-        # Check if the user is authenticated and if the user has
-        # added a review already
-        product = form.instance.product
-
         form.instance.user = self.request.user
         form.instance.product = Product.objects.get(pk=self.kwargs["pk"])
         self.object = form.save()
 
-        average_review = ProductReview.objects.filter(product=product).aggregate(   # noqa
-            rating=Avg("rating"),
-        )
+        # The summary was updated with F(), so read it back from the row
+        ratings = ProductRating.objects.filter(
+            product_id=self.kwargs["pk"]
+        ).first()
+        average_review = {"rating": ratings.average if ratings else None}
 
         context = {
             "user": self.request.user.name,
@@ -276,7 +295,7 @@ class AddReviewsView(LoginRequiredMixin, CreateView):
 class AddToCartView(View):
     def get(self, request, *args, **kwargs):
         """
-        Adds a product to the cart session data.
+        Adds a product to the server-side cart.
 
         Parameters:
             request (HttpRequest): The HTTP request object.
@@ -284,52 +303,50 @@ class AddToCartView(View):
             **kwargs: Arbitrary keyword arguments.
 
         Returns:
-            JsonResponse: A JSON response containing the updated cart
-            data and the total number of items in the cart.
+            JsonResponse: A JSON response containing the added cart
+            line and the total number of items in the cart.
 
         Description:
-            This function is used to add a product to the cart session data.
-            It takes the request object as a parameter,
-            along with any additional arguments and keyword arguments.
-            The function retrieves the product details from the request
-            GET parameters
-            and creates a dictionary representation of the product.
-            It then checks if there is already a cart data object
-            in the session.
-            If there is, it updates the quantity of the product
-            if it already exists in the cart, otherwise
-            it adds the product to the cart data. Finally,
-            it returns a JSON response containing the updated
-            cart data and the total number of items in the cart.
+            The product id and quantity are read from the request GET
+            parameters; title, price and image are looked up in the
+            price table. The line is written as a single line of the cart.
+            If the product is already in the cart its quantity is replaced.
+            Only the changed line is sent back, not the whole cart.
         """
+        product = lookup_price(request.GET.get("id"))
+        if product is None or not product.purchasable:
+            return JsonResponse(
+                {"error": "This product is not available."},
+                status=404,
+            )
 
-        cart_product = {
-            str(request.GET.get("id")): {
-                "title": request.GET.get("title"),
-                "quantity": request.GET.get("qty"),
-                "price": request.GET.get("price"),
-                "image": request.GET.get("image"),
-                "pid": request.GET.get("product_id"),
-            },
-        }
+        try:
+            quantity = int(request.GET.get("qty", 1))
+        except ValueError:
+            quantity = 0
+        if quantity < 1 or (
+            product.quantity_in_stock is not None
+            and quantity > product.quantity_in_stock
+        ):
+            return JsonResponse(
+                {"error": "Invalid quantity."},
+                status=400,
+            )
 
-        if "cart_data_obj" in request.session:
-            cart_data = request.session["cart_data_obj"]
-            product_id = str(request.GET.get("id"))
-            if product_id in cart_data:
-                cart_data[product_id]["quantity"] = int(
-                    cart_product[product_id]["quantity"],
-                )
-            else:
-                cart_data.update(cart_product)
-            request.session["cart_data_obj"] = cart_data
-        else:
-            request.session["cart_data_obj"] = cart_product
+        # Title, price and image come from the price table, never from
+        # the request.
+        line, count = Cart(request).add(
+            product.id,
+            product.title,
+            quantity,
+            product.price,
+            product.image,
+        )
 
         return JsonResponse(
             {
-                "data": request.session["cart_data_obj"],
-                "totalcartitems": len(request.session["cart_data_obj"]),
+                "data": line,
+                "totalcartitems": count,
             },
         )
 
@@ -340,12 +357,10 @@ class AddToCartView(View):
 
 class CartListView(TemplateView):
     """
-    A view that displays the cart items and calculates the total amount.
+    A view that displays the cart items and the total amount.
 
-    This view retrieves the cart data from the session and calculates
-    the total amount
-    based on the quantity and price of each item in the cart. It then renders
-      the
+    This view reads the cart lines and the running total from the
+    server-side cart and renders the
     "pages/ecommerce/cart_list.html" template, passing the cart data, total
     cart items,
     and total amount as context variables.
@@ -358,10 +373,9 @@ class CartListView(TemplateView):
         Handles GET requests and checks if the cart is empty.
         Redirects to the home page with a warning message if the cart is empty.
         """
-        if (
-            "cart_data_obj" not in request.session
-            or not request.session["cart_data_obj"]
-        ):
+        self.cart = Cart(request)
+        self.cart_data = self.cart.items()
+        if not self.cart_data:
             messages.warning(request, "Your cart is empty.")
             return redirect("homeapp:home")
         return super().get(request, *args, **kwargs)
@@ -375,18 +389,13 @@ class CartListView(TemplateView):
 
         Returns:
             dict: The context data containing the following keys:
-                - cart_data (dict): The cart data stored in the session.
+                - cart_data (dict): The cart lines keyed by product id.
                 - totalcartitems (int): The total number of items in the cart.
-                - cart_total_amount (float): The total amount of the items
+                - cart_total_amount (Decimal): The total amount of the items
                 in the cart.
         """
         context = super().get_context_data(**kwargs)
-        cart_total_amount = 0
-        cart_data = self.request.session["cart_data_obj"]
-
-        for product_id, item in cart_data.items():
-            cart_total_amount += int(item["quantity"]) * float(item["price"])
-
+        cart_data, cart_total_amount = price_cart(self.cart_data)
         context["cart_data"] = cart_data
         context["totalcartitems"] = len(cart_data)
         context["cart_total_amount"] = cart_total_amount
@@ -398,132 +407,85 @@ class CartListView(TemplateView):
 # ---------------------- Cart List  ends here ----------------
 
 
-class DeleteFromCartView(View):
-    def get(self, request, *args, **kwargs):
-        product_id = str(request.GET.get("id"))
-        self.remove_item_from_cart(request, product_id)
-
-        cart_total_amount = self.calculate_cart_total(request)
+class CartPartialMixin:
+    """
+    Renders the async cart partial for the JSON cart endpoints.
+    """
 
+    def render_cart(self, cart):
+        cart_data = cart.items()
         context = render_to_string(
             "pages/async/cart_list.html",
             {
-                "cart_data": request.session.get("cart_data_obj", {}),
-                "totalcartitems": len(request.session.get(
-                    "cart_data_obj", {})),
-                "cart_total_amount": cart_total_amount,
+                "cart_data": cart_data,
+                "totalcartitems": len(cart_data),
+                "cart_total_amount": cart.total(),
             },
         )
         return JsonResponse(
             {
                 "data": context,
-                "totalcartitems": len(request.session.get(
-                    "cart_data_obj", {})),
+                "totalcartitems": len(cart_data),
             },
         )
 
-    def remove_item_from_cart(self, request, product_id):
-        if "cart_data_obj" in request.session:
-            cart_data = request.session["cart_data_obj"]
-            if product_id in cart_data:
-                del cart_data[product_id]
-                request.session["cart_data_obj"] = cart_data
 
-    def calculate_cart_total(self, request):
-        cart_total_amount = 0
-        if "cart_data_obj" in request.session:
-            for item in request.session["cart_data_obj"].values():
-                cart_total_amount += int(
-                    item["quantity"]) * float(item["price"])
-        return cart_total_amount
+class DeleteFromCartView(CartPartialMixin, View):
+    def get(self, request, *args, **kwargs):
+        cart = Cart(request)
+        cart.remove(str(request.GET.get("id")))
+        return self.render_cart(cart)
 
 
 # ---------------------------  ----------------------------------
 # ---------------------- Delete from cart  ends here ----------------
 
 
-class UpdateCartView(View):
+class UpdateCartView(CartPartialMixin, View):
     def get(self, request, *args, **kwargs):
         product_id = str(request.GET.get("id"))
-        new_quantity = int(request.GET.get("quantity", 1))
-        self.update_item_in_cart(request, product_id, new_quantity)
-
-        cart_total_amount = self.calculate_cart_total(request)
-
-        context = render_to_string(
-            "pages/async/cart_list.html",
-            {
-                "cart_data": request.session.get("cart_data_obj", {}),
-                "totalcartitems": len(request.session.get(
-                    "cart_data_obj", {})),
-                "cart_total_amount": cart_total_amount,
-            },
-        )
-        return JsonResponse(
-            {
-                "data": context,
-                "totalcartitems": len(request.session.get(
-                    "cart_data_obj", {})),
-            },
-        )
-
-    def update_item_in_cart(self, request, product_id, new_quantity):
-        if "cart_data_obj" in request.session:
-            cart_data = request.session["cart_data_obj"]
-            if product_id in cart_data:
-                cart_data[product_id]["quantity"] = new_quantity
-                request.session["cart_data_obj"] = cart_data
+        try:
+            new_quantity = int(request.GET.get("quantity", 1))
+        except ValueError:
+            return JsonResponse({"error": "Invalid quantity."}, status=400)
 
-    def calculate_cart_total(self, request):
-        cart_total_amount = 0
-        if "cart_data_obj" in request.session:
-            for item in request.session["cart_data_obj"].values():
-                cart_total_amount += int(
-                    item["quantity"]) * float(item["price"])
-        return cart_total_amount
+        cart = Cart(request)
+        if new_quantity < 1:
+            cart.remove(product_id)
+        else:
+            cart.update(product_id, new_quantity)
+        return self.render_cart(cart)
 
 
 # ---------------------------  ----------------------------------
 # ---------------------- Update Cart  ends here ----------------
 
 
-class CheckoutView(LoginRequiredMixin, TemplateView):
-    template_name = "pages/ecommerce/checkout.html"
+class DraftOrderMixin:
+    """
+    Builds the checkout context around the user's draft order.
+
+    The draft is keyed on the priced cart, so reloading checkout or
+    proceeding to payment with the same cart reuses one order instead of
+    writing a new one every time.
+    """
+
+    def get(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        if context["order_id"] is None:
+            messages.warning(request, "Your cart is empty.")
+            return redirect("homeapp:home")
+        return self.render_to_response(context)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        cart_data = self.request.session.get("cart_data_obj", {})
-
-        cart_total_amount = sum(
-            Decimal(item["price"]) * int(item["quantity"])
-            for item in cart_data.values()
-        )
+        # One batched lookup re-prices every line
+        cart_data, cart_total_amount = price_cart(Cart(self.request).items())
 
-        order = CartOrder.objects.create(
-            user=self.request.user,
-            price=cart_total_amount,
-            paid_status=False,
+        order = get_or_create_draft_order(
+            self.request.user, cart_data, cart_total_amount
         )
 
-        order_items = []
-
-        for product_id, item in cart_data.items():
-            product = get_object_or_404(Product, id=product_id)
-            quantity = int(item["quantity"])
-
-            for _ in range(quantity):
-                order_item = CartOrderItems(
-                    order=order,
-                    product=product,
-                    invoice_no=f"INVOICE_NO_{order.id}",
-                    quantity=1,
-                    price=Decimal(item["price"]),
-                    total=Decimal(item["price"]),
-                )
-                order_items.append(order_item)
-
-        CartOrderItems.objects.bulk_create(order_items)
-
         user = self.request.user
         context.update(
             {
@@ -534,88 +496,37 @@ class CheckoutView(LoginRequiredMixin, TemplateView):
                 "cart_data": cart_data,
                 "totalcartitems": len(cart_data),
                 "cart_total_amount": cart_total_amount,
-                "order_price": order.price,
-                "order_id": order.id,
+                "order_price": order.price if order else None,
+                "order_id": order.id if order else None,
             },
         )
 
         return context
 
 
-class ProceedPayment(LoginRequiredMixin, TemplateView):
+class CheckoutView(
+    LoginRequiredMixin, StorefrontSectionsMixin, DraftOrderMixin, TemplateView
+):
     template_name = "pages/ecommerce/checkout.html"
+    storefront_sections = HEADER_SECTIONS
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        cart_data = self.request.session.get(
-            "cart_data_obj",
-            {},
-        )  # Fetch cart data from session
-
-        # Calculate total cart amount
-        cart_total_amount = sum(
-            Decimal(item["price"]) * int(item["quantity"])
-            for item in cart_data.values()
-        )
-
-        # Create an order in the database
-        order = CartOrder.objects.create(
-            user=self.request.user,
-            price=cart_total_amount,
-            paid_status=False,
-        )
-
-        # Create order items in the database
-        order_items = [
-            CartOrderItems(
-                order=order,
-                product=get_object_or_404(Product, id=product_id),
-                invoice_no=f"INVOICE_NO_{order.id}",
-                quantity=int(item["quantity"]),
-                price=Decimal(item["price"]),
-                total=Decimal(item["price"]) * int(item["quantity"]),
-            )
-            for product_id, item in cart_data.items()
-        ]
-
-        CartOrderItems.objects.bulk_create(order_items)
 
-        user = self.request.user
-        # Update context with necessary data
-        context.update(
-            {
-                "user_name": user.name,
-                "user_email": user.email,
-                "user_country": user.country,
-                "user_phone": user.phone_no,
-                "cart_data": cart_data,
-                "totalcartitems": len(cart_data),
-                "cart_total_amount": cart_total_amount,
-                "order_price": order.price,
-                "order_id": order.id,
-            },
-        )
-
-        return context
+class ProceedPayment(
+    LoginRequiredMixin, StorefrontSectionsMixin, DraftOrderMixin, TemplateView
+):
+    template_name = "pages/ecommerce/checkout.html"
+    storefront_sections = HEADER_SECTIONS
 
     # Overriding the get method to redirect to initiate payment
     def get(self, request, *args, **kwargs):
         context = self.get_context_data(**kwargs)
+        if context["order_id"] is None:
+            messages.warning(request, "Your cart is empty.")
+            return redirect("homeapp:home")
         return redirect("ecommerce:initiate_payment",
                         order_id=context["order_id"])
 
 
-def notify_user_insufficient_keys(user, product):
-    # Send notification to user about the insufficient keys for the product
-    send_mail(
-        "Insufficient Product Keys",
-        f"Dear {user.username},\n\nWe regret to inform you that there are insufficient keys available for the product '{product.title}'. Our team is working on resolving this issue.\n\nThank you for your understanding.",  # noqa
-        settings.DEFAULT_FROM_EMAIL,
-        [user.email],
-        fail_silently=False,
-    )
-
-
 class InitiatePaymentView(LoginRequiredMixin, TemplateView):
     template_name = "pages/ecommerce/initiate_payment.html"
 
@@ -670,11 +581,6 @@ class InitiatePaymentView(LoginRequiredMixin, TemplateView):
             messages.error(request, f"Error fetching exchange rate: {str(e)}")
             return redirect("ecommerce:checkout")
 
-        headers = {
-            "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
-            "Content-Type": "application/json",
-        }
-
         data = {
             "email": request.user.email,
             "amount": int(amount_in_naira * 100),  # Amount in kobo
@@ -684,12 +590,15 @@ class InitiatePaymentView(LoginRequiredMixin, TemplateView):
             ),
         }
 
-        response = requests.post(
-            "https://api.paystack.co/transaction/initialize",
-            headers=headers,
-            json=data,
-        )
-        response_data = response.json()
+        try:
+            response_data = PayStack().initialize_transaction(data)
+        except requests.RequestException as e:
+            logger.error(f"Paystack initialization failed: {e}")
+            messages.error(
+                request,
+                "Payment service is unavailable, please try again shortly.",
+            )
+            return redirect("ecommerce:checkout")
 
         if response_data.get("status") is True:  # Ensure the status is True
             authorization_url = response_data["data"]["authorization_url"]
@@ -707,220 +616,64 @@ class InitiatePaymentView(LoginRequiredMixin, TemplateView):
 
 
 class PaymentVerificationMixin:
-    def assign_keys_and_notify(self, request, payment):
-        try:
-            with transaction.atomic():
-                self.assign_unique_keys_to_order(payment.order.id)
-
-                purchased_product_url = request.build_absolute_uri(
-                    reverse("ecommerce:purchased_products")
-                )
-
-                send_mail(
-                    "Your Purchase is Complete",
-                    f"Thank you for your purchase.\nYou can access your purchased products here: {purchased_product_url}",  # noqa
-                    settings.DEFAULT_FROM_EMAIL,
-                    [request.user.email],
-                    fail_silently=False,
-                )
-
-                messages.success(request, "Verification successful. Check your email for access to your products.")  # noqa
-                return redirect("ecommerce:payment_complete")
-        except Exception as e:
-            messages.error(
-                request,
-                f"Verification succeeded but an issue occurred: {e}"
-            )
-            return redirect("ecommerce:support")
-
-    def assign_unique_keys_to_order(self, order_id):
-        order = get_object_or_404(CartOrder, id=order_id)
-
-        for order_item in order.order_items.all():
-            product = order_item.product
-            quantity = order_item.quantity
-
-            available_keys = ProductKey.objects.select_for_update().filter(
-                product=product, is_used=False)[:quantity]
-
-            if len(available_keys) < quantity:
-                self.handle_insufficient_keys(order_item, available_keys)
-                continue
-
-            keys_and_passwords = []
-
-            for i in range(quantity):
-                product_key = available_keys[i]
-                product_key.is_used = True
-                product_key.save()
-                keys_and_passwords.append({
-                    "key": product_key.key,
-                    "password": product_key.password
-                })
-
-            order_item.keys_and_passwords = keys_and_passwords
-            order_item.save()
-
-            product.quantity_in_stock -= quantity
-            if product.quantity_in_stock < 1:
-                product.visible = False
-            product.save()
-
-    def handle_insufficient_keys(self, order_item, available_keys):
-        keys_and_passwords = []
-
-        for key in available_keys:
-            key.is_used = True
-            key.save()
-            keys_and_passwords.append({
-                "key": key.key, "password": key.password
-            })
+    """
+    Verification talks to the payment gateway and delivery sends mail, so
+    both run on the job queue and the request only queues them.
+    """
 
-        order_item.keys_and_passwords = keys_and_passwords
-        order_item.save()
+    def queue_verification(self, request, payment):
+        verify_payment.delay(
+            payment.id,
+            request.build_absolute_uri(
+                reverse("ecommerce:purchased_products")
+            ),
+        )
 
-        product = order_item.product
-        user = order_item.order.user
-        notify_user_insufficient_keys(user, product)
+    def verification_queued(self, request, payment):
+        self.queue_verification(request, payment)
+        messages.info(
+            request,
+            "We are confirming your payment. Your products will be emailed to you as soon as it clears.",  # noqa
+        )
+        # The cart is only cleared on payment_complete, so the customer waits
+        # on the pending page until the job has confirmed the payment
+        return redirect(
+            reverse("ecommerce:payment_pending")
+            + f"?payment_reference={payment.reference}"
+        )
 
 
 class VerifyPaymentView(View, PaymentVerificationMixin):
     def get(self, request, reference, *args, **kwargs):
         payment = get_object_or_404(Payment, reference=reference)
-        verified = False
-
-        if payment.order.payment_method == "paystack":
-            verified = payment.verify_paystack_payment()
-        elif payment.order.payment_method == "nowpayments":
-            verified = payment.verify_payment_nowpayments()
-            if verified:
-                payment.status = "verified"
-                payment.save()
-        else:
-            messages.error(request, "Unknown payment method")
-            return redirect("ecommerce:payment_failed")
 
-        if verified:
-            return self.assign_keys_and_notify(request, payment)
-        else:
-            messages.error(request, "Verification failed")
+        if payment.order.payment_method not in ("paystack", "nowpayments"):
+            messages.error(request, "Unknown payment method")
             return redirect("ecommerce:payment_failed")
 
+        return self.verification_queued(request, payment)
 
-class VerifyNowPaymentView(View):
-    def verify_and_process_payment(self, request, reference):
-        # Fetch the payment object using the provided reference
-        payment = get_object_or_404(Payment, reference=reference)
-
-        # Debug statement to show that the payment verification is starting
-        messages.warning(
-            request,
-            f"Verifying payment for reference: {reference}"
-        )
-
-        nowpayment = NowPayment()
-
-        # Ensure payment_id is passed as an integer
-        success, result = nowpayment.verify_payment(int(payment.payment_id))
-
-        # Debug statement to show the result of the NowPayments verification
-        messages.warning(
-            request,
-            f"NowPayments verification result: {result}"
-        )
-
-        if not success:
-            # Mark payment as failed and save the status
-            payment.status = "failed"
-            payment.save()
-            messages.error(request, result)
-            return redirect("ecommerce:payment_failed")
-
-        # Check if the payment status returned from NowPayments is "confirmed"
-        if result.get("payment_status") == "confirmed":
-            # Convert the amount returned from NowPayments to a Decimal
-            nowpayments_amount = Decimal(result.get("pay_amount", "0"))
-            # Compare the amount returned from NowPayments
-            # with the expected payment amount
-            if nowpayments_amount == payment.amount:
-                try:
-                    # Use an atomic transaction to ensure data integrity
-                    with transaction.atomic():
-                        payment.status = "verified"
-                        payment.verified = True
-                        payment.amount = nowpayments_amount
-                        payment.save()
-
-                        # Assign unique keys and passwords to the order items
-                        self.assign_unique_keys_to_order(payment.order.id)
-
-                        # Build the URL to access purchased products
-                        purchased_product_url = request.build_absolute_uri(
-                            reverse("ecommerce:purchased_products")
-                        )
-
-                        # Send an email notification to the user
-                        send_mail(
-                            "Your Purchase is Complete",
-                            f"Thank you for your purchase.\nYou can access your purchased products here: {purchased_product_url}",    # noqa
-                            settings.DEFAULT_FROM_EMAIL,
-                            [request.user.email],
-                            fail_silently=False,
-                        )
-
-                        messages.success(
-                            request,
-                            "Verification successful. Check your email for access to your products."    # noqa
-                        )
-
-                        # Redirect to the payment complete page
-                        return redirect("ecommerce:payment_complete")
-
-                except Exception as e:
-                    # Handle exception and redirect to support page
-                    messages.error(
-                        request,
-                        f"Verification succeeded but an issue occurred: {e}"
-                    )
-                    return redirect("ecommerce:support")
-
-        # If the payment verification was not confirmed, mark it as failed
-        payment.status = "failed"
-        payment.save()
-        messages.error(request, "Verification failed.")
-        # Redirect to payment failed page
-        return redirect("ecommerce:payment_failed")
 
+class VerifyNowPaymentView(View, PaymentVerificationMixin):
     def get(self, request, reference):
-        # Handle GET requests by invoking
-        # the verification and processing method
-        return self.verify_and_process_payment(request, reference)
+        payment = get_object_or_404(Payment, reference=reference)
+        return self.verification_queued(request, payment)
 
     def post(self, request, reference):
-        # Handle POST requests by invoking
-        # the verification and processing method
-        return self.verify_and_process_payment(request, reference)
+        payment = get_object_or_404(Payment, reference=reference)
+        return self.verification_queued(request, payment)
 
 
 class NowPaymentView(View):
     def get_supported_currencies(self):
         """
         Fetch the list of supported currencies from NOWPayments API.
-        Uses sandbox URL for testing. Change to production URL when going live.
         """
-        headers = {
-            "x-api-key": settings.NOWPAYMENTS_API_KEY,
-        }
-        # Sandbox URL for testing
-        response = requests.get(
-            "https://api-sandbox.nowpayments.io/v1/currencies", headers=headers
-        )
-        # Uncomment the following line for production use
-        # response = requests.get("https://api.nowpayments.io/v1/currencies", headers=headers)  # noqa
-
-        if response.status_code == 200:
-            return response.json().get("currencies", [])
-        return []
+        try:
+            return NowPayment().get_currencies()
+        except (requests.RequestException, RatesUnavailable) as e:
+            logger.error(f"Could not fetch NOWPayments currencies: {e}")
+            return []
 
     def get(self, request, order_id):
         """
@@ -954,8 +707,6 @@ class NowPaymentView(View):
             defaults={
                 "user": request.user,
                 "amount": order.price,
-                "reference": Payment.generate_unique_reference(),
-                "payment_id": Payment.generate_payment_id(),
             },
         )
 
@@ -978,15 +729,15 @@ class NowPaymentView(View):
         }
 
         # Send the request to NOWPayments
-        headers = {
-            "x-api-key": settings.NOWPAYMENTS_API_KEY,
-        }
-        response = requests.post(
-            "https://api-sandbox.nowpayments.io/v1/invoice",
-            json=payload, headers=headers
-        )
-        # Uncomment the following line for production use
-        # response = requests.post("https://api.nowpayments.io/v1/invoice", json=payload, headers=headers)  # noqa
+        try:
+            response = NowPayment().create_invoice(payload)
+        except requests.RequestException as e:
+            logger.error(f"NOWPayments invoice creation failed: {e}")
+            messages.error(
+                request,
+                "Payment service is unavailable, please try again shortly.",
+            )
+            return redirect("ecommerce:payment_failed")
 
         # Process the response
         if response.status_code == 200:
@@ -1017,43 +768,43 @@ class NowPaymentView(View):
 @method_decorator(csrf_exempt, name="dispatch")
 class IPNView(View):
     def post(self, request, *args, **kwargs):
-        """Handle IPN (Instant Payment Notification) from NOWPayments"""
-        data = json.loads(request.body)
-        order_id = data.get("order_id")
-        messages.info(request, f"IPN received for order ID: {order_id}")
+        """
+        Handle IPN (Instant Payment Notification) from NOWPayments.
 
+        The notification is checked, written to the payment event inbox and
+        acknowledged; a worker does the rest. Repeats of an event already
+        in the inbox are acknowledged without queueing anything.
+        """
         try:
-            order = get_object_or_404(CartOrder, id=order_id)
-            payment = order.payment
-
-            if not payment:
-                messages.error(request, "Payment not found for order.")
-                return JsonResponse({
-                    "status": "error",
-                    "message": "Payment not found for order"
-                }, status=404)
-
-            verify_payment_view = VerifyNowPaymentView()
-            response = verify_payment_view.verify_and_process_payment(
-                request, payment.reference
-            )
+            data = json.loads(request.body)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return JsonResponse({
+                "status": "error",
+                "message": "Invalid payload"
+            }, status=400)
 
-            if response.status_code == 302 and "payment_complete" in response.url:    # noqa
-                return JsonResponse({
-                    "status": "success",
-                    "redirect_url": response.url
-                })
-            else:
-                return JsonResponse({
-                    "status": "failed",
-                    "redirect_url": response.url
-                }, status=400)
-        except Exception as e:
-            messages.error(request, f"IPN processing error: {e}")
+        signature = request.headers.get("x-nowpayments-sig")
+        if not verify_nowpayments_signature(data, signature):
+            logger.warning("IPN rejected: bad signature")
+            return JsonResponse({
+                "status": "error",
+                "message": "Invalid signature"
+            }, status=401)
+
+        payment_id = str(data.get("payment_id") or "")
+        status = str(data.get("payment_status") or "")
+        if not payment_id or not status:
             return JsonResponse({
                 "status": "error",
-                "message": str(e)
-            }, status=500)
+                "message": "payment_id and payment_status are required"
+            }, status=400)
+
+        event = record_event(NOWPAYMENTS, payment_id, status, data)
+        return JsonResponse({
+            "status": "queued" if event is not None else "duplicate"
+        })
 
 
 class PaymentCompleteView(LoginRequiredMixin, TemplateView):
@@ -1091,23 +842,53 @@ class PaymentCompleteView(LoginRequiredMixin, TemplateView):
                     kwargs={"reference": payment_reference}
                 )
 
-        # Fetch cart data from session
-        cart_data_obj = self.request.session.get("cart_data_obj", {})
-
+        # Fetch cart data from the cart service
+        cart = Cart(self.request)
+        cart_data_obj = cart.items()
         if cart_data_obj:
-            for item in cart_data_obj.values():
-                cart_total_amount += Decimal(item["quantity"]) * Decimal(
-                    item["price"]
-                )
+            cart_total_amount = cart.total()
 
         # Prepare context
         context["cart_data"] = cart_data_obj
         context["total_cart_items"] = len(cart_data_obj)
         context["cart_total_amount"] = cart_total_amount
 
-        # Clear the session cart data
-        self.request.session.pop("cart_data_obj", None)
+        # Clear the cart
+        cart.clear()
+
+        return context
+
 
+class PaymentPendingView(LoginRequiredMixin, TemplateView):
+    """
+    Where customers wait while their payment is verified in the background.
+    The page reloads itself until the verification job settles the payment,
+    then sends them on to payment_complete or payment_failed.
+    """
+
+    template_name = "pages/ecommerce/payment_pending.html"
+    refresh_seconds = 5
+
+    def get(self, request, *args, **kwargs):
+        self.payment = get_object_or_404(
+            Payment.objects.select_related("order"),
+            reference=request.GET.get("payment_reference", ""),
+            order__user=request.user,
+        )
+        if self.payment.status == "verified":
+            return redirect(
+                reverse("ecommerce:payment_complete")
+                + f"?order_id={self.payment.order_id}&payment_reference={self.payment.reference}"  # noqa
+            )
+        if self.payment.status == "failed":
+            messages.error(request, "We could not confirm your payment.")
+            return redirect("ecommerce:payment_failed")
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["payment"] = self.payment
+        context["refresh_seconds"] = self.refresh_seconds
         return context
 
 
@@ -1116,7 +897,7 @@ class PaymentFailedView(LoginRequiredMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        cart_data_obj = self.request.session.get("cart_data_obj", {})
+        cart_data_obj = Cart(self.request).items()
         context["cart_data"] = cart_data_obj
         context["totalcartitems"] = len(cart_data_obj)
         return context
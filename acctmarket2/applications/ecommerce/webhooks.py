@@ -0,0 +1,60 @@
+import hashlib
+import hmac
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from acctmarket2.applications.ecommerce.models import PaymentEvent
+from acctmarket2.applications.ecommerce.tasks import (awaiting_delivery,
+                                                      process_payment_event)
+
+NOWPAYMENTS = "nowpayments"
+
+
+def nowpayments_signature(data, secret):
+    """
+    HMAC-SHA512 of the payload with its keys sorted, as NOWPayments signs
+    its IPN requests.
+    """
+    message = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hmac.new(
+        secret.encode(), message.encode(), hashlib.sha512
+    ).hexdigest()
+
+
+def verify_nowpayments_signature(data, signature):
+    secret = settings.NOWPAYMENTS_IPN_SECRET
+    if not secret:
+        # Signing is not configured for this deployment
+        return True
+    return hmac.compare_digest(
+        nowpayments_signature(data, secret), signature or ""
+    )
+
+
+def record_event(provider, payment_id, status, payload):
+    """
+    Store a notification in the inbox and queue its processing.
+
+    Returns the new event, or None when the same (provider, payment_id,
+    status) was already recorded. A replay of an event whose order was
+    paid but never delivered queues that event again.
+    """
+    try:
+        with transaction.atomic():
+            event = PaymentEvent.objects.create(
+                provider=provider,
+                payment_id=payment_id,
+                status=status,
+                payload=payload,
+            )
+    except IntegrityError:
+        recorded = PaymentEvent.objects.get(
+            provider=provider, payment_id=payment_id, status=status
+        )
+        if recorded.processed_at is not None and awaiting_delivery(recorded):
+            process_payment_event.delay(recorded.id)
+        return None
+    process_payment_event.delay(event.id)
+    return event
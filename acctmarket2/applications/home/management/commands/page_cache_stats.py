@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from acctmarket2.utils.page_cache import (page_cache_metrics,
+                                          reset_page_cache_metrics)
+
+
+class Command(BaseCommand):
+    help = "Show the anonymous page cache's hit and miss counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Zero the counters after printing them.",
+        )
+
+    def handle(self, *args, **options):
+        metrics = page_cache_metrics()
+        for event in ("hit", "coalesced", "miss", "bypass"):
+            self.stdout.write(f"{event:<10} {metrics[event]:>10}")
+        self.stdout.write(f"{'hit ratio':<10} {metrics['hit_ratio']:>10.1%}")
+        if options["reset"]:
+            reset_page_cache_metrics()
+            self.stdout.write("Counters reset.")
@@ -0,0 +1,89 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from acctmarket2.utils.startup import parse_importtime
+
+
+class Command(BaseCommand):
+    help = (
+        "Start Django in a fresh interpreter and report what a cold worker "
+        "pays for: the slowest modules to import and every query run while "
+        "starting up or importing the project's modules."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--package",
+            default="acctmarket2.applications",
+            help="Package whose modules are imported and reported.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Number of modules to list.",
+        )
+        parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="Fail when any module queries the database on import.",
+        )
+
+    def handle(self, *args, **options):
+        package = options["package"]
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        child = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-m",
+                "acctmarket2.utils.startup",
+                package,
+            ],
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=str(settings.BASE_DIR),
+            check=False,
+        )
+        if child.returncode:
+            lines = child.stderr.strip().splitlines() or ["no output"]
+            raise CommandError(f"Startup failed: {lines[-1]}")
+        report = json.loads(child.stdout)
+
+        self.stdout.write(
+            f"django.setup(): {report['setup_seconds'] * 1000:.0f} ms, "
+            f"importing {package}: {report['import_seconds'] * 1000:.0f} ms"
+        )
+        self.stdout.write(f"\n{'cumulative ms':>13} {'self ms':>9}  module")
+        for cost in parse_importtime(child.stderr, package)[
+            : options["limit"]
+        ]:
+            self.stdout.write(
+                f"{cost.cumulative_us / 1000:>13.1f} "
+                f"{cost.self_us / 1000:>9.1f}  {cost.module}"
+            )
+
+        for name, error in report["failed"].items():
+            self.stderr.write(f"Could not import {name}: {error}")
+
+        at_import = [query for query in report["queries"] if query["module"]]
+        self.stdout.write(
+            f"\n{len(report['queries'])} queries during startup, "
+            f"{len(at_import)} from module level code"
+        )
+        for query in report["queries"]:
+            where = query["module"] or f"({query['phase']})"
+            self.stdout.write(f"  {where}: {query['sql']}")
+
+        if options["strict"] and at_import:
+            raise CommandError(
+                f"{len(at_import)} queries run when modules are imported."
+            )
+        self.stdout.write(self.style.SUCCESS("Done."))
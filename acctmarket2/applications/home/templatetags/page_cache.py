@@ -0,0 +1,14 @@
+from django import template
+
+from acctmarket2.utils.page_cache import render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def page_hole(context, name):
+    """
+    Render a per-visitor fragment, e.g. ``{% page_hole "cart_count" %}``,
+    that stays out of pages stored in the anonymous page cache.
+    """
+    return render_hole(context.get("request"), name)
@@ -1,4 +1,5 @@
 from django import template
+from django.utils.html import format_html_join
 
 from acctmarket2.utils.choices import Rating
 
@@ -15,3 +16,18 @@ def star_rating(value):
         return rating.label
 
     return rating
+
+
+@register.filter
+def rating_stars(product):
+    """
+    Five star icons for a product's average rating, from its summary.
+    """
+    average = product.ratings.average
+    icons = [
+        "fa fa-star" if average >= star
+        else "fa fa-star-half-o" if average >= star - 0.5
+        else "fa fa-star-o"
+        for star in range(1, 6)
+    ]
+    return format_html_join("\n", '<i class="{}"></i>', ((i,) for i in icons))
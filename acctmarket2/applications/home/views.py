@@ -1,10 +1,8 @@
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.exceptions import ValidationError
-from django.core.mail import send_mail
 from django.db import DatabaseError
-from django.http import JsonResponse
-from django.shortcuts import redirect
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404, redirect
 from django.template.loader import render_to_string
 from django.urls import reverse_lazy
 from django.utils.html import strip_tags
@@ -12,20 +10,37 @@ from django.views.generic import (DetailView, FormView, ListView, TemplateView,
                                   View)
 
 from acctmarket2.applications.blog.models import Announcement
+from acctmarket2.applications.ecommerce.detail import (get_product_detail,
+                                                       viewer_state)
+from acctmarket2.applications.ecommerce.facets import (FacetFilters,
+                                                       facet_products,
+                                                       get_facets)
 from acctmarket2.applications.ecommerce.forms import ProductReviewForm
 from acctmarket2.applications.ecommerce.models import (CartOrder,
                                                        CartOrderItems,
                                                        Category, Product,
                                                        ProductImages,
                                                        ProductReview)
+from acctmarket2.applications.ecommerce.search import (SEARCH_ORDERING,
+                                                       search_products)
+from acctmarket2.applications.ecommerce.storefront import (
+    CATALOG_NAMESPACE, HEADER_SECTIONS, SHOP_SECTIONS, StorefrontSectionsMixin)
 from acctmarket2.applications.home.forms import ContactForm
+from acctmarket2.applications.jobs.tasks import send_email
+from acctmarket2.utils.conditional import ConditionalGetMixin, latest_update
+from acctmarket2.utils.page_cache import AnonymousPageCacheMixin
+from acctmarket2.utils.pagination import CursorPaginationMixin
 
 # Create your views here.
 
+# Product cards rendered on their own, for the filter and infinite scroll
+PRODUCT_CARDS_TEMPLATE = "pages/async/product_filter.html"
 
-class HomeView(ListView):
+
+class HomeView(AnonymousPageCacheMixin, ListView):
     template_name = "pages/home.html"
     model = Announcement
+    page_cache_namespaces = (CATALOG_NAMESPACE,)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -43,7 +58,10 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     )  # Assuming "login" is the name of the login URL pattern
 
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.administrator_profile.exists():
+        if (
+            request.user.is_authenticated
+            and not request.user.is_administrator
+        ):
             # If the user is not an administrator,
             # redirect them to another page
             return redirect(
@@ -54,92 +72,111 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         return super().dispatch(request, *args, **kwargs)
 
 
-class ProductShopListView(ListView):
+class ProductShopListView(
+    AnonymousPageCacheMixin,
+    CursorPaginationMixin,
+    StorefrontSectionsMixin,
+    ListView,
+):
     model = Product
     template_name = "pages/shop_lists.html"
     paginate_by = 8
+    cursor_item_template = PRODUCT_CARDS_TEMPLATE
+    cursor_count_namespace = CATALOG_NAMESPACE
     context_object_name = "all_products"
+    storefront_sections = SHOP_SECTIONS
+    page_cache_namespaces = (CATALOG_NAMESPACE,)
 
     def get_queryset(self):
-        # Add ordering to the queryset
-        return Product.objects.filter(visible=True).order_by("id")
-
-    def get_context_data(self, **kwargs):
-        """Add pagination context data."""
-        context = super().get_context_data(**kwargs)
-        context["page_obj"] = context["paginator"].page(
-            context["page_obj"].number,
-        )  # Set page_obj
-        return context
+        return Product.objects.filter(visible=True).select_related(
+            "category", "rating_summary"
+        )
 
     # Add filter functionality
     def post(self, request, *args, **kwargs):
         return ProductFilterView.as_view()(request, *args, **kwargs)
 
 
-class ProductShopDetailView(DetailView):
+class ProductShopDetailView(
+    ConditionalGetMixin, StorefrontSectionsMixin, DetailView
+):
+    """
+    Product page assembled by ``ecommerce.detail``: the part every visitor
+    sees is cached per catalog version, and only the visitor's own review
+    and wishlist state is queried per request.
+    """
+
     model = Product
     template_name = "pages/shop_details.html"
     context_object_name = "product"
+    storefront_sections = HEADER_SECTIONS
+    conditional_namespaces = (CATALOG_NAMESPACE,)
+
+    def get_last_modified(self):
+        # Related products and the header categories are on the page too
+        pk = self.kwargs[self.pk_url_kwarg]
+        return latest_update(
+            CATALOG_NAMESPACE,
+            f"product:{pk}",
+            Product.objects.all(),
+            Category.objects.all(),
+            ProductImages.objects.filter(product_id=pk),
+            ProductReview.objects.filter(product_id=pk),
+        )
+
+    def get_object(self, queryset=None):
+        self.detail = get_product_detail(self.kwargs[self.pk_url_kwarg])
+        if self.detail is None:
+            raise Http404("No product found matching the query")
+        return self.detail.product
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        product = self.get_object()
-        category = product.category
-
-        # fetching the product images
-        product_images = ProductImages.objects.filter(product=product)
-        # related products in the same category
-        related_products = Product.objects.filter(category=category).exclude(
-            id=product.id,
-        )
-        # reviews for the products
-        product_reviews = ProductReview.objects.filter(product=product).order_by(   # noqa
-            "-created_at",
-        )
-
-        review_form = ProductReviewForm()
-        make_review = True
-
-        if self.request.user.is_authenticated:
-            # Check if the authenticated user has
-            # already submitted a review for this product
-            users_review_count = ProductReview.objects.filter(
-                user=self.request.user,
-                product=product,
-            ).count()
-            if users_review_count > 0:
-                make_review = False
-
-        context["product_images"] = product_images
-        context["related_product"] = related_products
-        context["form"] = review_form
-        context["reviews"] = product_reviews
-        context["make_review"] = make_review
+        context.update(self.detail.context())
+        context.update(viewer_state(self.detail, self.request.user))
+        context["form"] = ProductReviewForm()
         return context
 
 
-class ProductsCategoryList(ListView):
+class ProductsCategoryList(
+    ConditionalGetMixin,
+    AnonymousPageCacheMixin,
+    CursorPaginationMixin,
+    StorefrontSectionsMixin,
+    ListView,
+):
     model = Product
     template_name = "pages/shop_by_category.html"
     context_object_name = "products"
     paginate_by = 8
+    storefront_sections = SHOP_SECTIONS
+    cursor_item_template = PRODUCT_CARDS_TEMPLATE
+    cursor_count_namespace = CATALOG_NAMESPACE
+    page_cache_namespaces = (CATALOG_NAMESPACE,)
+    conditional_namespaces = (CATALOG_NAMESPACE,)
+
+    def get_last_modified(self):
+        # The sidebar lists products from every category
+        return latest_update(
+            CATALOG_NAMESPACE,
+            "shop",
+            Product.objects.all(),
+            Category.objects.all(),
+        )
 
     def get_queryset(self):
         # get the category base on the slug in the url
-        category_slug = self.kwargs["category_slug"]
-        category = Category.objects.get(slug=category_slug)
-        return Product.objects.filter(category=category).order_by("created_at")
+        self.category = get_object_or_404(
+            Category, slug=self.kwargs["category_slug"]
+        )
+        return Product.objects.filter(
+            category=self.category
+        ).select_related("category", "rating_summary")
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         # Add category to the context for use in the template
-        category_slug = self.kwargs["category_slug"]
-        category = Category.objects.get(slug=category_slug)
-        context["category"] = category
-        context["page_obj"] = context["paginator"].page(
-            context["page_obj"].number,
-        )  # Set page_obj
+        context["category"] = self.category
         return context
 
     # Add filter functionality
@@ -147,91 +184,87 @@ class ProductsCategoryList(ListView):
         return ProductFilterView.as_view()(request, *args, **kwargs)
 
 
-class ProductTagsList(ListView):
+class ProductTagsList(
+    AnonymousPageCacheMixin,
+    CursorPaginationMixin,
+    StorefrontSectionsMixin,
+    ListView,
+):
     model = Product
     template_name = "pages/shop_by_tag.html"
     context_object_name = "products"
     paginate_by = 8
+    storefront_sections = SHOP_SECTIONS
+    cursor_item_template = PRODUCT_CARDS_TEMPLATE
+    cursor_count_namespace = CATALOG_NAMESPACE
+    page_cache_namespaces = (CATALOG_NAMESPACE,)
 
     def get_queryset(self):
         # get the category base on the slug in the url
         tag_slug = self.kwargs["tag_slug"]
-        return Product.objects.filter(tags__slug=tag_slug).order_by("created_at")                      # noqa
+        return Product.objects.filter(
+            tags__slug=tag_slug
+        ).select_related("category", "rating_summary")
 
     # Add filter functionality
     def post(self, request, *args, **kwargs):
         return ProductFilterView.as_view()(request, *args, **kwargs)
 
 
-class ProductSearchView(ListView):
+class ProductSearchView(
+    CursorPaginationMixin, StorefrontSectionsMixin, ListView
+):
     model = Product
     template_name = "pages/product_search.html"
     context_object_name = "all_products"
     paginate_by = 8
+    storefront_sections = SHOP_SECTIONS
+    cursor_ordering = SEARCH_ORDERING
+    cursor_item_template = PRODUCT_CARDS_TEMPLATE
+    cursor_count_namespace = CATALOG_NAMESPACE
 
     def get_queryset(self):
-        query = self.request.GET.get("q")
-        return Product.objects.filter(
-            title__icontains=query,
+        return search_products(self.request.GET.get("q", "")).select_related(
+            "category", "rating_summary"
         )
 
-    def get_context_data(self, **kwargs):
-        """Add pagination context data."""
-        context = super().get_context_data(**kwargs)
-        context["page_obj"] = context["paginator"].page(
-            context["page_obj"].number,
-        )  # Set page_obj
-        return context
-
     # Add filter functionality
     def post(self, request, *args, **kwargs):
         return ProductFilterView.as_view()(request, *args, **kwargs)
 
 
-class ProductFilterView(View):
-    # Handle GET requests
-    def get(self, request, *args, **kwargs):
-        # Get the filter criteria from the request
-        categories = request.GET.getlist("category[]")
-        min_price = request.GET.get("min_price")
-        max_price = request.GET.get("max_price")
-
-        try:
-            # Filter products that are in stock and digital
-            products = Product.objects.filter(in_stock=True, digital=True)
-
-            # Apply the minimum price filter if provided
-            if min_price is not None and min_price != "":
-                min_price = float(min_price)
-                products = products.filter(price__gte=min_price)
-
-            # Apply the maximum price filter if provided
-            if max_price is not None and max_price != "":
-                max_price = float(max_price)
-                products = products.filter(price__lte=max_price)
-
-            # Apply the category filter if provided
-            if categories:
-                products = products.filter(category__id__in=categories)
-
-            # Prepare the context with the filtered products
-            context = {"products": products}
+class ProductFilterView(ConditionalGetMixin, View):
+    conditional_namespaces = (CATALOG_NAMESPACE,)
 
-            # Log the context data for debugging
+    def get_last_modified(self):
+        return latest_update(
+            CATALOG_NAMESPACE,
+            "shop",
+            Product.objects.all(),
+            Category.objects.all(),
+        )
 
-            # Render the HTML for the filtered products using a template
-            data = render_to_string("pages/async/product_filter.html", context)
+    def conditional_applies(self):
+        # The JSON is the same for every visitor
+        return self.request.method in ("GET", "HEAD")
 
-            # Return the rendered HTML as a JSON response
-            return JsonResponse({"data": data})
+    def visitor_parts(self):
+        return ()
 
-        except (ValidationError, DatabaseError):
-            # Log the error for debugging
-            # Return an error message as a JSON response
+    def get(self, request, *args, **kwargs):
+        filters = FacetFilters.from_querydict(request.GET)
+        try:
+            result = get_facets(filters)
+            data = render_to_string(
+                PRODUCT_CARDS_TEMPLATE,
+                {"products": facet_products(result), "result": result},
+            )
+        except DatabaseError:
             return JsonResponse(
                 {"error": "An error occurred while filtering products."},
                 status=500,
             )
+        return JsonResponse({"data": data, "facets": result.as_json()})
 
 
 class OrderDetails(LoginRequiredMixin, DetailView):
@@ -267,14 +300,13 @@ class ContactPage(FormView):
         print(to_email, "kkkkkkkkkkkkkkkkkkkkkkkkkk")
         print(from_email, "xxxxxxxxxxxxxxxxxxxxxxxxxx")
 
-        # Send the email
-        send_mail(
+        # Send the email from a background job
+        send_email.delay(
             subject,
             plain_message,
-            from_email,
             [to_email],
+            from_email=from_email,
             html_message=html_message,
-            fail_silently=False,
         )
         return super().form_valid(form)
 
@@ -283,5 +315,7 @@ class ContactSuccessPage(TemplateView):
     template_name = "pages/contact_success.html"
 
 
-class TermsPolicy(TemplateView):
+class TermsPolicy(AnonymousPageCacheMixin, TemplateView):
     template_name = "pages/terms_and_conditions.html"
+    # The header lists the categories
+    page_cache_namespaces = (CATALOG_NAMESPACE,)
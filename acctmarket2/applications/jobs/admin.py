@@ -0,0 +1,9 @@
+from django.contrib import admin
+
+from acctmarket2.applications.jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("name", "status", "attempts", "run_after", "last_error")
+    list_filter = ("status", "name")
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "acctmarket2.applications.jobs"
+
+    def ready(self):
+        # Register the @job functions every app keeps in its tasks module
+        autodiscover_modules("tasks")
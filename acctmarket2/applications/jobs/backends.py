@@ -0,0 +1,253 @@
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from acctmarket2.applications.jobs.models import Job
+from acctmarket2.utils.choices import JobStatus
+
+
+@dataclass
+class Task:
+    """
+    A job handed to a worker. ``ref`` is whatever the backend needs to
+    acknowledge it later.
+    """
+
+    name: str
+    args: list = field(default_factory=list)
+    kwargs: dict = field(default_factory=dict)
+    attempts: int = 0
+    max_attempts: int = 5
+    ref: object = None
+
+
+class DatabaseBackend:
+    """
+    Jobs stored as ``Job`` rows. Workers reserve rows with ``SKIP LOCKED``
+    so several of them can share the table, and a row left ``RUNNING`` by
+    a worker that died is picked up again once its lease runs out, which
+    uses up one of its attempts.
+    """
+
+    def push(self, name, args, kwargs, max_attempts):
+        Job.objects.create(
+            name=name,
+            payload={"args": args, "kwargs": kwargs},
+            max_attempts=max_attempts,
+        )
+
+    def reserve(self):
+        while True:
+            now = timezone.now()
+            lease = now - timedelta(seconds=settings.JOBS_LEASE)
+            with transaction.atomic():
+                job = (
+                    Job.objects.select_for_update(skip_locked=True)
+                    .filter(
+                        Q(status=JobStatus.QUEUED, run_after__lte=now)
+                        | Q(status=JobStatus.RUNNING, locked_at__lt=lease)
+                    )
+                    .order_by("run_after", "id")
+                    .first()
+                )
+                if job is None:
+                    return None
+                if job.status == JobStatus.RUNNING:
+                    # The worker running it died, which counts as a failed
+                    # attempt; otherwise a job that kills its worker would
+                    # be retried forever
+                    job.attempts += 1
+                    job.last_error = "Lease expired"
+                    if job.attempts >= job.max_attempts:
+                        job.status = JobStatus.FAILED
+                        job.locked_at = None
+                        job.save(
+                            update_fields=[
+                                "status",
+                                "attempts",
+                                "locked_at",
+                                "last_error",
+                                "updated_at",
+                            ]
+                        )
+                        continue
+                job.status = JobStatus.RUNNING
+                job.locked_at = now
+                job.save(
+                    update_fields=[
+                        "status",
+                        "attempts",
+                        "locked_at",
+                        "last_error",
+                        "updated_at",
+                    ]
+                )
+            return Task(
+                name=job.name,
+                args=job.payload.get("args", []),
+                kwargs=job.payload.get("kwargs", {}),
+                attempts=job.attempts,
+                max_attempts=job.max_attempts,
+                ref=job.pk,
+            )
+
+    def ack(self, task):
+        Job.objects.filter(pk=task.ref).delete()
+
+    def retry(self, task, error, delay):
+        Job.objects.filter(pk=task.ref).update(
+            status=JobStatus.QUEUED,
+            attempts=F("attempts") + 1,
+            run_after=timezone.now() + timedelta(seconds=delay),
+            locked_at=None,
+            last_error=error,
+        )
+
+    def fail(self, task, error):
+        Job.objects.filter(pk=task.ref).update(
+            status=JobStatus.FAILED,
+            attempts=F("attempts") + 1,
+            locked_at=None,
+            last_error=error,
+        )
+
+
+class RedisBackend:
+    """
+    Jobs as JSON documents in Redis lists.
+
+    Ready jobs wait in ``queue``; a reserved job is moved atomically into
+    ``processing`` until it is acknowledged, and retries wait in the
+    ``delayed`` sorted set, scored by the time they become due.
+    """
+
+    QUEUE_KEY = "acctmarket2:jobs:queue"
+    PROCESSING_KEY = "acctmarket2:jobs:processing"
+    DELAYED_KEY = "acctmarket2:jobs:delayed"
+    FAILED_KEY = "acctmarket2:jobs:failed"
+
+    PROMOTE_DUE = """
+    local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+    for _, raw in ipairs(due) do
+        redis.call('ZREM', KEYS[1], raw)
+        redis.call('LPUSH', KEYS[2], raw)
+    end
+    return #due
+    """
+
+    def __init__(self):
+        from django_redis import get_redis_connection
+
+        self.redis = get_redis_connection("default")
+        self.promote_due = self.redis.register_script(self.PROMOTE_DUE)
+
+    def push(self, name, args, kwargs, max_attempts):
+        self.redis.lpush(
+            self.QUEUE_KEY,
+            json.dumps(
+                {
+                    "id": uuid.uuid4().hex,
+                    "name": name,
+                    "args": args,
+                    "kwargs": kwargs,
+                    "attempts": 0,
+                    "max_attempts": max_attempts,
+                }
+            ),
+        )
+
+    def reserve(self):
+        self.promote_due(
+            keys=[self.DELAYED_KEY, self.QUEUE_KEY], args=[time.time()]
+        )
+        raw = self.redis.rpoplpush(self.QUEUE_KEY, self.PROCESSING_KEY)
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return Task(
+            name=data["name"],
+            args=data["args"],
+            kwargs=data["kwargs"],
+            attempts=data["attempts"],
+            max_attempts=data["max_attempts"],
+            ref=raw,
+        )
+
+    def _rewrite(self, task, error):
+        data = json.loads(task.ref)
+        data["attempts"] += 1
+        data["last_error"] = error
+        return json.dumps(data)
+
+    def ack(self, task):
+        self.redis.lrem(self.PROCESSING_KEY, 1, task.ref)
+
+    def retry(self, task, error, delay):
+        pipe = self.redis.pipeline()
+        pipe.lrem(self.PROCESSING_KEY, 1, task.ref)
+        pipe.zadd(
+            self.DELAYED_KEY, {self._rewrite(task, error): time.time() + delay}
+        )
+        pipe.execute()
+
+    def fail(self, task, error):
+        pipe = self.redis.pipeline()
+        pipe.lrem(self.PROCESSING_KEY, 1, task.ref)
+        pipe.lpush(self.FAILED_KEY, self._rewrite(task, error))
+        pipe.execute()
+
+    def recover(self):
+        """
+        Put jobs left in ``processing`` by dead workers back on the queue.
+        Only safe while no worker is running.
+        """
+        moved = 0
+        while self.redis.rpoplpush(self.PROCESSING_KEY, self.QUEUE_KEY):
+            moved += 1
+        return moved
+
+
+class InMemoryBackend:
+    """
+    Process-local queue for tests and local development. Retry delays are
+    ignored so that draining the queue always terminates quickly.
+    """
+
+    def __init__(self):
+        self.queue = []
+        self.failed = []
+
+    def push(self, name, args, kwargs, max_attempts):
+        self.queue.append(
+            Task(
+                name=name,
+                args=json.loads(json.dumps(args)),
+                kwargs=json.loads(json.dumps(kwargs)),
+                max_attempts=max_attempts,
+            )
+        )
+
+    def reserve(self):
+        return self.queue.pop(0) if self.queue else None
+
+    def ack(self, task):
+        pass
+
+    def retry(self, task, error, delay):
+        task.attempts += 1
+        self.queue.append(task)
+
+    def fail(self, task, error):
+        task.attempts += 1
+        self.failed.append((task, error))
+
+    def clear(self):
+        self.queue.clear()
+        self.failed.clear()
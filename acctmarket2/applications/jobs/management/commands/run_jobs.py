@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from acctmarket2.applications.jobs.queue import get_backend, run_pending, work
+
+
+class Command(BaseCommand):
+    help = (
+        "Run background jobs. Keeps polling the queue unless --burst is "
+        "given, in which case it exits once no job is ready."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--burst",
+            action="store_true",
+            help="Exit once the queue is empty.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait between polls of an empty queue.",
+        )
+        parser.add_argument(
+            "--recover",
+            action="store_true",
+            help=(
+                "Requeue jobs left in progress by dead workers (Redis "
+                "backend only; run it while no worker is up)."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+
+        if options["recover"]:
+            if not hasattr(backend, "recover"):
+                raise CommandError("This backend recovers jobs on its own.")
+            moved = backend.recover()
+            self.stdout.write(f"Requeued {moved} jobs.")
+            return
+
+        if options["burst"]:
+            count = run_pending(backend)
+            self.stdout.write(self.style.SUCCESS(f"Ran {count} jobs."))
+            return
+
+        self.stdout.write(f"Worker started on {type(backend).__name__}.")
+        work(backend, sleep=options["sleep"])
@@ -0,0 +1,28 @@
+from django.db.models import (CharField, DateTimeField, Index, JSONField,
+                              PositiveIntegerField, TextField)
+from django.utils import timezone
+
+from acctmarket2.utils.choices import JobStatus
+from acctmarket2.utils.models import TimeBasedModel
+
+
+class Job(TimeBasedModel):
+    name = CharField(max_length=200)
+    payload = JSONField(default=dict, blank=True)
+    status = CharField(
+        max_length=20, choices=JobStatus.choices, default=JobStatus.QUEUED
+    )
+    attempts = PositiveIntegerField(default=0)
+    max_attempts = PositiveIntegerField(default=5)
+    run_after = DateTimeField(default=timezone.now)
+    locked_at = DateTimeField(null=True, blank=True)
+    last_error = TextField(default="", blank=True)
+
+    class Meta:
+        verbose_name_plural = "Jobs"
+        indexes = [
+            Index(fields=["status", "run_after"], name="job_status_run_after"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
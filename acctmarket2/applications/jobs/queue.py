@@ -0,0 +1,125 @@
+import functools
+import logging
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+_backends = {}
+
+
+def get_backend():
+    """
+    The backend named by ``JOBS_BACKEND``, one instance per process.
+    """
+    path = settings.JOBS_BACKEND
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+def job(name=None, max_attempts=None, backoff=None):
+    """
+    Register a function as a background job.
+
+    The function can still be called directly; ``func.delay(*args,
+    **kwargs)`` queues it instead. Arguments must be JSON serializable, so
+    pass ids rather than model instances.
+    """
+
+    def decorator(func):
+        job_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return func(*args, **kwargs)
+
+        wrapper.job_name = job_name
+        wrapper.max_attempts = max_attempts or settings.JOBS_MAX_ATTEMPTS
+        wrapper.backoff = backoff or settings.JOBS_RETRY_BACKOFF
+        wrapper.delay = functools.partial(enqueue, job_name)
+        _registry[job_name] = wrapper
+        return wrapper
+
+    return decorator
+
+
+def enqueue(name, *args, **kwargs):
+    """
+    Queue the job ``name`` once the current transaction commits, so a
+    worker never sees rows the request has not written yet and nothing is
+    queued for a request that rolled back.
+    """
+    func = _registry[name]
+    transaction.on_commit(
+        lambda: get_backend().push(
+            name, list(args), kwargs, func.max_attempts
+        )
+    )
+
+
+def run_task(task, backend=None):
+    """
+    Run one reserved task. Failures are retried with exponential backoff
+    until the job runs out of attempts. Returns True on success.
+    """
+    backend = backend or get_backend()
+    func = _registry.get(task.name)
+    if func is None:
+        logger.error(f"Unknown job {task.name}")
+        backend.fail(task, "Unknown job")
+        return False
+
+    try:
+        func(*task.args, **task.kwargs)
+    except Exception as e:
+        attempts = task.attempts + 1
+        if attempts >= task.max_attempts:
+            logger.exception(
+                f"Job {task.name} failed after {attempts} attempts"
+            )
+            backend.fail(task, repr(e))
+        else:
+            delay = func.backoff * 2 ** (attempts - 1)
+            logger.warning(
+                f"Job {task.name} failed ({e!r}), retrying in {delay}s"
+            )
+            backend.retry(task, repr(e), delay)
+        return False
+
+    backend.ack(task)
+    return True
+
+
+def run_pending(backend=None):
+    """
+    Run jobs until none are ready. Returns the number of tasks run.
+    """
+    backend = backend or get_backend()
+    count = 0
+    while (task := backend.reserve()) is not None:
+        run_task(task, backend)
+        count += 1
+    return count
+
+
+def work(backend=None, sleep=1.0):
+    """
+    Run jobs forever, sleeping ``sleep`` seconds whenever the queue is
+    empty.
+
+    Connections are recycled around each batch the way Django does around
+    each request, so a long-running worker honours ``CONN_MAX_AGE`` and
+    drops connections that broke while it slept.
+    """
+    backend = backend or get_backend()
+    while True:
+        close_old_connections()
+        ran = run_pending(backend)
+        close_old_connections()
+        if not ran:
+            time.sleep(sleep)
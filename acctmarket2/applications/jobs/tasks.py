@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.mail import send_mail
+
+from acctmarket2.applications.jobs.queue import job
+
+
+@job()
+def send_email(
+    subject, message, recipient_list, from_email=None, html_message=None
+):
+    send_mail(
+        subject,
+        message,
+        from_email or settings.DEFAULT_FROM_EMAIL,
+        recipient_list,
+        html_message=html_message,
+        fail_silently=False,
+    )
@@ -0,0 +1,123 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from acctmarket2.applications.jobs import queue
+from acctmarket2.applications.jobs.backends import DatabaseBackend
+from acctmarket2.applications.jobs.models import Job
+from acctmarket2.applications.jobs.queue import (get_backend, job, run_pending,
+                                                 run_task)
+from acctmarket2.utils.choices import JobStatus
+
+pytestmark = pytest.mark.django_db
+
+calls = []
+
+
+@job(max_attempts=3, backoff=1)
+def flaky(failures):
+    calls.append(failures)
+    if len(calls) <= failures:
+        raise RuntimeError("boom")
+
+
+@pytest.fixture(autouse=True)
+def _reset_queue():
+    calls.clear()
+    get_backend().clear()
+    yield
+    get_backend().clear()
+
+
+class TestQueue:
+    def test_job_is_queued_on_commit(self, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks() as callbacks:
+            flaky.delay(0)
+        assert get_backend().queue == []
+
+        for callback in callbacks:
+            callback()
+
+        assert run_pending() == 1
+        assert calls == [0]
+
+    def test_failures_are_retried_then_given_up(
+        self, django_capture_on_commit_callbacks
+    ):
+        with django_capture_on_commit_callbacks(execute=True):
+            flaky.delay(2)
+        run_pending()
+        assert len(calls) == 3
+        assert get_backend().failed == []
+
+        calls.clear()
+        with django_capture_on_commit_callbacks(execute=True):
+            flaky.delay(5)
+        run_pending()
+        assert len(calls) == 3
+        [(task, error)] = get_backend().failed
+        assert task.attempts == 3
+        assert "boom" in error
+
+    def test_worker_recycles_connections_around_each_batch(
+        self, monkeypatch
+    ):
+        events = []
+
+        def stop(seconds):
+            raise KeyboardInterrupt
+
+        monkeypatch.setattr(
+            queue, "close_old_connections", lambda: events.append("close")
+        )
+        monkeypatch.setattr(
+            queue, "run_pending", lambda backend: events.append("run") or 0
+        )
+        monkeypatch.setattr(queue.time, "sleep", stop)
+
+        with pytest.raises(KeyboardInterrupt):
+            queue.work()
+
+        assert events == ["close", "run", "close"]
+
+
+class TestDatabaseBackend:
+    def test_retry_waits_for_backoff(self):
+        backend = DatabaseBackend()
+        backend.push(flaky.job_name, [1], {}, 3)
+
+        run_task(backend.reserve(), backend)
+        queued = Job.objects.get()
+        assert queued.status == JobStatus.QUEUED
+        assert queued.attempts == 1
+        assert backend.reserve() is None
+
+        Job.objects.update(run_after=timezone.now() - timedelta(seconds=1))
+        assert run_task(backend.reserve(), backend)
+        assert not Job.objects.exists()
+
+    def test_expired_lease_is_reclaimed(self):
+        backend = DatabaseBackend()
+        backend.push(flaky.job_name, [0], {}, 3)
+        backend.reserve()
+        assert backend.reserve() is None
+
+        Job.objects.update(locked_at=timezone.now() - timedelta(days=1))
+        assert backend.reserve() is not None
+        assert Job.objects.get().attempts == 1
+
+    def test_job_that_keeps_killing_its_worker_fails(self):
+        backend = DatabaseBackend()
+        backend.push(flaky.job_name, [0], {}, 2)
+        backend.reserve()
+
+        for attempts in (1, 2):
+            Job.objects.update(locked_at=timezone.now() - timedelta(days=1))
+            task = backend.reserve()
+            assert Job.objects.get().attempts == attempts
+
+        assert task is None
+        failed = Job.objects.get()
+        assert failed.status == JobStatus.FAILED
+        assert failed.last_error == "Lease expired"
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SupportConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "acctmarket2.applications.support"
+
+    def ready(self):
+        import acctmarket2.applications.support.signals  # noqa: F401
@@ -7,6 +7,9 @@ from acctmarket2.utils.models import TimeBasedModel, TitleTimeBasedModel
 
 # Create your models here.
 
+# Cache namespace bumped whenever the public FAQ changes
+FAQ_NAMESPACE = "faq"
+
 
 class Ticket(TitleTimeBasedModel):
     customer = auto_prefetch.ForeignKey(
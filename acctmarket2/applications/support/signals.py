@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from acctmarket2.applications.support.models import (FAQ_NAMESPACE,
+                                                     FrequestAskQuestion)
+from acctmarket2.utils.cache import bump_version
+
+
+@receiver(post_save, sender=FrequestAskQuestion)
+@receiver(post_delete, sender=FrequestAskQuestion)
+def invalidate_faq(sender, instance, **kwargs):
+    """
+    Retire cached help pages when a question is added, edited or removed.
+    """
+    bump_version(FAQ_NAMESPACE)
@@ -3,8 +3,12 @@ from django.urls import reverse_lazy
 from django.views.generic import (CreateView, DeleteView, DetailView, ListView,
                                   UpdateView)
 
+from acctmarket2.applications.ecommerce.storefront import CATALOG_NAMESPACE
 from acctmarket2.applications.support.forms import FAQForm, ResponseForm
-from acctmarket2.applications.support.models import FrequestAskQuestion, Ticket
+from acctmarket2.applications.support.models import (FAQ_NAMESPACE,
+                                                     FrequestAskQuestion,
+                                                     Ticket)
+from acctmarket2.utils.page_cache import AnonymousPageCacheMixin
 from acctmarket2.utils.views import CustomerSupportRepresentativemixin
 
 # Create your views here.
@@ -37,10 +41,11 @@ class DeleteFAQViews(CustomerSupportRepresentativemixin, DeleteView):
     context_object_name = "faq"
 
 
-class HELPOrFAQPage(ListView):
+class HELPOrFAQPage(AnonymousPageCacheMixin, ListView):
     model = FrequestAskQuestion
     template_name = "pages/support/help_or_faqpage.html"
     context_object_name = "faqs"
+    page_cache_namespaces = (CATALOG_NAMESPACE, FAQ_NAMESPACE)
 
 
 class TicketDetailView(LoginRequiredMixin, DetailView):
@@ -3,6 +3,7 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.db.models import CharField, EmailField
 from django.urls import reverse
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from django_countries.fields import CountryField
 
@@ -45,17 +46,33 @@ class User(UIDTimeBasedModel, AbstractUser):
     def __str__(self) -> str:
         return self.email
 
+    @cached_property
+    def roles(self):
+        """
+        Names of the profiles this user holds, resolved once per request
+        (the user object lives as long as the request) and cached across
+        requests until a profile is created or deleted.
+        """
+        # roles imports this module for the profile models
+        from acctmarket2.applications.users.roles import get_roles
+
+        return get_roles(self)
+
+    @property
+    def is_administrator(self):
+        return "administrator" in self.roles
+
     @property
     def is_customer_support_representative(self):
-        return CustomerSupportRepresentative.objects.filter(user=self).exists()
+        return "customer_support_representative" in self.roles
 
     @property
     def is_content_manager(self):
-        return ContentManager.objects.filter(user=self).exists()
+        return "content_manager" in self.roles
 
     @property
     def is_customer(self):
-        return Customer.objects.filter(user=self).exists()
+        return "customer" in self.roles
 
 
 class Account(UIDTimeBasedModel):
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+
+from acctmarket2.applications.users.models import (
+    Accountant, Administrator, AffiliatePartner, ContentManager, Customer,
+    CustomerSupportRepresentative, DigitalGoodsDistribution,
+    HelpDeskTechnicalSupport, LiveChatSupport, MarketingAndSales, User)
+
+# Role name of every profile a user can hold
+PROFILE_ROLES = {
+    "administrator": Administrator,
+    "customer": Customer,
+    "customer_support_representative": CustomerSupportRepresentative,
+    "content_manager": ContentManager,
+    "marketing_and_sales": MarketingAndSales,
+    "accountant": Accountant,
+    "help_desk_technical_support": HelpDeskTechnicalSupport,
+    "live_chat_support": LiveChatSupport,
+    "affiliate_partner": AffiliatePartner,
+    "digital_goods_distribution": DigitalGoodsDistribution,
+}
+
+
+def roles_key(user_id):
+    return f"users:roles:{user_id}"
+
+
+def load_roles(user_id):
+    """
+    Resolve every profile membership of a user with one query.
+    """
+    memberships = (
+        User.objects.filter(pk=user_id)
+        .annotate(
+            **{
+                role: Exists(model.objects.filter(user_id=OuterRef("pk")))
+                for role, model in PROFILE_ROLES.items()
+            }
+        )
+        .values(*PROFILE_ROLES)
+        .first()
+    ) or {}
+    return frozenset(role for role, held in memberships.items() if held)
+
+
+def get_roles(user):
+    """
+    Return the role names ``user`` holds, from the cache when possible.
+    Anonymous users hold none.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    key = roles_key(user.pk)
+    roles = cache.get(key)
+    if roles is None:
+        roles = load_roles(user.pk)
+        cache.set(key, roles, settings.ROLES_CACHE_TIMEOUT)
+    return roles
+
+
+def invalidate_roles(user_id):
+    cache.delete(roles_key(user_id))
@@ -0,0 +1,20 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from acctmarket2.applications.users.roles import (PROFILE_ROLES,
+                                                  invalidate_roles)
+
+
+def forget_roles(sender, instance, **kwargs):
+    """
+    Drop the cached roles of a user whose profiles changed, once the
+    change is visible to other requests.
+    """
+    transaction.on_commit(partial(invalidate_roles, instance.user_id))
+
+
+for model in PROFILE_ROLES.values():
+    post_save.connect(forget_roles, sender=model)
+    post_delete.connect(forget_roles, sender=model)
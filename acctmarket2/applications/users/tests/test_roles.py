@@ -0,0 +1,70 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+
+from acctmarket2.applications.users.models import (
+    Account, ContentManager, CustomerSupportRepresentative, User)
+from acctmarket2.applications.users.roles import get_roles
+from acctmarket2.utils.views import ContentManagerRequiredMixin
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture()
+def account(user):
+    return Account.objects.create(owner=user)
+
+
+def test_roles_resolve_in_one_query(
+    user, account, django_assert_num_queries
+):
+    ContentManager.objects.create(user=user, account=account)
+    user = User.objects.get(pk=user.pk)
+
+    with django_assert_num_queries(1):
+        assert user.is_content_manager
+        assert not user.is_customer_support_representative
+        assert not user.is_customer
+        assert not user.is_administrator
+
+    # A later request is served from the cache
+    user = User.objects.get(pk=user.pk)
+    with django_assert_num_queries(0):
+        assert user.roles == {"content_manager"}
+
+
+def test_profile_writes_invalidate_roles(
+    user, account, django_capture_on_commit_callbacks
+):
+    assert get_roles(user) == frozenset()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        profile = CustomerSupportRepresentative.objects.create(
+            user=user, account=account
+        )
+    assert get_roles(user) == {"customer_support_representative"}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        profile.delete()
+    assert get_roles(user) == frozenset()
+    assert get_roles(AnonymousUser()) == frozenset()
+
+
+def test_staff_mixin_uses_resolved_roles(
+    user, account, rf, django_assert_num_queries
+):
+    ContentManager.objects.create(user=user, account=account)
+    request = rf.get("/fake-url/")
+    request.user = User.objects.get(pk=user.pk)
+    mixin = ContentManagerRequiredMixin()
+
+    with django_assert_num_queries(1):
+        for _ in range(3):
+            assert mixin.user_is_content_manager(request.user)
@@ -1,8 +1,44 @@
+from contextlib import contextmanager
+
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 from acctmarket2.applications.users.models import User
 from acctmarket2.applications.users.tests.factories import UserFactory
 
+# Statements ATOMIC_REQUESTS wraps every view in
+SAVEPOINT_STATEMENTS = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO")
+
+
+class CaptureViewQueries(CaptureQueriesContext):
+    """
+    Capture the queries a block runs, leaving out the savepoints around
+    views, so budgets hold whatever the database settings.
+    """
+
+    @property
+    def captured_queries(self):
+        return [
+            query
+            for query in super().captured_queries
+            if not query["sql"].startswith(SAVEPOINT_STATEMENTS)
+        ]
+
+
+@contextmanager
+def _assert_view_queries(num, exact=True):
+    with CaptureViewQueries(connection) as context:
+        yield context
+    executed = len(context)
+    if executed != num if exact else executed > num:
+        sqls = "\n".join(query["sql"] for query in context.captured_queries)
+        expected = f"{num} queries" if exact else f"{num} queries or less"
+        pytest.fail(
+            f"Expected to perform {expected} but {executed} were done:\n"
+            f"{sqls}"
+        )
+
 
 @pytest.fixture(autouse=True)
 def _media_storage(settings, tmpdir) -> None:
@@ -12,3 +48,16 @@ def _media_storage(settings, tmpdir) -> None:
 @pytest.fixture()
 def user(db) -> User:
     return UserFactory()
+
+
+@pytest.fixture()
+def assert_view_queries(db):
+    return _assert_view_queries
+
+
+@pytest.fixture()
+def assert_max_view_queries(db):
+    def assert_max(num):
+        return _assert_view_queries(num, exact=False)
+
+    return assert_max
@@ -78,12 +78,10 @@ $(document).ready(function () {
 
 // --------------------------------------fiilter product
 $(document).ready(function () {
-    // Event handler for clicking on filter checkboxes or the price filter button
-    $(".filter-checkbox, #price-filter-btn").on("click", function () {
-        console.log("Checkbox or button clicked");
-
+    // Send the sidebar filters to the server and render the requested page
+    function filterProducts(page) {
         // Initialize an empty object to hold the filter criteria
-        let filter_object = {};
+        let filter_object = {page: page || 1};
 
         // Get the minimum price from the min attribute of the price input element
         let min_price = $("#max_price").attr("min");
@@ -108,30 +106,96 @@ $(document).ready(function () {
             });
         });
 
-        console.log("Filter object is ", filter_object);
-
         // Send an AJAX request to the server with the filter criteria
         $.ajax({
             url: "/filter-product", // URL to send the request to
             data: filter_object, // Data to be sent to the server
             dataType: "json", // Expect a JSON response from the server
-            beforeSend: function () {
-                console.log("Before send");
-            },
             // Function to handle a successful response
             success: function (response) {
-                console.log("Success");
-                console.log(response);
                 // Update the HTML content of the element with id 'filtered-product' with the response data
                 $("#filtered-product").html(response.data);
+                // Filtered results page on their own
+                $(".load-more").remove();
+
+                // Refresh the counts next to every category and tag
+                $(".facet-count").each(function () {
+                    let facet = $(this).data("facet");
+                    let value = String($(this).data("value"));
+                    let count = 0;
+                    if (facet === "category") {
+                        count = response.facets.categories[value] || 0;
+                    } else if (facet === "tag") {
+                        let tag = response.facets.tags.find(function (item) {
+                            return item.slug === value;
+                        });
+                        count = tag ? tag.count : 0;
+                    }
+                    $(this).text("(" + count + ")");
+                });
             },
             // Function to handle errors
             error: function (xhr, status, error) {
                 console.log("Error: ", error);
             }
         });
+    }
+
+    // Event handler for clicking on filter checkboxes or the price filter button
+    $(".filter-checkbox, #price-filter-btn").on("click", function () {
+        filterProducts(1);
+    });
+
+    // Pagination links are part of the rendered results
+    $("#filtered-product").on("click", ".filter-page", function () {
+        filterProducts($(this).data("page"));
     });
 
+    // Append the next page of a listing in place of navigating to it
+    function loadMore(link) {
+        if (link.data("loading")) {
+            return;
+        }
+        link.data("loading", true);
+        let url = link.attr("href");
+        $.ajax({
+            url: url + (url.indexOf("?") === -1 ? "?" : "&") + "format=json",
+            dataType: "json",
+            success: function (response) {
+                $(link.data("target")).append(response.data);
+                if (response.next) {
+                    link.attr("href", response.next);
+                    link.data("loading", false);
+                } else {
+                    link.remove();
+                }
+            },
+            error: function (xhr, status, error) {
+                console.log("Error: ", error);
+                link.data("loading", false);
+            }
+        });
+    }
+
+    $(document).on("click", ".load-more", function (event) {
+        event.preventDefault();
+        loadMore($(this));
+    });
+
+    // Infinite scroll: load the next page once the link comes into view
+    if ("IntersectionObserver" in window) {
+        let observer = new IntersectionObserver(function (entries) {
+            entries.forEach(function (entry) {
+                if (entry.isIntersecting && document.body.contains(entry.target)) {
+                    loadMore($(entry.target));
+                }
+            });
+        });
+        $(".load-more").each(function () {
+            observer.observe(this);
+        });
+    }
+
     // Event handler for when the price input loses focus
     $("#max_price").on("blur", function () {
         let min_price = $(this).attr("min"); // Get the minimum price value
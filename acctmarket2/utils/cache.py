@@ -0,0 +1,46 @@
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY_PREFIX = "acctmarket2:version"
+
+
+def _version_key(namespace):
+    return f"{VERSION_KEY_PREFIX}:{namespace}"
+
+
+def get_version(namespace):
+    """
+    Return the current version number of a cached namespace.
+
+    The version is seeded from the clock the first time it is read so a
+    cache flush or eviction can never hand out a number that was already
+    used for an older snapshot.
+    """
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key, 0)
+    return version
+
+
+def bump_version(namespace):
+    """
+    Invalidate every entry keyed on ``namespace`` by moving its version on.
+    """
+    key = _version_key(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The key was evicted; reseed it instead of restarting at 1.
+        cache.set(key, time.time_ns(), timeout=None)
+        return cache.get(key, 0)
+
+
+def versioned_key(namespace, *parts):
+    """
+    Build a cache key that changes whenever ``namespace`` is bumped.
+    """
+    suffix = ":".join(str(part) for part in parts)
+    return f"{namespace}:{get_version(namespace)}:{suffix}"
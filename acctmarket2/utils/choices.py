@@ -27,3 +27,9 @@ class Ticket(TextChoices):
     OPEN = ("OPEN", "OPEN")
     IN_PROGRESS = ("IN_PROGRESS", "IN_PROGRESS")
     CLOSED = ("CLOSED", "CLOSED")
+
+
+class JobStatus(TextChoices):
+    QUEUED = ("QUEUED", "QUEUED")
+    RUNNING = ("RUNNING", "RUNNING")
+    FAILED = ("FAILED", "FAILED")
@@ -0,0 +1,135 @@
+"""
+Conditional GET for views whose content follows model ``updated_at``
+timestamps.
+
+Views opt in with ``ConditionalGetMixin`` and say what the page is built
+from. ``Last-Modified`` is the latest ``updated_at`` over those querysets,
+cached until one of ``conditional_namespaces`` is bumped, so revalidating a
+page costs a couple of cache reads. The ``ETag`` also covers the namespace
+versions, which move on deletes that a maximum cannot see.
+"""
+import calendar
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import get_language
+
+from acctmarket2.utils.cache import get_version, versioned_key
+from acctmarket2.utils.page_cache import cacheable_request, visitor_fingerprint
+
+
+def latest_update(namespace, label, *querysets):
+    """
+    The latest ``updated_at`` over ``querysets``, cached under ``label``
+    until ``namespace`` is bumped. ``None`` when they are all empty.
+    """
+    key = versioned_key(namespace, "updated_at", label)
+    latest = cache.get(key)
+    if latest is None:
+        values = [
+            queryset.aggregate(latest=Max("updated_at"))["latest"]
+            for queryset in querysets
+        ]
+        latest = max((value for value in values if value), default=None)
+        if latest is not None:
+            cache.set(key, latest, settings.CONDITIONAL_CACHE_TIMEOUT)
+    return latest
+
+
+class ConditionalGetMixin:
+    """
+    Answer GET and HEAD with ``304 Not Modified`` when nothing the page
+    shows has changed since the visitor's copy.
+
+    Views implement ``get_last_modified()``. By default only requests that
+    get the shared anonymous page are answered conditionally, with the
+    per-visitor page holes folded into the ``ETag``.
+    """
+
+    conditional_namespaces = ()
+
+    def get_last_modified(self):
+        return None
+
+    def conditional_applies(self):
+        return cacheable_request(self.request)
+
+    def visitor_parts(self):
+        return visitor_fingerprint(self.request)
+
+    def conditional_validators(self):
+        """
+        The ``(etag, last_modified)`` of this request's page, or ``None``
+        when it can't be answered conditionally.
+        """
+        if not self.conditional_applies():
+            return None
+        last_modified = self.get_last_modified()
+        if last_modified is None:
+            return None
+        parts = [
+            self.request.get_full_path(),
+            get_language(),
+            last_modified.isoformat(),
+            *(get_version(name) for name in self.conditional_namespaces),
+            *self.visitor_parts(),
+        ]
+        etag = hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()
+        return etag, last_modified
+
+
+class ConditionalGetMiddleware:
+    """
+    Evaluate ``If-None-Match`` and ``If-Modified-Since`` for views using
+    ``ConditionalGetMixin`` before the page is rendered or fetched from the
+    page cache, and stamp the validators on the responses sent in full.
+
+    Must come after the authentication and message middleware and before
+    ``AnonymousPageCacheMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        validators = getattr(request, "conditional_validators", None)
+        if validators is None or not (
+            200 <= response.status_code < 300 or response.status_code == 304
+        ):
+            return response
+        etag, last_modified = validators
+        if not response.has_header("ETag"):
+            response["ETag"] = quote_etag(etag)
+        if not response.has_header("Last-Modified"):
+            response["Last-Modified"] = http_date(last_modified.timestamp())
+        # Clients may keep the page but must check back before using it
+        patch_cache_control(response, no_cache=True)
+        patch_vary_headers(response, ("Cookie",))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "view_class", None)
+        if request.method not in ("GET", "HEAD") or not hasattr(
+            view_class, "conditional_validators"
+        ):
+            return None
+
+        view = view_class(**view_func.view_initkwargs)
+        view.setup(request, *view_args, **view_kwargs)
+        validators = view.conditional_validators()
+        if validators is None:
+            return None
+        request.conditional_validators = validators
+        etag, last_modified = validators
+        response = get_conditional_response(
+            request,
+            etag=quote_etag(etag),
+            last_modified=calendar.timegm(last_modified.utctimetuple()),
+        )
+        return response
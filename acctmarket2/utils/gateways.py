@@ -0,0 +1,198 @@
+import logging
+import threading
+import time
+from functools import lru_cache
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(requests.RequestException):
+    """
+    Raised instead of calling a provider that has been failing.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stop calling a provider after ``threshold`` consecutive failures and
+    let a single trial call through once ``reset_timeout`` seconds passed.
+    """
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError("Circuit is open")
+            # Half-open: this call is the trial, keep others out meanwhile
+            self.opened_at = time.monotonic()
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class GatewayMetrics:
+    """
+    In-process call counters and latency of one provider.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, seconds, failed):
+        with self.lock:
+            self.calls += 1
+            self.failures += int(failed)
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "failures": self.failures,
+                "avg_ms": (
+                    self.total_seconds / self.calls * 1000
+                    if self.calls
+                    else 0.0
+                ),
+                "max_ms": self.max_seconds * 1000,
+            }
+
+
+class GatewayClient:
+    """
+    Keep-alive HTTP client for one payment or rates provider.
+
+    Every call goes through a pooled ``requests.Session`` with connect and
+    read timeouts. Idempotent requests are retried on connection errors
+    and 502/503/504 answers, and a circuit breaker fails fast while the
+    provider keeps erroring.
+    """
+
+    def __init__(
+        self,
+        name,
+        base_url,
+        headers=None,
+        timeout=None,
+        retries=None,
+        breaker=None,
+    ):
+        self.name = name
+        self.base_url = base_url
+        self.timeout = timeout or (
+            settings.GATEWAY_CONNECT_TIMEOUT,
+            settings.GATEWAY_READ_TIMEOUT,
+        )
+        self.breaker = breaker or CircuitBreaker(
+            settings.GATEWAY_BREAKER_THRESHOLD,
+            settings.GATEWAY_BREAKER_RESET,
+        )
+        self.metrics = GatewayMetrics()
+
+        retry = Retry(
+            total=settings.GATEWAY_RETRIES if retries is None else retries,
+            backoff_factor=0.2,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=4, pool_maxsize=16, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, path="", **kwargs):
+        self.breaker.before_call()
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = self.session.request(
+                method, self.base_url + path, **kwargs
+            )
+            failed = response.status_code >= 500
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            self.metrics.record(elapsed, failed)
+            if failed:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            logger.info(
+                f"{self.name} {method} {path or '/'} "
+                f"{'failed' if failed else 'ok'} in {elapsed * 1000:.1f}ms"
+            )
+
+    def get(self, path="", **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path="", **kwargs):
+        return self.request("POST", path, **kwargs)
+
+
+@lru_cache(maxsize=None)
+def paystack_client():
+    return GatewayClient(
+        "paystack",
+        "https://api.paystack.co",
+        headers={
+            "Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}",
+            "Content-Type": "application/json",
+        },
+    )
+
+
+@lru_cache(maxsize=None)
+def nowpayments_client():
+    if settings.USE_NOWPAYMENTS_SANDBOX:
+        base_url = "https://api-sandbox.nowpayments.io/v1/"
+    else:
+        base_url = "https://api.nowpayments.io/v1/"
+    return GatewayClient(
+        "nowpayments",
+        base_url,
+        headers={"x-api-key": settings.NOWPAYMENTS_API_KEY},
+    )
+
+
+@lru_cache(maxsize=None)
+def exchange_rate_client():
+    return GatewayClient(
+        "exchange_rate",
+        settings.EXCHANGE_RATE_API_URL,
+        headers={"apikey": settings.EXCHANGE_RATE_API_KEY},
+    )
@@ -0,0 +1,182 @@
+import os
+import secrets
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+
+# Custom epoch (2024-01-01 UTC) keeps Snowflake ids well inside 63 bits
+EPOCH_MS = 1704067200000
+NODE_BITS = 10
+SEQUENCE_BITS = 12
+NODE_COUNT = 1 << NODE_BITS
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+NODE_LEASE_KEY = "ids:node:{}"
+# Caches each process keeps to itself, which can't hand out node leases
+PROCESS_LOCAL_CACHES = (LocMemCache, DummyCache)
+
+CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+class NodeIdUnavailable(Exception):
+    """
+    No node id could be leased, so no Snowflake id can be minted safely.
+    """
+
+
+def now_ms():
+    return time.time_ns() // 1_000_000
+
+
+class SnowflakeGenerator:
+    """
+    Time-ordered 63-bit ids: milliseconds since ``EPOCH_MS``, then the
+    node id, then a per-millisecond sequence. Ids from one generator never
+    repeat, and generators with different node ids never collide.
+    """
+
+    def __init__(self, node_id):
+        if not 0 <= node_id < NODE_COUNT:
+            raise ValueError(f"Node id must be in 0-{NODE_COUNT - 1}")
+        self.node_id = node_id
+        self.last_ms = -1
+        self.sequence = 0
+        self.lock = threading.Lock()
+
+    def next_id(self):
+        with self.lock:
+            # Never step back, even if the wall clock does
+            timestamp = max(now_ms(), self.last_ms)
+            if timestamp == self.last_ms:
+                self.sequence = (self.sequence + 1) & SEQUENCE_MASK
+                if self.sequence == 0:
+                    # Sequence exhausted for this millisecond, borrow the next
+                    timestamp += 1
+            else:
+                self.sequence = 0
+            self.last_ms = timestamp
+            return (
+                (timestamp - EPOCH_MS) << (NODE_BITS + SEQUENCE_BITS)
+                | self.node_id << SEQUENCE_BITS
+                | self.sequence
+            )
+
+
+class NodeLease:
+    """
+    A node id leased from the shared cache: ``add`` (``SET NX``) with a
+    timeout of ``ID_NODE_LEASE_TIMEOUT`` seconds.
+
+    The lease is renewed once half of it has run out. A lease that lapsed,
+    because the process stalled or the cache lost the key, is given up for
+    a new one, so no two live processes mint ids with the same node id.
+    """
+
+    def __init__(self, backend=None, timeout=None):
+        self.cache = backend or caches[DEFAULT_CACHE_ALIAS]
+        self.timeout = timeout or settings.ID_NODE_LEASE_TIMEOUT
+        self.token = uuid.uuid4().hex
+        self.node_id = None
+        self.renew_at = self.expires_at = 0.0
+
+    def leased(self, node_id):
+        now = time.monotonic()
+        self.node_id = node_id
+        self.renew_at = now + self.timeout / 2
+        self.expires_at = now + self.timeout
+        return node_id
+
+    def add(self, node_id):
+        added = self.cache.add(
+            NODE_LEASE_KEY.format(node_id), self.token, self.timeout
+        )
+        if added is None:
+            # django-redis answers None when IGNORE_EXCEPTIONS hides an error
+            raise NodeIdUnavailable("The cache holding node leases is down")
+        return added
+
+    def acquire(self):
+        # Start anywhere so processes starting together don't all race for
+        # the same ids
+        start = secrets.randbelow(NODE_COUNT)
+        for offset in range(NODE_COUNT):
+            node_id = (start + offset) % NODE_COUNT
+            if self.add(node_id):
+                return self.leased(node_id)
+        raise NodeIdUnavailable(f"All {NODE_COUNT} node ids are leased")
+
+    def current(self):
+        """
+        The node id to mint with, renewing or replacing the lease when due.
+        """
+        now = time.monotonic()
+        if self.node_id is None:
+            return self.acquire()
+        if now < self.renew_at:
+            return self.node_id
+
+        key = NODE_LEASE_KEY.format(self.node_id)
+        if self.cache.get(key) == self.token and self.cache.touch(
+            key, self.timeout
+        ):
+            return self.leased(self.node_id)
+        try:
+            if self.add(self.node_id):
+                # Lapsed, but nobody else took it
+                return self.leased(self.node_id)
+        except NodeIdUnavailable:
+            if now < self.expires_at:
+                # Nobody can take the id while the cache is down
+                return self.node_id
+            raise
+        return self.acquire()
+
+
+_lease = None
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def current_node_id():
+    """
+    ``ID_NODE`` when set, otherwise a node id leased from the shared cache.
+    A cache each process keeps to itself can't tell processes apart, so
+    it needs ``ID_NODE``.
+    """
+    global _lease
+    if settings.ID_NODE is not None:
+        return settings.ID_NODE
+    if _lease is None:
+        if isinstance(caches[DEFAULT_CACHE_ALIAS], PROCESS_LOCAL_CACHES):
+            raise ImproperlyConfigured(
+                "Set ID_NODE: the default cache is not shared between "
+                "processes, so it can't lease node ids"
+            )
+        _lease = NodeLease()
+    return _lease.current()
+
+
+def next_snowflake():
+    global _generator
+    with _generator_lock:
+        node_id = current_node_id()
+        if _generator is None or _generator.node_id != node_id:
+            _generator = SnowflakeGenerator(node_id)
+        generator = _generator
+    return generator.next_id()
+
+
+def new_ulid():
+    """
+    A 26 character ULID: 48 bits of milliseconds and 80 random bits in
+    Crockford base32, so references sort by creation time.
+    """
+    value = now_ms() << 80 | int.from_bytes(os.urandom(10), "big")
+    return "".join(
+        CROCKFORD[(value >> shift) & 31] for shift in range(125, -1, -5)
+    )
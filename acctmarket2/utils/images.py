@@ -0,0 +1,112 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+from cloudinary import CloudinaryImage
+
+# Formats offered to browsers through <picture> sources, best first. The
+# <img> fallback uses Cloudinary's f_auto and lets the CDN pick.
+MODERN_FORMATS = (("avif", "image/avif"), ("webp", "image/webp"))
+
+
+@dataclass(frozen=True)
+class Derivative:
+    width: int
+    height: int | None = None
+    crop: str = "fill"
+    # Candidate widths for srcset; the browser picks one using ``sizes``
+    widths: tuple = ()
+    sizes: str = "100vw"
+
+    def height_for(self, width):
+        if self.height is None:
+            return None
+        return round(self.height * width / self.width)
+
+
+DERIVATIVES = {
+    "thumb": Derivative(
+        width=80, height=80, widths=(80, 160), sizes="80px"
+    ),
+    "card": Derivative(
+        width=400,
+        height=400,
+        crop="pad",
+        widths=(200, 400, 600, 800),
+        sizes="(min-width: 1200px) 25vw, (min-width: 768px) 33vw, 50vw",
+    ),
+    "hero": Derivative(
+        width=1600,
+        height=600,
+        widths=(640, 960, 1280, 1600, 2400),
+        sizes="100vw",
+    ),
+}
+
+
+def public_id_of(image):
+    """
+    The Cloudinary public id behind a ``CloudinaryField`` value, or an
+    empty string while the image is missing or still pending upload.
+    """
+    if not image:
+        return ""
+    return getattr(image, "public_id", None) or str(image)
+
+
+@lru_cache(maxsize=4096)
+def derivative_url(public_id, size, width=None, fmt="auto"):
+    """
+    Build the transformation URL of one derivative.
+
+    Public ids never change once uploaded (a new image gets a new id), so
+    URLs are memoized per process instead of being rebuilt every render.
+    """
+    if not public_id:
+        return ""
+    spec = DERIVATIVES[size]
+    width = width or spec.width
+    options = {
+        "width": width,
+        "crop": spec.crop,
+        "quality": "auto",
+        "fetch_format": fmt,
+        "secure": True,
+    }
+    height = spec.height_for(width)
+    if height:
+        options["height"] = height
+    return CloudinaryImage(public_id).build_url(**options)
+
+
+@lru_cache(maxsize=4096)
+def derivative_srcset(public_id, size, fmt="auto"):
+    if not public_id:
+        return ""
+    return ", ".join(
+        f"{derivative_url(public_id, size, width, fmt)} {width}w"
+        for width in DERIVATIVES[size].widths
+    )
+
+
+def image_url(image, size):
+    return derivative_url(public_id_of(image), size)
+
+
+def responsive_image_context(image, size):
+    """
+    Everything the ``responsive_image`` tag needs to render a <picture>
+    element for ``image`` at the named ``size``.
+    """
+    public_id = public_id_of(image)
+    spec = DERIVATIVES[size]
+    return {
+        "src": derivative_url(public_id, size),
+        "srcset": derivative_srcset(public_id, size),
+        "sources": [
+            {"type": mime, "srcset": derivative_srcset(public_id, size, fmt)}
+            for fmt, mime in MODERN_FORMATS
+        ],
+        "sizes": spec.sizes,
+        "width": spec.width,
+        "height": spec.height,
+    }
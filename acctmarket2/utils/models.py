@@ -3,11 +3,13 @@ from io import BytesIO
 import auto_prefetch
 from cloudinary import uploader
 from cloudinary.models import CloudinaryField
+from django.conf import settings
 from django.db import models
 from django.db.models.query import QuerySet
 from model_utils import FieldTracker
 
 from acctmarket2.utils.media import MediaHelper
+from acctmarket2.utils.uploads import stage_image, upload_staged_image
 
 
 class VisibleManager(auto_prefetch.Manager):
@@ -74,10 +76,16 @@ class BaseModel(UIDTimeBasedModel):
 class ImageTitleTimeBaseModels(TitleTimeBasedModel):
     # Using CloudinaryField for image upload
     image = CloudinaryField("image", default="", blank=True)
+    # Staged file waiting for the upload worker; empty once it is live
+    image_pending = models.CharField(max_length=255, default="", blank=True)
 
     class Meta(auto_prefetch.Model.Meta):
         abstract = True
 
+    @property
+    def image_is_pending(self):
+        return bool(self.image_pending)
+
     def save(self, *args, **kwargs):
         if self.image and not str(self.image).startswith("http"):
             if hasattr(self.image, "file"):
@@ -86,10 +94,34 @@ class ImageTitleTimeBaseModels(TitleTimeBasedModel):
                     self.image.file, "name"
                 ):
                     self.image.file.name = "temporary_image_name.jpg"
-                upload_path = MediaHelper.get_image_upload_path(
-                    self, self.image.file.name
+                filename = (
+                    getattr(self.image, "name", "") or self.image.file.name
                 )
+                upload_path = MediaHelper.get_image_upload_path(self, filename)
+                if settings.IMAGE_UPLOADS_DEFERRED:
+                    return self._save_deferred(upload_path, *args, **kwargs)
                 upload_result = uploader.upload(
                     self.image.file, folder=upload_path)
                 self.image = upload_result["public_id"]
         super(ImageTitleTimeBaseModels, self).save(*args, **kwargs)
+
+    def _save_deferred(self, upload_path, *args, **kwargs):
+        """
+        Stage the new image, save the row with its current image and a
+        pending marker, and leave the upload to a background job.
+        """
+        self.image_pending = stage_image(upload_path, self.image.file)
+        self.image = (
+            type(self)._base_manager.filter(pk=self.pk)
+            .values_list("image", flat=True)
+            .first()
+            if self.pk
+            else ""
+        ) or ""
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "image" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "image_pending"}
+        super(ImageTitleTimeBaseModels, self).save(*args, **kwargs)
+        upload_staged_image.delay(
+            self._meta.label, self.pk, self.image_pending
+        )
@@ -0,0 +1,262 @@
+"""
+Full-page cache for anonymous visitors.
+
+Views opt in with ``AnonymousPageCacheMixin`` and list the cache
+namespaces their HTML depends on; a page is keyed on its path, query
+string, language and the current version of each namespace, so bumping a
+namespace retires every page built from it.
+
+Per-visitor bits are left as holes: ``{% page_hole "cart_count" %}``
+renders a marker while a page is being cached, and the marker is filled
+for each request the page is served to. Only one worker renders a missing
+page; the others wait for it instead of all rendering it at once.
+"""
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from acctmarket2.utils.cache import get_version
+
+PAGE_CACHE_PREFIX = "pagecache"
+HOLE_MARKER = "<!--page-hole:{}-->"
+HOLE_PATTERN = re.compile(rb"<!--page-hole:([\w-]+)-->")
+# Headers that belong to one response and are never replayed
+UNCACHED_HEADERS = ("content-length", "set-cookie", "x-page-cache")
+PAGE_CACHE_EVENTS = ("hit", "miss", "coalesced", "bypass")
+LOCK_POLL_INTERVAL = 0.05
+
+HOLES = {}
+# Holes whose value tells one visitor's copy of a page from another's
+VISITOR_HOLES = set()
+
+
+def hole(name, per_visitor=True):
+    """
+    Register the function rendering hole ``name`` for one request. Holes
+    that render differently for every call rather than every visitor, like
+    a freshly masked CSRF token, pass ``per_visitor=False``.
+    """
+    def register(func):
+        HOLES[name] = func
+        if per_visitor:
+            VISITOR_HOLES.add(name)
+        return func
+
+    return register
+
+
+def visitor_fingerprint(request):
+    """
+    The values of the per-visitor holes, which together with the shared
+    page determine what one visitor sees.
+    """
+    return tuple(
+        str(HOLES[name](request)) for name in sorted(VISITOR_HOLES)
+    )
+
+
+@hole("csrf_token", per_visitor=False)
+def csrf_input(request):
+    return format_html(
+        '<input type="hidden" name="csrfmiddlewaretoken" value="{}">',
+        get_token(request),
+    )
+
+
+def render_hole(request, name):
+    """
+    What ``{% page_hole %}`` renders: a marker while the page is being
+    cached, the fragment itself otherwise.
+    """
+    if request is None:
+        return ""
+    if getattr(request, "page_cache_key", None):
+        return mark_safe(HOLE_MARKER.format(name))
+    return conditional_escape(HOLES[name](request))
+
+
+def fill_holes(request, content):
+    def fill(match):
+        fragment = conditional_escape(HOLES[match.group(1).decode()](request))
+        return str(fragment).encode(settings.DEFAULT_CHARSET)
+
+    return HOLE_PATTERN.sub(fill, content)
+
+
+def record(event):
+    """
+    Count a cache event in the shared cache, so every worker adds to the
+    same totals.
+    """
+    key = f"{PAGE_CACHE_PREFIX}:metrics:{event}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def page_cache_metrics():
+    keys = {
+        event: f"{PAGE_CACHE_PREFIX}:metrics:{event}"
+        for event in PAGE_CACHE_EVENTS
+    }
+    values = cache.get_many(keys.values())
+    metrics = {event: values.get(key, 0) for event, key in keys.items()}
+    served = metrics["hit"] + metrics["coalesced"]
+    total = served + metrics["miss"] + metrics["bypass"]
+    metrics["hit_ratio"] = served / total if total else 0.0
+    return metrics
+
+
+def reset_page_cache_metrics():
+    cache.delete_many(
+        [f"{PAGE_CACHE_PREFIX}:metrics:{event}" for event in PAGE_CACHE_EVENTS]
+    )
+
+
+def page_key(request, namespaces):
+    versions = ".".join(str(get_version(name)) for name in namespaces)
+    digest = hashlib.sha1(request.get_full_path().encode()).hexdigest()
+    return f"{PAGE_CACHE_PREFIX}:{versions}:{get_language()}:{digest}"
+
+
+def lock_key(key):
+    return f"{key}:lock"
+
+
+def page_cache_namespaces(view_func):
+    view_class = getattr(view_func, "view_class", None)
+    return getattr(view_class, "page_cache_namespaces", None)
+
+
+def cacheable_request(request):
+    # Flash messages are rendered into the page, so it can't be shared
+    return (
+        request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+        and not len(get_messages(request))
+    )
+
+
+def cacheable_response(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and "private" not in response.get("Cache-Control", "")
+        and "no-store" not in response.get("Cache-Control", "")
+    )
+
+
+def freeze(response):
+    return {
+        "status": response.status_code,
+        "headers": {
+            header: value
+            for header, value in response.items()
+            if header.lower() not in UNCACHED_HEADERS
+        },
+        "content": response.content,
+    }
+
+
+def thaw(request, entry, state):
+    response = HttpResponse(
+        fill_holes(request, entry["content"]), status=entry["status"]
+    )
+    for header, value in entry["headers"].items():
+        response[header] = value
+    response["X-Page-Cache"] = state
+    return response
+
+
+def wait_for(key):
+    """
+    Wait for the worker holding the lock to store the page; ``None`` when
+    it takes longer than ``PAGE_CACHE_LOCK_WAIT`` seconds.
+    """
+    deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+class AnonymousPageCacheMixin:
+    """
+    Serve this view's pages to anonymous visitors from the page cache.
+
+    ``page_cache_namespaces`` lists the namespaces (see ``utils.cache``)
+    whose writes must retire the cached pages.
+    """
+
+    page_cache_namespaces = ()
+
+
+class AnonymousPageCacheMiddleware:
+    """
+    Serve, and store, the pages of views using ``AnonymousPageCacheMixin``.
+
+    Must come after the authentication and message middleware. Responses
+    carry ``X-Page-Cache: hit``, ``coalesced`` (served after waiting for
+    another worker to render it) or ``miss``; the totals are kept in the
+    cache and read with ``page_cache_metrics``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, "page_cache_key", None)
+        if key is None:
+            return response
+        try:
+            if request.method == "GET" and cacheable_response(response):
+                cache.set(key, freeze(response), settings.PAGE_CACHE_TIMEOUT)
+        finally:
+            cache.delete(lock_key(key))
+        if not response.streaming:
+            response.content = fill_holes(request, response.content)
+        response["X-Page-Cache"] = "miss"
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.PAGE_CACHE_ENABLED:
+            return None
+        namespaces = page_cache_namespaces(view_func)
+        if namespaces is None or not cacheable_request(request):
+            return None
+
+        key = page_key(request, namespaces)
+        entry = cache.get(key)
+        if entry is not None:
+            record("hit")
+            return thaw(request, entry, "hit")
+
+        if cache.add(
+            lock_key(key), True, timeout=settings.PAGE_CACHE_LOCK_TIMEOUT
+        ):
+            record("miss")
+            request.page_cache_key = key
+            return None
+
+        entry = wait_for(key)
+        if entry is None:
+            # Render it here too rather than keep the visitor waiting
+            record("bypass")
+            return None
+        record("coalesced")
+        return thaw(request, entry, "coalesced")
@@ -0,0 +1,227 @@
+import hashlib
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import (EmptyResultSet, FieldDoesNotExist,
+                                    ValidationError)
+from django.db.models import Q
+from django.template.loader import render_to_string
+
+from acctmarket2.utils.cache import versioned_key
+from acctmarket2.utils.json_response import JsonResponseMixin
+
+CURSOR_SALT = "acctmarket2.pagination.cursor"
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+@dataclass
+class CursorPage:
+    object_list: list
+    next_cursor: str | None
+    previous_cursor: str | None
+    count: int | None = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CursorPaginator:
+    """
+    Keyset pagination over ``ordering``, which must end in a unique field.
+
+    A page is fetched with ``WHERE (a, b) < (last a, last b)`` style
+    conditions instead of ``OFFSET``, so page 500 costs what page 1 costs.
+    Cursors are signed, so they are opaque to clients and cannot be
+    tampered with.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = [
+            (name.lstrip("-"), name.startswith("-")) for name in ordering
+        ]
+        self.per_page = per_page
+
+    def encode(self, obj, direction):
+        values = [
+            self.to_json(getattr(obj, name)) for name, _ in self.ordering
+        ]
+        return signing.dumps(
+            {"v": values, "d": direction}, salt=CURSOR_SALT, compress=True
+        )
+
+    def to_json(self, value):
+        # Full precision matters: a timestamp cut to milliseconds would
+        # skip or repeat rows that share the truncated value
+        if hasattr(value, "isoformat"):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    def decode(self, cursor):
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+            values = data["v"]
+            direction = data["d"]
+            if len(values) != len(self.ordering) or direction not in (
+                "n", "p"
+            ):
+                raise ValueError
+            return [
+                self.to_python(name, value)
+                for (name, _), value in zip(self.ordering, values)
+            ], direction
+        except (signing.BadSignature, KeyError, TypeError, ValueError,
+                ValidationError):
+            raise InvalidCursor(cursor)
+
+    def to_python(self, name, value):
+        try:
+            field = self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations such as a search rank are plain numbers
+            return value
+        return field.to_python(value)
+
+    def after(self, values, reverse=False):
+        """
+        The condition selecting rows that sort after ``values``, or before
+        them when ``reverse`` is set.
+        """
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.ordering, values):
+            lookup = "lt" if descending != reverse else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def order_by(self, reverse=False):
+        return [
+            f"-{name}" if descending != reverse else name
+            for name, descending in self.ordering
+        ]
+
+    def page(self, cursor=None):
+        values, direction = self.decode(cursor) if cursor else (None, "n")
+        backwards = direction == "p"
+
+        queryset = self.queryset.order_by(*self.order_by(reverse=backwards))
+        if values is not None:
+            queryset = queryset.filter(self.after(values, reverse=backwards))
+        rows = list(queryset[: self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if backwards:
+            rows.reverse()
+
+        has_next = (more and not backwards) or (backwards and bool(rows))
+        has_previous = (more and backwards) or (
+            values is not None and not backwards
+        )
+        return CursorPage(
+            object_list=rows,
+            next_cursor=self.encode(rows[-1], "n")
+            if rows and has_next else None,
+            previous_cursor=self.encode(rows[0], "p")
+            if rows and has_previous else None,
+        )
+
+
+class CursorPaginationMixin(JsonResponseMixin):
+    """
+    Keyset pagination for list views; ``paginate_by`` sets the page size.
+
+    The template gets ``page_obj`` (a ``CursorPage``) and the URLs of the
+    neighbouring pages. Requests with ``?format=json`` get the rendered
+    cards of ``cursor_item_template`` and the next page's URL, for infinite
+    scrolling. When ``cursor_count_namespace`` is set, the total is counted
+    once and cached until that namespace is bumped.
+    """
+
+    cursor_ordering = ("-created_at", "-id")
+    cursor_param = "cursor"
+    cursor_item_template = None
+    cursor_item_context_name = "products"
+    cursor_count_namespace = None
+
+    def get_cursor_ordering(self):
+        return self.cursor_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = CursorPaginator(
+            queryset, self.get_cursor_ordering(), page_size
+        )
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_param))
+        except InvalidCursor:
+            page = paginator.page()
+        if self.cursor_count_namespace is not None:
+            page.count = self.cached_count(queryset)
+        return paginator, page, page.object_list, page.has_other_pages
+
+    def cached_count(self, queryset):
+        try:
+            sql = str(queryset.query)
+        except EmptyResultSet:
+            return 0
+        digest = hashlib.sha1(sql.encode()).hexdigest()
+        key = versioned_key(self.cursor_count_namespace, "count", digest)
+        count = cache.get(key)
+        if count is None:
+            count = queryset.order_by().count()
+            cache.set(key, count, settings.PAGINATION_COUNT_TIMEOUT)
+        return count
+
+    def page_url(self, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params.pop("format", None)
+        params[self.cursor_param] = cursor
+        return f"{self.request.path}?{params.urlencode()}"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = context["page_obj"]
+        context["next_page_url"] = self.page_url(page.next_cursor)
+        context["previous_page_url"] = self.page_url(page.previous_cursor)
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.request.GET.get("format") != "json":
+            return super().render_to_response(context, **response_kwargs)
+        page = context["page_obj"]
+        return self.render_to_json_response(
+            {
+                "data": render_to_string(
+                    self.cursor_item_template,
+                    {self.cursor_item_context_name: page.object_list},
+                    request=self.request,
+                ),
+                "next": context["next_page_url"],
+                "count": page.count,
+            }
+        )
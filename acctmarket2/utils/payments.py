@@ -1,27 +1,28 @@
 import logging
 from decimal import Decimal
 
-import requests
-from django.conf import settings
 # from django.contrib import messages
 from django.urls import reverse
 
+from acctmarket2.utils.gateways import nowpayments_client, paystack_client
+from acctmarket2.utils.rates import RatesUnavailable, get_rates
+
 logger = logging.getLogger(__name__)
 
 
 class PayStack:
-    PAYSTACK_SECRET_KEY = settings.PAYSTACK_SECRET_KEY
-    base_url = "https://api.paystack.co"
+    def initialize_transaction(self, data):
+        """
+        Start a Paystack transaction and return the decoded response.
+        """
+        response = paystack_client().post(
+            "/transaction/initialize", json=data
+        )
+        return response.json()
 
     def verify_payment(self, ref, *args, **kwargs):
         path = f"/transaction/verify/{ref}"
-
-        headers = {
-            "Authorization": f"Bearer {self.PAYSTACK_SECRET_KEY}",
-            "Content-Type": "application/json",
-        }
-        url = self.base_url + path
-        response = requests.get(url, headers=headers)
+        response = paystack_client().get(path)
 
         if response.status_code == 200:
             response_data = response.json()
@@ -31,12 +32,19 @@ class PayStack:
 
 
 class NowPayment:
-    # Set the API key and URL based on the environment
-    NOWPAYMENTS_API_KEY = settings.NOWPAYMENTS_API_KEY
-    # Use sandbox URL for testing
-    # Uncomment the production URL for live use
-    NOWPAYMENTS_API_URL = "https://api-sandbox.nowpayments.io/v1/"
-    # NOWPAYMENTS_API_URL = "https://api.nowpayments.io/v1/"
+    # Sandbox or production is picked by USE_NOWPAYMENTS_SANDBOX
+
+    def get_currencies(self):
+        """
+        The list of currencies NOWPayments accepts, served from the cache.
+        """
+        return get_rates("currencies")
+
+    def create_invoice(self, payload):
+        """
+        Create a hosted invoice and return the raw response.
+        """
+        return nowpayments_client().post("invoice", json=payload)
 
     def create_payment(self, amount, currency, order_id, description, request):
         """
@@ -53,11 +61,6 @@ class NowPayment:
             dict: The response from the API call.
                   Includes status and data or message.
         """
-        url = f"{self.NOWPAYMENTS_API_URL}invoice"
-        headers = {
-            "x-api-key": self.NOWPAYMENTS_API_KEY,
-            "Content-Type": "application/json",
-        }
         data = {
             # Convert to integer amount in smallest unit
             "price_amount": int(amount * 100),
@@ -74,7 +77,7 @@ class NowPayment:
                 reverse("ecommerce:payment_failed")
             ),
         }
-        response = requests.post(url, headers=headers, json=data)
+        response = nowpayments_client().post("invoice", json=data)
         result = response.json()
 
         if response.status_code == 200:
@@ -100,11 +103,7 @@ class NowPayment:
             tuple: A tuple with a boolean
             indicating success and the response data or None.
         """
-        headers = {
-            "x-api-key": self.NOWPAYMENTS_API_KEY,
-        }
-        url = f"{self.NOWPAYMENTS_API_URL}payment/{int(payment_id)}"
-        response = requests.get(url, headers=headers)
+        response = nowpayments_client().get(f"payment/{int(payment_id)}")
 
         if response.status_code == 200:
             return True, response.json()
@@ -116,7 +115,7 @@ class NowPayment:
 def get_exchange_rate(target_currency="NGN"):
     """
     Retrieves the exchange rate for a given target
-    currency from an external API.
+    currency from the cached rates service.
 
     Args:
         target_currency (str, optional):
@@ -131,28 +130,21 @@ def get_exchange_rate(target_currency="NGN"):
         or the target currency is not found in the response data.
 
     """
-    url = f"{settings.EXCHANGE_RATE_API_URL}"
-    headers = {
-        "apikey": settings.EXCHANGE_RATE_API_KEY
-    }
-    response = requests.get(url, headers=headers)
-    data = response.json()
-
-    if response.status_code == 200 and "conversion_rates" in data:
-        rate = data["conversion_rates"].get(target_currency)
-        if rate:
-            return Decimal(rate)
-        else:
-            logger.error(
-                f"Target currency {target_currency} not found in response data"               # noqa
-            )
-            raise Exception(
-                f"Target currency {target_currency} not found in response data"                 # noqa
-            )
-    else:
-        logger.error(f"Error fetching exchange rate: {data}")
+    try:
+        conversion_rates = get_rates("exchange_rates")
+    except RatesUnavailable:
         raise Exception("Error fetching exchange rate")
 
+    rate = conversion_rates.get(target_currency)
+    if rate:
+        return Decimal(rate)
+    logger.error(
+        f"Target currency {target_currency} not found in response data"               # noqa
+    )
+    raise Exception(
+        f"Target currency {target_currency} not found in response data"                 # noqa
+    )
+
 
 def convert_to_naira(amount, exchange_rate):
     return amount * exchange_rate
@@ -0,0 +1,58 @@
+import threading
+
+
+class PermissionRegistry:
+    """
+    Named groups of permissions, given as ``"app_label.codename"`` strings.
+
+    Nothing touches the database until a group is first read, so the module
+    declaring the registry can be imported before the permission table
+    exists. A group is cached for the life of the process once every one of
+    its permissions has been found; an incomplete group (e.g. read before
+    ``migrate`` created the permissions) is looked up again next time.
+    """
+
+    def __init__(self, **groups):
+        self._groups = {name: tuple(perms) for name, perms in groups.items()}
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        groups = self.__dict__.get("_groups", {})
+        if name not in groups:
+            raise AttributeError(name)
+        return self.resolve(name)
+
+    def __dir__(self):
+        return [*super().__dir__(), *self._groups]
+
+    def resolve(self, name):
+        """
+        Return the ``Permission`` objects of group ``name``.
+        """
+        resolved = self._resolved.get(name)
+        if resolved is not None:
+            return resolved
+
+        # Imported here so declaring a registry never loads the auth app
+        from django.contrib.auth.models import Permission
+        from django.db.models import Q
+
+        perms = self._groups[name]
+        condition = Q()
+        for perm in perms:
+            app_label, codename = perm.split(".", 1)
+            condition |= Q(
+                content_type__app_label=app_label, codename=codename
+            )
+        found = list(
+            Permission.objects.filter(condition).select_related("content_type")
+        )
+        if len(found) == len(perms):
+            with self._lock:
+                self._resolved[name] = found
+        return found
+
+    def clear(self):
+        with self._lock:
+            self._resolved.clear()
@@ -0,0 +1,101 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+
+from acctmarket2.applications.jobs.queue import job
+from acctmarket2.utils.gateways import exchange_rate_client, nowpayments_client
+
+logger = logging.getLogger(__name__)
+
+
+class RatesUnavailable(Exception):
+    pass
+
+
+def fetch_currencies():
+    response = nowpayments_client().get("currencies")
+    if response.status_code != 200:
+        raise RatesUnavailable(
+            f"NOWPayments currencies returned {response.status_code}"
+        )
+    return response.json().get("currencies", [])
+
+
+def fetch_conversion_rates():
+    response = exchange_rate_client().get()
+    data = response.json()
+    if response.status_code != 200 or "conversion_rates" not in data:
+        logger.error(f"Error fetching exchange rate: {data}")
+        raise RatesUnavailable("Error fetching exchange rate")
+    return data["conversion_rates"]
+
+
+@dataclass(frozen=True)
+class RateSource:
+    key: str
+    fetch: Callable
+    ttl_setting: str
+
+    @property
+    def ttl(self):
+        return getattr(settings, self.ttl_setting)
+
+
+SOURCES = {
+    "currencies": RateSource(
+        "rates:nowpayments:currencies",
+        fetch_currencies,
+        "RATES_CURRENCIES_TTL",
+    ),
+    "exchange_rates": RateSource(
+        "rates:exchange_rates",
+        fetch_conversion_rates,
+        "RATES_EXCHANGE_TTL",
+    ),
+}
+
+
+def refresh_rates(name):
+    """
+    Fetch a source from its provider and store it with the time it was
+    fetched. The entry outlives its TTL by ``RATES_STALE_TTL`` so the last
+    good value can be served while the provider is down.
+    """
+    source = SOURCES[name]
+    value = source.fetch()
+    cache.set(
+        source.key,
+        {"value": value, "fetched_at": time.time()},
+        source.ttl + settings.RATES_STALE_TTL,
+    )
+    return value
+
+
+def get_rates(name):
+    """
+    Return a source's cached value, fetching it only when nothing is cached.
+
+    Once the value is older than its TTL it is still returned, and a single
+    background refresh is queued (stale-while-revalidate).
+    """
+    source = SOURCES[name]
+    entry = cache.get(source.key)
+    if entry is None:
+        return refresh_rates(name)
+
+    if time.time() - entry["fetched_at"] > source.ttl:
+        if cache.add(f"{source.key}:refreshing", True, timeout=60):
+            refresh_rates_in_background.delay(name)
+    return entry["value"]
+
+
+@job()
+def refresh_rates_in_background(name):
+    try:
+        refresh_rates(name)
+    finally:
+        cache.delete(f"{SOURCES[name].key}:refreshing")
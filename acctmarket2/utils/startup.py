@@ -0,0 +1,130 @@
+"""
+Cold start profiling, run in a fresh interpreter by ``profile_startup``:
+
+    python -X importtime -m acctmarket2.utils.startup acctmarket2.applications
+
+The child records every query issued while Django starts and while each
+module of the package is imported, and prints them as JSON on stdout;
+``-X importtime`` writes the import costs to stderr. Nothing here may
+import Django models at module level, or the profile would include itself.
+"""
+import importlib
+import json
+import os
+import pkgutil
+import sys
+import time
+from dataclasses import dataclass
+
+# Modules that are never imported by a running worker
+SKIPPED_MODULES = ("tests", "migrations", "conftest")
+
+
+@dataclass
+class ImportCost:
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(output, prefix):
+    """
+    Parse ``-X importtime`` lines for the modules under ``prefix``,
+    most expensive first.
+    """
+    costs = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split(
+                "|"
+            )
+            costs.append(
+                ImportCost(name.strip(), int(self_us), int(cumulative_us))
+            )
+        except ValueError:
+            # The header line, "self [us] | cumulative | imported package"
+            continue
+    return sorted(
+        (
+            cost
+            for cost in costs
+            if cost.module == prefix or cost.module.startswith(prefix + ".")
+        ),
+        key=lambda cost: cost.cumulative_us,
+        reverse=True,
+    )
+
+
+def importing_module(prefix):
+    """
+    The module of ``prefix`` whose top level is executing, if any; a query
+    issued from there runs on every import.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        name = frame.f_globals.get("__name__", "")
+        if frame.f_code.co_name == "<module>" and name.startswith(prefix):
+            return name
+        frame = frame.f_back
+    return None
+
+
+def package_modules(package):
+    module = importlib.import_module(package)
+    for info in pkgutil.walk_packages(module.__path__, package + "."):
+        if not any(
+            part in SKIPPED_MODULES for part in info.name.split(".")
+        ):
+            yield info.name
+
+
+def main(package):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
+    import django
+    from django.db import connections
+
+    queries = []
+    phase = ["setup"]
+
+    def record(execute, sql, params, many, context):
+        queries.append(
+            {
+                "phase": phase[0],
+                "module": importing_module(package.split(".")[0]),
+                "sql": sql,
+            }
+        )
+        return execute(sql, params, many, context)
+
+    for alias in connections:
+        connections[alias].execute_wrappers.append(record)
+
+    start = time.perf_counter()
+    django.setup()
+    setup_seconds = time.perf_counter() - start
+
+    phase[0] = "import"
+    failed = {}
+    start = time.perf_counter()
+    for name in package_modules(package):
+        try:
+            importlib.import_module(name)
+        except Exception as exc:
+            failed[name] = repr(exc)
+    import_seconds = time.perf_counter() - start
+
+    json.dump(
+        {
+            "setup_seconds": setup_seconds,
+            "import_seconds": import_seconds,
+            "queries": queries,
+            "failed": failed,
+        },
+        sys.stdout,
+    )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "acctmarket2.applications")
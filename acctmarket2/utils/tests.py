@@ -0,0 +1,512 @@
+import json
+import threading
+import time
+from dataclasses import replace
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+
+from acctmarket2.applications.ecommerce.models import Category, Product
+from acctmarket2.applications.home.views import TermsPolicy
+from acctmarket2.applications.jobs.queue import get_backend, run_pending
+from acctmarket2.utils import rates
+from acctmarket2.utils.gateways import (CircuitBreaker, CircuitOpenError,
+                                        GatewayClient)
+from acctmarket2.utils.ids import (NODE_COUNT, NODE_LEASE_KEY,
+                                   NodeIdUnavailable, NodeLease,
+                                   SnowflakeGenerator, current_node_id,
+                                   new_ulid)
+from acctmarket2.utils.images import derivative_url
+from acctmarket2.utils.page_cache import (AnonymousPageCacheMiddleware,
+                                          lock_key, page_cache_metrics,
+                                          page_key)
+from acctmarket2.utils.permissions import PermissionRegistry
+from acctmarket2.utils.startup import parse_importtime
+from acctmarket2.utils.uploads import staging_storage
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Paths map to (status, delay in seconds); every hit is counted
+    routes = {
+        "/ok": (200, 0),
+        "/down": (503, 0),
+        "/slow": (200, 0.5),
+    }
+
+    def do_GET(self):
+        status, delay = self.routes.get(self.path, (404, 0))
+        self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+        time.sleep(delay)
+        body = json.dumps({"path": self.path}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.hits = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(server, **kwargs):
+    host, port = server.server_address
+    kwargs.setdefault("breaker", CircuitBreaker(threshold=2, reset_timeout=60))
+    return GatewayClient("stub", f"http://{host}:{port}", **kwargs)
+
+
+class TestGatewayClient:
+    def test_calls_are_timed(self, stub_server):
+        client = make_client(stub_server)
+
+        assert client.get("/ok").json() == {"path": "/ok"}
+        assert client.get("/ok").status_code == 200
+
+        metrics = client.metrics.snapshot()
+        assert metrics["calls"] == 2
+        assert metrics["failures"] == 0
+
+    def test_read_timeout_is_enforced(self, stub_server):
+        client = make_client(stub_server, timeout=(1, 0.1), retries=0)
+
+        started = time.monotonic()
+        with pytest.raises(requests.RequestException):
+            client.get("/slow")
+
+        assert time.monotonic() - started < 0.5
+
+    def test_unavailable_provider_is_retried(self, stub_server):
+        client = make_client(stub_server, retries=2)
+
+        assert client.get("/down").status_code == 503
+        assert stub_server.hits["/down"] == 3
+
+    def test_breaker_opens_after_repeated_failures(self, stub_server):
+        client = make_client(stub_server, retries=0)
+
+        client.get("/down")
+        client.get("/down")
+        with pytest.raises(CircuitOpenError):
+            client.get("/ok")
+
+        assert "/ok" not in stub_server.hits
+        assert client.metrics.snapshot()["failures"] == 2
+
+
+@pytest.fixture()
+def currency_feed(monkeypatch):
+    """
+    Point the currencies source at a fake provider whose answers the test
+    controls.
+    """
+    feed = {"value": ["btc"], "calls": 0, "down": False}
+
+    def fetch():
+        feed["calls"] += 1
+        if feed["down"]:
+            raise rates.RatesUnavailable("down")
+        return list(feed["value"])
+
+    monkeypatch.setitem(
+        rates.SOURCES,
+        "currencies",
+        replace(rates.SOURCES["currencies"], fetch=fetch),
+    )
+    cache.clear()
+    get_backend().clear()
+    yield feed
+    cache.clear()
+    get_backend().clear()
+
+
+def age_entry(name, seconds):
+    key = rates.SOURCES[name].key
+    entry = cache.get(key)
+    entry["fetched_at"] -= seconds
+    cache.set(key, entry)
+
+
+@pytest.mark.django_db
+class TestRates:
+    def test_value_is_fetched_once(self, currency_feed):
+        assert rates.get_rates("currencies") == ["btc"]
+        assert rates.get_rates("currencies") == ["btc"]
+        assert currency_feed["calls"] == 1
+
+    def test_stale_value_is_served_while_refreshing(
+        self, currency_feed, settings, django_capture_on_commit_callbacks
+    ):
+        rates.get_rates("currencies")
+        age_entry("currencies", settings.RATES_CURRENCIES_TTL + 1)
+        currency_feed["value"] = ["btc", "eth"]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            assert rates.get_rates("currencies") == ["btc"]
+            assert rates.get_rates("currencies") == ["btc"]
+        assert len(get_backend().queue) == 1
+
+        run_pending()
+        assert rates.get_rates("currencies") == ["btc", "eth"]
+
+    def test_last_good_value_survives_provider_outage(
+        self, currency_feed, settings, django_capture_on_commit_callbacks
+    ):
+        rates.get_rates("currencies")
+        age_entry("currencies", settings.RATES_CURRENCIES_TTL + 1)
+        currency_feed["down"] = True
+
+        with django_capture_on_commit_callbacks(execute=True):
+            rates.get_rates("currencies")
+        run_pending()
+
+        assert rates.get_rates("currencies") == ["btc"]
+
+
+class TestIds:
+    def test_parallel_snowflakes_never_collide(self):
+        generators = [SnowflakeGenerator(node) for node in (1, 2)]
+        results = []
+        barrier = threading.Barrier(8)
+
+        def checkout(generator):
+            barrier.wait()
+            results.extend(generator.next_id() for _ in range(5000))
+
+        threads = [
+            threading.Thread(target=checkout, args=(generators[i % 2],))
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(results) == 40000
+        assert len(set(results)) == len(results)
+        assert max(results) < 2**63
+
+    def test_ids_are_time_ordered(self):
+        generator = SnowflakeGenerator(3)
+        ids = [generator.next_id() for _ in range(1000)]
+        references = []
+        for _ in range(3):
+            references.append(new_ulid())
+            time.sleep(0.002)
+
+        assert ids == sorted(ids)
+        assert references == sorted(references)
+        assert all(len(reference) == 26 for reference in references)
+
+    def test_leases_hand_out_distinct_nodes(self):
+        backend = LocMemCache("leases", {})
+        leases = [NodeLease(backend, timeout=60) for _ in range(3)]
+
+        nodes = [lease.current() for lease in leases]
+
+        assert len(set(nodes)) == 3
+        assert all(
+            backend.get(NODE_LEASE_KEY.format(node)) == lease.token
+            for node, lease in zip(nodes, leases)
+        )
+
+    def test_lapsed_lease_is_replaced(self):
+        backend = LocMemCache("leases", {})
+        lease = NodeLease(backend, timeout=60)
+        node = lease.current()
+        # The key expired and another process leased the node meanwhile
+        backend.set(NODE_LEASE_KEY.format(node), "other", 60)
+        lease.renew_at = 0
+
+        assert lease.current() != node
+
+    def test_no_free_node_fails_loudly(self):
+        backend = LocMemCache(
+            "leases", {"OPTIONS": {"MAX_ENTRIES": NODE_COUNT + 1}}
+        )
+        for node in range(NODE_COUNT):
+            backend.add(NODE_LEASE_KEY.format(node), "other", 60)
+
+        with pytest.raises(NodeIdUnavailable):
+            NodeLease(backend, timeout=60).current()
+
+    def test_unreachable_cache_fails_loudly(self):
+        class IgnoredErrors(LocMemCache):
+            # What django-redis returns with IGNORE_EXCEPTIONS during an outage
+            def add(self, *args, **kwargs):
+                return None
+
+        with pytest.raises(NodeIdUnavailable):
+            NodeLease(IgnoredErrors("down", {}), timeout=60).current()
+
+    def test_process_local_cache_needs_a_node_id(self, settings, monkeypatch):
+        settings.ID_NODE = None
+        monkeypatch.setattr("acctmarket2.utils.ids._lease", None)
+
+        with pytest.raises(ImproperlyConfigured):
+            current_node_id()
+
+
+@pytest.mark.django_db
+class TestDeferredUploads:
+    def test_image_is_uploaded_after_commit(
+        self, django_capture_on_commit_callbacks
+    ):
+        get_backend().clear()
+        image = SimpleUploadedFile("cover.jpg", b"jpeg-bytes")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            category = Category.objects.create(title="Games", image=image)
+
+        category.refresh_from_db()
+        staged = category.image_pending
+        assert category.image_is_pending
+        assert not category.image
+        assert staging_storage().exists(staged)
+
+        assert run_pending() == 1
+
+        category.refresh_from_db()
+        assert not category.image_is_pending
+        assert category.image.public_id == staged.rsplit(".", 1)[0]
+        assert category.image.format == "jpg"
+        assert not staging_storage().exists(staged)
+
+
+class TestImageDerivatives:
+    def test_urls_are_memoized(self):
+        derivative_url.cache_clear()
+        url = derivative_url("images/product/cover", "card")
+
+        assert derivative_url("images/product/cover", "card") == url
+        assert derivative_url.cache_info().hits == 1
+        assert "w_400" in url and "f_auto" in url and "q_auto" in url
+
+    def test_tag_renders_sources_per_format(self):
+        html = Template(
+            '{% load responsive_images %}'
+            '{% responsive_image image "hero" alt="Sale" %}'
+        ).render(Context({"image": "images/banner/sale"}))
+
+        assert 'type="image/avif"' in html
+        assert 'type="image/webp"' in html
+        assert "w_2400" in html and "h_900" in html
+        assert " 1280w" in html
+        assert 'alt="Sale"' in html
+
+    def test_pending_image_renders_nothing(self):
+        html = Template(
+            '{% load responsive_images %}{% responsive_image image %}'
+        ).render(Context({"image": None}))
+
+        assert html.strip() == ""
+
+
+class TestPermissionRegistry:
+    @pytest.mark.django_db
+    def test_groups_resolve_once_on_first_use(
+        self, django_assert_num_queries
+    ):
+        registry = PermissionRegistry(
+            CATALOG=["ecommerce.add_product", "ecommerce.add_category"],
+            MISSING=["ecommerce.launch_rocket"],
+        )
+
+        with django_assert_num_queries(1):
+            perms = registry.CATALOG
+            assert registry.CATALOG is perms
+        assert {perm.codename for perm in perms} == {
+            "add_product",
+            "add_category",
+        }
+
+        # Incomplete groups are not cached
+        with django_assert_num_queries(2):
+            registry.MISSING
+            assert registry.MISSING == []
+        with pytest.raises(AttributeError):
+            registry.UNKNOWN
+
+    def test_importtime_report_is_scoped_to_the_package(self):
+        output = "\n".join(
+            [
+                "import time: self [us] | cumulative | imported package",
+                "import time:       120 |        120 |     acctmarket2.a.b",
+                "import time:       300 |        900 |   acctmarket2.a",
+                "import time:        50 |         50 | acctmarket2.ab",
+                "some other line",
+            ]
+        )
+
+        assert [
+            (cost.module, cost.cumulative_us)
+            for cost in parse_importtime(output, "acctmarket2.a")
+        ] == [("acctmarket2.a", 900), ("acctmarket2.a.b", 120)]
+
+
+@pytest.mark.django_db
+class TestPageCache:
+    url = "/term-policy"
+
+    @pytest.fixture(autouse=True)
+    def _page_cache(self, settings):
+        settings.PAGE_CACHE_ENABLED = True
+        cache.clear()
+        yield
+        cache.clear()
+
+    def test_anonymous_pages_are_served_from_cache(
+        self, client, django_assert_num_queries
+    ):
+        first = client.get(self.url)
+        with django_assert_num_queries(0):
+            second = client.get(self.url)
+
+        assert first["X-Page-Cache"] == "miss"
+        assert second["X-Page-Cache"] == "hit"
+        assert second.content == first.content
+        assert page_cache_metrics()["hit"] == 1
+        assert page_cache_metrics()["hit_ratio"] == 0.5
+
+    def test_catalog_writes_retire_pages(
+        self, client, django_capture_on_commit_callbacks
+    ):
+        client.get(self.url)
+        with django_capture_on_commit_callbacks(execute=True):
+            Category.objects.create(title="Games")
+
+        response = client.get(self.url)
+
+        assert response["X-Page-Cache"] == "miss"
+        assert b"Games" in response.content
+
+    def test_cart_counter_is_filled_per_visitor(self, client):
+        product = Product.objects.create(
+            title="Key", price=Decimal("5.00"), oldprice=Decimal("6.00")
+        )
+        client.get(self.url)
+        client.get("/ecommerce/add-to-cart/", {"id": product.id, "qty": 1})
+
+        response = client.get(self.url)
+
+        assert response["X-Page-Cache"] == "hit"
+        assert b'<span class="cart-item-count">1</span>' in response.content
+        assert b"page-hole" not in response.content
+
+    def test_logged_in_visitors_bypass_the_cache(self, client, user):
+        client.force_login(user)
+
+        assert "X-Page-Cache" not in client.get(self.url)
+
+    def test_concurrent_miss_waits_for_the_first_render(self, rf, settings):
+        settings.PAGE_CACHE_LOCK_WAIT = 1
+        middleware = AnonymousPageCacheMiddleware(lambda request: None)
+        request = rf.get(self.url)
+        request.user = AnonymousUser()
+        key = page_key(request, TermsPolicy.page_cache_namespaces)
+        cache.add(lock_key(key), True)
+        render = threading.Timer(
+            0.1,
+            cache.set,
+            (key, {"status": 200, "headers": {}, "content": b"built"}),
+        )
+        render.start()
+
+        response = middleware.process_view(
+            request, TermsPolicy.as_view(), (), {}
+        )
+        render.join()
+
+        assert response["X-Page-Cache"] == "coalesced"
+        assert response.content == b"built"
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+    @pytest.fixture(autouse=True)
+    def _cache(self):
+        cache.clear()
+        yield
+        cache.clear()
+
+    @pytest.fixture()
+    def product(self):
+        return Product.objects.create(
+            title="Key", price=Decimal("5.00"), oldprice=Decimal("6.00")
+        )
+
+    def test_unchanged_product_page_is_not_modified(self, client, product):
+        url = f"/product/{product.pk}/"
+        first = client.get(url)
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        assert first.status_code == 200
+        assert response.status_code == 304
+        assert response["ETag"] == first["ETag"]
+
+    def test_if_modified_since_is_honoured(self, client, product):
+        url = f"/product/{product.pk}/"
+        first = client.get(url)
+
+        response = client.get(
+            url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]
+        )
+
+        assert response.status_code == 304
+
+    def test_catalog_writes_change_the_etag(
+        self, client, product, django_capture_on_commit_callbacks
+    ):
+        url = f"/product/{product.pk}/"
+        first = client.get(url)
+        product.title = "Game key"
+        with django_capture_on_commit_callbacks(execute=True):
+            product.save()
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        assert response.status_code == 200
+        assert response["ETag"] != first["ETag"]
+        assert b"Game key" in response.content
+
+    def test_cart_changes_the_etag(self, client, product):
+        url = f"/product/{product.pk}/"
+        first = client.get(url)
+        client.get("/ecommerce/add-to-cart/", {"id": product.id, "qty": 1})
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+        assert response.status_code == 200
+
+    def test_logged_in_pages_carry_no_validators(self, client, user, product):
+        client.force_login(user)
+
+        assert "ETag" not in client.get(f"/product/{product.pk}/")
+
+    def test_filter_results_are_not_modified(self, client, user, product):
+        client.force_login(user)
+        first = client.get("/filter-product/")
+
+        response = client.get(
+            "/filter-product/", HTTP_IF_NONE_MATCH=first["ETag"]
+        )
+
+        assert response.status_code == 304
@@ -0,0 +1,155 @@
+import os
+import posixpath
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from cloudinary import CloudinaryResource, uploader
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.dispatch import Signal
+from django.utils.module_loading import import_string
+
+from acctmarket2.applications.jobs.queue import job
+
+# Sent with ``sender`` (the model class) and ``pk`` once a staged image has
+# been uploaded and swapped in with ``update()``, which skips post_save.
+image_uploaded = Signal()
+
+
+class CloudinaryUploadBackend:
+    def upload(self, file, folder, public_id):
+        return uploader.upload_resource(
+            file, folder=folder, public_id=public_id
+        )
+
+
+class LocalUploadBackend:
+    """
+    Keeps "uploaded" images under ``MEDIA_ROOT/uploads`` and describes them
+    the way Cloudinary does, so stored values have the same shape. Meant
+    for tests and offline work.
+    """
+
+    def upload(self, file, folder, public_id):
+        storage = FileSystemStorage(
+            location=os.path.join(settings.MEDIA_ROOT, "uploads")
+        )
+        extension = os.path.splitext(file.name)[1]
+        name = storage.save(f"{folder}/{public_id}{extension}", file)
+        stem, extension = posixpath.splitext(name)
+        return CloudinaryResource(
+            public_id=stem,
+            format=extension[1:] or None,
+            type="upload",
+            resource_type="image",
+        )
+
+
+def upload_target(path):
+    """
+    The folder and public id to upload a file meant for ``path`` under.
+    The public id leaves out the extension, which Cloudinary keeps as the
+    format; ``CloudinaryField`` splits stored values the same way.
+    """
+    folder, name = posixpath.split(path)
+    return folder, posixpath.splitext(name)[0]
+
+
+def get_upload_backend():
+    return import_string(settings.IMAGE_UPLOAD_BACKEND)()
+
+
+@dataclass
+class UploadResult:
+    name: str
+    resource: CloudinaryResource = None
+    error: str = ""
+
+    @property
+    def ok(self):
+        return not self.error
+
+    @property
+    def public_id(self):
+        return self.resource.public_id if self.resource else ""
+
+
+def upload_many(files, path_for, max_workers=None, on_progress=None):
+    """
+    Upload ``files`` concurrently through a bounded thread pool.
+
+    ``path_for(file)`` gives each file's upload path (see
+    ``upload_target``) and ``on_progress(result, done, total)`` is called
+    as each upload finishes. A failing file does not stop the others;
+    results come back in input order with either the uploaded resource or
+    an error.
+    """
+    backend = get_upload_backend()
+    results = [UploadResult(name=file.name) for file in files]
+
+    def upload(file):
+        if hasattr(file, "seek"):
+            file.seek(0)
+        return backend.upload(file, *upload_target(path_for(file)))
+
+    workers = max_workers or settings.IMAGE_UPLOAD_WORKERS
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(upload, file): index
+            for index, file in enumerate(files)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = results[futures[future]]
+            try:
+                result.resource = future.result()
+            except Exception as e:
+                result.error = str(e) or e.__class__.__name__
+            if on_progress is not None:
+                on_progress(result, done, len(files))
+    return results
+
+
+def staging_storage():
+    """
+    Where images wait for the worker. Web and worker processes must see
+    the same directory.
+    """
+    return FileSystemStorage(
+        location=settings.IMAGE_STAGING_ROOT
+        or os.path.join(settings.MEDIA_ROOT, "staged")
+    )
+
+
+def stage_image(name, file):
+    """
+    Write an incoming image to the staging area and return its name there.
+    """
+    if hasattr(file, "seek"):
+        file.seek(0)
+    return staging_storage().save(name, file)
+
+
+@job()
+def upload_staged_image(model_label, pk, staged_name):
+    """
+    Upload a staged image and swap its public id into the row, unless the
+    row was deleted or got a newer image in the meantime.
+    """
+    model = apps.get_model(model_label)
+    storage = staging_storage()
+    if not storage.exists(staged_name):
+        return
+
+    rows = model._base_manager.filter(pk=pk, image_pending=staged_name)
+    if not rows.exists():
+        storage.delete(staged_name)
+        return
+
+    folder, public_id = upload_target(staged_name)
+    with storage.open(staged_name, "rb") as file:
+        resource = get_upload_backend().upload(file, folder, public_id)
+
+    if rows.update(image=resource.get_prep_value(), image_pending=""):
+        image_uploaded.send(sender=model, pk=pk)
+    storage.delete(staged_name)
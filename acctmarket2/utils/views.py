@@ -1,9 +1,6 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.http import HttpResponseForbidden
 
-from acctmarket2.applications.users.models import (
-    ContentManager, CustomerSupportRepresentative)
-
 
 class ContentManagerRequiredMixin(LoginRequiredMixin):
     """
@@ -29,7 +26,7 @@ class ContentManagerRequiredMixin(LoginRequiredMixin):
         """
         Checks if the user is a content manager.
         """
-        return ContentManager.objects.filter(user=user).exists()
+        return user.is_content_manager
 
 
 class CustomerSupportRepresentativemixin(LoginRequiredMixin):
@@ -53,4 +50,4 @@ class CustomerSupportRepresentativemixin(LoginRequiredMixin):
         """
         Checks if the user is a customer support representative.
         """
-        return CustomerSupportRepresentative.objects.filter(user=user).exists()
+        return user.is_customer_support_representative
@@ -114,6 +114,7 @@ LOCAL_APPS = [
     "acctmarket2.applications.ecommerce",
     "acctmarket2.applications.home",
     "acctmarket2.applications.support",
+    "acctmarket2.applications.jobs",
     # Your stuff: custom apps go here
 ]
 # https://docs.djangoproject.com/en/dev/ref/settings/#installed-apps
@@ -170,6 +171,8 @@ MIDDLEWARE = [
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+    "acctmarket2.utils.conditional.ConditionalGetMiddleware",
+    "acctmarket2.utils.page_cache.AnonymousPageCacheMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
 ]
@@ -215,6 +218,7 @@ TEMPLATES = [
             "context_processors": [
                 "acctmarket2.applications.ecommerce.context_processors.product_list",                     # noqa
                 "acctmarket2.applications.ecommerce.context_processors.products_by_category",                   # noqa
+                "acctmarket2.applications.ecommerce.context_processors.cart_summary",                   # noqa
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
@@ -360,6 +364,25 @@ cloudinary.config(
     secure=True,
 )
 
+# Image uploads
+# New images are staged on disk, saved as pending and uploaded by a job
+# worker; set IMAGE_UPLOADS_DEFERRED=False to upload inside save() again.
+IMAGE_UPLOADS_DEFERRED = env.bool("IMAGE_UPLOADS_DEFERRED", default=True)
+IMAGE_UPLOAD_BACKEND = env(
+    "IMAGE_UPLOAD_BACKEND",
+    default="acctmarket2.utils.uploads.CloudinaryUploadBackend",
+)
+# Must be shared by web and worker processes; defaults to MEDIA_ROOT/staged
+IMAGE_STAGING_ROOT = env("IMAGE_STAGING_ROOT", default="")
+# Concurrent uploads when several gallery images are added at once
+IMAGE_UPLOAD_WORKERS = env.int("IMAGE_UPLOAD_WORKERS", default=8)
+
+# Product search
+# Text search configuration used for the PostgreSQL search_vector column,
+# and the cap on results taken from the SQLite FTS5 index.
+SEARCH_CONFIG = env("SEARCH_CONFIG", default="english")
+SEARCH_MAX_RESULTS = env.int("SEARCH_MAX_RESULTS", default=500)
+
 
 # pAYSTACK PAYMENT KEYS
 
@@ -374,8 +397,116 @@ EXCHANGE_RATE_API_URL = env("EXCHANGE_RATE_API_URL")
 # Nowpayment integration
 # https://documenter.getpostman.com/view/7907941/2s93JusNJt
 NOWPAYMENTS_API_KEY = env("NOWPAYMENTS_API_KEY")
+# Secret NOWPayments signs IPN requests with; unsigned IPNs are accepted
+# while it is empty.
+NOWPAYMENTS_IPN_SECRET = env("NOWPAYMENTS_IPN_SECRET", default="")
 USE_NOWPAYMENTS_SANDBOX = env.bool("USE_NOWPAYMENTS_SANDBOX", default=True)
 
+# Outbound gateway calls (Paystack, NOWPayments, exchange rates)
+# Seconds to wait for a connection and for a response.
+GATEWAY_CONNECT_TIMEOUT = env.float("GATEWAY_CONNECT_TIMEOUT", default=3.05)
+GATEWAY_READ_TIMEOUT = env.float("GATEWAY_READ_TIMEOUT", default=10.0)
+# Retries of idempotent requests on connection errors and 502/503/504.
+GATEWAY_RETRIES = env.int("GATEWAY_RETRIES", default=2)
+# Consecutive failures that open a provider's circuit, and seconds it
+# stays open before one trial call is let through.
+GATEWAY_BREAKER_THRESHOLD = env.int("GATEWAY_BREAKER_THRESHOLD", default=5)
+GATEWAY_BREAKER_RESET = env.int("GATEWAY_BREAKER_RESET", default=30)
+
+# Cached gateway reference data
+# Seconds before the NOWPayments currency list and the exchange rates are
+# refreshed in the background; the last good value is kept RATES_STALE_TTL
+# seconds longer for when the provider is down.
+RATES_CURRENCIES_TTL = env.int("RATES_CURRENCIES_TTL", default=60 * 60 * 6)
+RATES_EXCHANGE_TTL = env.int("RATES_EXCHANGE_TTL", default=60 * 60)
+RATES_STALE_TTL = env.int("RATES_STALE_TTL", default=60 * 60 * 24 * 2)
+
+# Storefront snapshot
+# Seconds a cached storefront snapshot lives before it is rebuilt even if the
+# catalog version has not moved.
+STOREFRONT_CACHE_TIMEOUT = env.int("STOREFRONT_CACHE_TIMEOUT", default=60 * 15)
+
+# Product pages
+# Seconds the shared part of a product page is cached; catalog writes
+# invalidate it earlier.
+PRODUCT_DETAIL_CACHE_TIMEOUT = env.int(
+    "PRODUCT_DETAIL_CACHE_TIMEOUT", default=60 * 15
+)
+
+# Recommendations
+# Neighbours stored per product by refresh_recommendations; a few more than a
+# product page shows, so hidden or sold out ones can be skipped.
+RECOMMENDATIONS_PER_PRODUCT = env.int(
+    "RECOMMENDATIONS_PER_PRODUCT", default=12
+)
+
+# Shop filters
+# Products per page of the sidebar filter results, and seconds a cached page
+# of results and facet counts lives; catalog writes invalidate it earlier.
+FACET_PAGE_SIZE = env.int("FACET_PAGE_SIZE", default=8)
+FACET_CACHE_TIMEOUT = env.int("FACET_CACHE_TIMEOUT", default=60 * 15)
+
+# Page cache
+# Whole pages of views using AnonymousPageCacheMixin are cached for anonymous
+# visitors for PAGE_CACHE_TIMEOUT seconds, or until a namespace they depend on
+# is bumped. While one worker renders a missing page, others wait up to
+# PAGE_CACHE_LOCK_WAIT seconds for it; a render holding the lock longer than
+# PAGE_CACHE_LOCK_TIMEOUT seconds is assumed dead.
+PAGE_CACHE_ENABLED = env.bool("PAGE_CACHE_ENABLED", default=True)
+PAGE_CACHE_TIMEOUT = env.int("PAGE_CACHE_TIMEOUT", default=60 * 10)
+PAGE_CACHE_LOCK_TIMEOUT = env.int("PAGE_CACHE_LOCK_TIMEOUT", default=30)
+PAGE_CACHE_LOCK_WAIT = env.float("PAGE_CACHE_LOCK_WAIT", default=5.0)
+
+# Conditional GET
+# Seconds the latest updated_at behind a page's Last-Modified is cached; the
+# namespaces a view depends on invalidate it earlier.
+CONDITIONAL_CACHE_TIMEOUT = env.int(
+    "CONDITIONAL_CACHE_TIMEOUT", default=60 * 15
+)
+
+# Listings
+# Seconds the total shown next to a cursor-paginated listing is cached; catalog
+# writes invalidate it earlier.
+PAGINATION_COUNT_TIMEOUT = env.int("PAGINATION_COUNT_TIMEOUT", default=60 * 15)
+
+# Roles
+# Seconds a user's resolved staff and customer roles are cached; creating or
+# deleting a profile invalidates them earlier.
+ROLES_CACHE_TIMEOUT = env.int("ROLES_CACHE_TIMEOUT", default=60 * 60)
+
+# Server-side cart
+# Seconds an idle cart is kept in Redis.
+CART_TTL = env.int("CART_TTL", default=60 * 60 * 24 * 30)
+
+# Product key pools
+# When enabled, keys of pooled products are reserved in batches into Redis
+# lists so that allocation is a pop instead of a scan of ProductKey.
+KEY_POOL_ENABLED = env.bool("KEY_POOL_ENABLED", default=False)
+KEY_POOL_BATCH = env.int("KEY_POOL_BATCH", default=50)
+KEY_POOL_LOW_WATER = env.int("KEY_POOL_LOW_WATER", default=10)
+# Reservations older than this are treated as lost and can be claimed again
+KEY_POOL_RESERVATION_TTL = env.int("KEY_POOL_RESERVATION_TTL", default=60 * 60)
+
+# Background jobs
+# Dotted path of the queue backend; see acctmarket2.applications.jobs.backends
+JOBS_BACKEND = env(
+    "JOBS_BACKEND",
+    default="acctmarket2.applications.jobs.backends.DatabaseBackend",
+)
+JOBS_MAX_ATTEMPTS = env.int("JOBS_MAX_ATTEMPTS", default=5)
+# Seconds before the first retry; doubled on every further attempt.
+JOBS_RETRY_BACKOFF = env.int("JOBS_RETRY_BACKOFF", default=30)
+# Seconds after which a job claimed by a silent worker is run again.
+JOBS_LEASE = env.int("JOBS_LEASE", default=60 * 10)
+
+# Id generation
+# Node id (0-1023) baked into Snowflake payment ids. Leave unset to have
+# each process lease one from the shared cache for ID_NODE_LEASE_TIMEOUT
+# seconds, renewed while it runs; a cache that isn't shared between
+# processes needs ID_NODE.
+ID_NODE = env.int("ID_NODE", default=None)
+ID_NODE_LEASE_TIMEOUT = env.int("ID_NODE_LEASE_TIMEOUT", default=60 * 10)
+
 
 # Jazmin settings
 JAZZMIN_SETTINGS = {
@@ -25,6 +25,8 @@ CACHES = {
         "LOCATION": "",
     },
 }
+# LocMemCache isn't shared, so Snowflake ids use a fixed node id
+ID_NODE = env.int("ID_NODE", default=0)
 
 # EMAIL
 # ------------------------------------------------------------------------------
@@ -25,6 +25,13 @@ CACHES = {
     },
 }
 
+# JOBS
+# ------------------------------------------------------------------------------
+JOBS_BACKEND = env(
+    "JOBS_BACKEND",
+    default="acctmarket2.applications.jobs.backends.RedisBackend",
+)
+
 # SECURITY
 # ------------------------------------------------------------------------------
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
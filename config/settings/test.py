@@ -35,3 +35,16 @@ TEMPLATES[0]["OPTIONS"]["debug"] = True  # type: ignore[index]
 MEDIA_URL = "http://media.testserver"
 # Your stuff...
 # ------------------------------------------------------------------------------
+
+# Jobs run in-process; drain them with jobs.queue.run_pending()
+JOBS_BACKEND = "acctmarket2.applications.jobs.backends.InMemoryBackend"
+
+# Images are "uploaded" to MEDIA_ROOT instead of Cloudinary
+IMAGE_UPLOAD_BACKEND = "acctmarket2.utils.uploads.LocalUploadBackend"
+
+# LocMemCache can't lease node ids; the lease tests use NodeLease directly
+ID_NODE = 0
+
+# Pages render every time so tests can inspect response.context; the page
+# cache tests turn it back on
+PAGE_CACHE_ENABLED = False